@@ -1,23 +1,36 @@
 import os
 from flask import Flask, send_from_directory, redirect, request
 # from flasgger import Swagger  # Temporarily disabled for Azure compatibility
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from flask_socketio import SocketIO, join_room, leave_room, emit
 from implementations.extensions import db, bcrypt
+from implementations.connection_governor import governor
+from implementations.shutdown import install_signal_handlers, register_shutdown_callback
+from implementations.schema import add_missing_columns, migrate_image_jobs
+from implementations.feature4_restaurant_notifications.services.redis_client import close_redis
 from config.settings import Config
 from implementations.feature1_account_management.controllers.account_controller import account_bp
 from implementations.feature2_order_tracking.controllers.order_controller import order_bp
 from implementations.feature3_driver_location.controllers.location_controller import driver_bp, customer_bp
 from implementations.feature4_restaurant_notifications.controllers.notification_controller import notification_bp
 from implementations.feature6_announcements.controllers.announcement_controller import announcement_bp
+from implementations.feature6_announcements.services.announcement_scheduler import announcement_scheduler
+from implementations.feature6_announcements.services.announcement_hub import announcement_hub
 from implementations.feature5_support_chat.models.chat import ChatSession, ChatMessage
 from implementations.feature5_support_chat.controllers.chat_controller import chat_bp, register_chat_socketio_handlers
+from implementations.feature5_support_chat.services.message_writer import message_writer
+from implementations.feature5_support_chat.services.message_search import message_search
+from implementations.feature5_support_chat.services.chat_archive import chat_archiver
 from implementations.feature1_account_management.models.user import User
 from sqlalchemy import inspect
 from sqlalchemy.exc import OperationalError
 from datetime import datetime
 import threading
 from implementations.feature7_image_upload.controllers.image_upload_controller import image_upload_bp  # Feature 7 blueprint
+from implementations.feature7_image_upload.services.image_queue import image_queue
+from implementations.feature7_image_upload.services.image_events import image_events
+from implementations.feature7_image_upload.services.image_processing import process_job
+from implementations.feature8_event_stream.controllers.events_controller import events_bp
 
 
 def create_app():
@@ -72,14 +85,18 @@ def create_app():
   def validate_json():
     """Request validation middleware for JSON content type"""
     if request.method in ['POST', 'PUT', 'PATCH']:
-      if request.content_type and 'application/json' not in request.content_type:
+      # File uploads (Feature 7) are multipart, resumable upload chunks are raw bytes
+      if request.content_type and 'application/json' not in request.content_type \
+          and not request.content_type.startswith(('multipart/form-data', 'application/octet-stream')):
         return {
           'success': False,
           'message': 'Content-Type must be application/json'
         }, 400
   
   # Initialize SocketIO for chat support
-  socketio = SocketIO(app, cors_allowed_origins='*')
+  # With SOCKETIO_MESSAGE_QUEUE set, emits reach sockets held by every worker
+  socketio = SocketIO(app, cors_allowed_origins='*', async_mode=Config.SOCKETIO_ASYNC_MODE,
+                      message_queue=Config.SOCKETIO_MESSAGE_QUEUE, channel=Config.SOCKETIO_CHANNEL)
 
   # Blueprints (one modular monolith)
   app.register_blueprint(account_bp)
@@ -90,6 +107,7 @@ def create_app():
   app.register_blueprint(announcement_bp)
   app.register_blueprint(chat_bp)  # Feature 5 chat controller
   app.register_blueprint(image_upload_bp)  # register Feature 7
+  app.register_blueprint(events_bp)  # Feature 8 multiplexed event stream
 
   # Create all tables
   with app.app_context():
@@ -107,6 +125,39 @@ def create_app():
             print("[App] Added 'role' column to users table")
           except OperationalError as e:
             print('[App] Migration failed (role):', e)
+      # Feature 5: denormalized chat session summary, backfilled once from the messages
+      if add_missing_columns(inspector, 'chat_sessions', [
+          ('last_message_text', 'VARCHAR(200)'),
+          ('last_message_at', 'TIMESTAMP'),
+          ('unread_agent_count', 'INTEGER NOT NULL DEFAULT 0'),
+          ('unread_customer_count', 'INTEGER NOT NULL DEFAULT 0')]):
+        with db.engine.begin() as conn:
+          conn.execute(db.text(
+            "UPDATE chat_sessions SET "
+            "last_message_at = (SELECT MAX(m.created_at) FROM chat_messages m WHERE m.chat_id = chat_sessions.id), "
+            "last_message_text = (SELECT substr(m.text, 1, 200) FROM chat_messages m "
+            "WHERE m.chat_id = chat_sessions.id ORDER BY m.id DESC LIMIT 1);"))
+          conn.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_chat_sessions_last_activity_at ON chat_sessions (last_activity_at);"))
+      # Feature 5: hot/cold chat storage
+      add_missing_columns(inspector, 'chat_sessions', [('archived_at', 'TIMESTAMP')])
+      # Feature 5: full-text index over chat messages (FTS5 / tsvector), kept in sync on insert
+      print('[App] Chat search index:', message_search.init_app())
+      # Feature 6: audience targeting and scheduled publish/expiry; existing announcements count as released
+      added = add_missing_columns(inspector, 'announcements', [
+          ('audience', "VARCHAR(20) NOT NULL DEFAULT 'all'"),
+          ('restaurant_ids', 'VARCHAR(500)'),
+          ('publish_at', 'TIMESTAMP'),
+          ('expires_at', 'TIMESTAMP'),
+          ('released_at', 'TIMESTAMP')])
+      if added:
+        with db.engine.begin() as conn:
+          if 'released_at' in added:
+            conn.execute(db.text("UPDATE announcements SET released_at = created_at WHERE released_at IS NULL;"))
+          conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_announcements_publish_at ON announcements (publish_at);"))
+          conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_announcements_expires_at ON announcements (expires_at);"))
+      # Feature 7: work queue and stored-object columns on image_jobs (image_worker.py runs the same)
+      migrate_image_jobs(inspector)
     except Exception as e:
       print('[App] Database error:', e)
 
@@ -128,9 +179,49 @@ def create_app():
     except Exception as e:
       return {"error": str(e)}, 500
 
+  @app.route('/debug/streams', methods=['GET'])
+  @jwt_required()
+  def debug_streams():
+    """Live gauges of open long-lived connections per stream type (employees only)"""
+    user = db.session.get(User, int(get_jwt_identity()))
+    if not user or user.role != 'employee':
+      return {'success': False, 'error': 'forbidden'}, 403
+    return governor.stats()
+
   # SocketIO Chat Event Handlers - Register handlers from chat controller
   register_chat_socketio_handlers(socketio)
 
+  # Feature 5: periodic sweep of inactive chats into compressed cold storage
+  if Config.CHAT_ARCHIVE_AFTER_DAYS > 0:
+    chat_archiver.start(app)
+
+  # Feature 7: bounded image worker pool (0 threads when image_worker.py processes do the work);
+  # resumes jobs left pending by a previous run
+  try:
+    image_queue.init_app(app, process_job)
+  except Exception as e:
+    print('[App] Image queue error:', e)
+  # Long polls and job streams wake on worker notifications (one Redis subscription per worker)
+  image_events.init_app(app)
+
+  # Feature 6: subscribe and start the publisher now, so announcements created here reach other processes
+  announcement_hub.start()
+
+  # Feature 6: one timer for the next scheduled announcement release/expiry
+  try:
+    announcement_scheduler.init_app(app)
+  except Exception as e:
+    print('[App] Announcement scheduler error:', e)
+
+  # Graceful drain of streams on SIGTERM (deploys / worker recycling)
+  register_shutdown_callback(message_writer.flush)
+  register_shutdown_callback(chat_archiver.stop)
+  register_shutdown_callback(announcement_scheduler.stop)
+  register_shutdown_callback(image_queue.stop)
+  register_shutdown_callback(image_events.stop)
+  register_shutdown_callback(close_redis)
+  install_signal_handlers()
+
   return app, socketio
 
 
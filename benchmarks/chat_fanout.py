@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Chat fan-out benchmark across several worker processes sharing one Socket.IO message queue.
+
+Starts N copies of the app (each on its own port, all with the same SOCKETIO_MESSAGE_QUEUE
+and database), spreads listener sockets over them, has one customer send messages and
+measures how long every message takes to reach every listener, whichever worker holds it.
+
+    python benchmarks/chat_fanout.py --workers 4 --listeners 200 --messages 100 \
+        --queue redis://localhost:6379/0
+
+Compare runs with --workers 1, 2, 4, ... at the same total listener count. Without
+--queue the workers are independent and only listeners on the sender's worker receive.
+--queue local starts benchmarks/local_pubsub.py (an in-memory Redis stand-in) for the run.
+Install websocket-client for the listeners; over long-polling the client, not the
+server, dominates the latency.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_CODE = (
+    "import os, sys; sys.path.insert(0, os.environ['BENCH_ROOT']);"
+    "from app import app, socketio;"
+    "socketio.run(app, host='127.0.0.1', port=int(os.environ['PORT']), debug=False,"
+    " use_reloader=False, log_output=False, allow_unsafe_werkzeug=True)"
+)
+
+
+def start_workers(first: int, count: int, base_port: int, queue: str, database_url: str):
+    procs = []
+    for i in range(first, count):
+        env = dict(os.environ, BENCH_ROOT=ROOT, PORT=str(base_port + i), DATABASE_URL=database_url)
+        env.setdefault('STREAM_MAX_PER_CLIENT', '100000')  # every listener comes from loopback
+        if queue:
+            env['SOCKETIO_MESSAGE_QUEUE'] = queue
+        procs.append(subprocess.Popen([sys.executable, '-c', WORKER_CODE], env=env, cwd=ROOT,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return procs
+
+
+def wait_ready(url: str, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        client = socketio.Client()
+        try:
+            client.connect(url, wait_timeout=2)
+            client.disconnect()
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f'worker at {url} did not start')
+
+
+def connect(client, url: str, attempts: int = 3):
+    """The development server drops the odd connection while hundreds open at once."""
+    for attempt in range(attempts):
+        try:
+            client.connect(url, wait_timeout=10)
+            return
+        except socketio.exceptions.ConnectionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--listeners', type=int, default=50, help='total listener sockets, spread over workers')
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.02, help='seconds between sent messages')
+    parser.add_argument('--queue', default=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+                        help='message queue URL shared by the workers (e.g. redis://localhost:6379/0), '
+                             'or "local" for the bundled stand-in')
+    parser.add_argument('--base-port', type=int, default=5100)
+    args = parser.parse_args()
+
+    broker = None
+    if args.queue == 'local':
+        port = args.base_port - 1
+        broker = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'local_pubsub.py'),
+                                   '--port', str(port)], stdout=subprocess.DEVNULL)
+        args.queue = f'redis://127.0.0.1:{port}/0'
+
+    database_url = os.environ.get('BENCH_DATABASE_URL') or \
+        'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='chat-bench-'), 'bench.db')
+    urls = [f'http://127.0.0.1:{args.base_port + i}' for i in range(args.workers)]
+    # The first worker creates the schema; the others start once it is up
+    procs = start_workers(0, 1, args.base_port, args.queue, database_url)
+    try:
+        wait_ready(urls[0])
+        procs += start_workers(1, args.workers, args.base_port, args.queue, database_url)
+        for url in urls[1:]:
+            wait_ready(url)
+
+        # Sender: a customer on worker 0 owns the chat
+        sender = socketio.Client()
+        chat = {}
+        ready = threading.Event()
+
+        @sender.on('customer_chat')
+        def on_chat(data):
+            chat['id'] = data['chat_id']
+            ready.set()
+
+        sender.connect(urls[0])
+        sender.emit('customer_handshake', {'user': 'bench-customer@local.test'})
+        if not ready.wait(30):
+            raise RuntimeError('customer handshake timed out')
+
+        sent_at = {}
+        latencies = []
+        received = [0]
+        last_received = [0.0]
+        lock = threading.Lock()
+        listeners = []
+        for i in range(args.listeners):
+            client = socketio.Client()
+
+            @client.on('message')
+            def on_message(m):
+                started = sent_at.get(m['text'])
+                if started is not None:
+                    with lock:
+                        latencies.append(time.time() - started)
+                        received[0] += 1
+                        last_received[0] = time.time()
+
+            connect(client, urls[i % args.workers])
+            client.emit('agent_subscribe', {'user': f'bench-agent-{i}'})
+            client.emit('open_chat', {'chat_id': chat['id']})
+            listeners.append(client)
+        time.sleep(1)  # let every open_chat join its room
+
+        started = time.time()
+        for n in range(args.messages):
+            text = f'bench {n}'
+            sent_at[text] = time.time()
+            sender.emit('send_message', {'chat_id': chat['id'], 'text': text, 'role': 'customer',
+                                         'user': 'bench-customer@local.test'})
+            time.sleep(args.interval)
+
+        expected = args.messages * args.listeners
+        deadline = time.time() + 30
+        while received[0] < expected and time.time() < deadline:
+            time.sleep(0.1)
+        elapsed = max(last_received[0] - started, 1e-6)
+
+        with lock:
+            samples = sorted(latencies)
+        print(f'workers={args.workers} listeners={args.listeners} messages={args.messages} '
+              f'queue={args.queue or "none"}')
+        print(f'delivered {received[0]}/{expected} in {elapsed:.2f}s '
+              f'({received[0] / elapsed:.0f} deliveries/s)')
+        if samples:
+            print(f'latency ms: p50={statistics.median(samples) * 1000:.1f} '
+                  f'p99={samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000:.1f} '
+                  f'max={samples[-1] * 1000:.1f}')
+
+        for client in listeners + [sender]:
+            client.disconnect()
+    finally:
+        for proc in procs + ([broker] if broker else []):
+            proc.terminate()
+        for proc in procs + ([broker] if broker else []):
+            proc.wait(timeout=15)
+
+
+if __name__ == '__main__':
+    main()
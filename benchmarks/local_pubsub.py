@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Redis as the Socket.IO message queue, for benchmarks and multi-worker
+runs on a machine without a Redis server.
+
+Speaks just enough RESP for redis-py and python-socketio's RedisManager: PUBLISH,
+SUBSCRIBE/UNSUBSCRIBE, MULTI/EXEC, connection commands, and the sorted-set commands the
+shared chat state uses (ZADD, ZREM, ZRANGE, ZREMRANGEBYSCORE, EXPIRE, DEL).
+One process, in memory, no persistence or auth.
+
+    python benchmarks/local_pubsub.py --port 6390
+    SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390/0 python gateway.py
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, Optional, Set
+
+
+class CommandError(Exception):
+    pass
+
+
+class Map(list):
+    """Flat key/value list sent as a RESP3 map (the HELLO 3 reply)."""
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, Exception):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, Map):
+        return b'%%%d\r\n' % (len(value) // 2) + b''.join(encode(v) for v in value)
+    return b'*%d\r\n' % len(value) + b''.join(encode(v) for v in value)
+
+
+async def read_command(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if line[:1] != b'*':
+        return line.split()  # inline command (redis-cli, telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        args.append((await reader.readexactly(int(header[1:]) + 2))[:-2])
+    return args
+
+
+def score_bound(raw: bytes):
+    """ZREMRANGEBYSCORE bound -> (value, exclusive)."""
+    if raw.startswith(b'('):
+        return float(raw[1:]), True
+    return float(raw), False
+
+
+class Broker:
+    def __init__(self):
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.zsets: Dict[bytes, Dict[bytes, float]] = {}
+        self.expires: Dict[bytes, float] = {}
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[bytes] = set()
+        queued: Optional[list] = None
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                name = args[0].upper()
+                if queued is not None and name not in (b'EXEC', b'DISCARD', b'MULTI'):
+                    queued.append(args)
+                    writer.write(b'+QUEUED\r\n')
+                elif name == b'MULTI':
+                    queued = []
+                    writer.write(encode('OK'))
+                elif name == b'EXEC':
+                    replies = [self.execute(a) for a in queued or []]
+                    queued = None
+                    writer.write(encode(replies))
+                elif name == b'DISCARD':
+                    queued = None
+                    writer.write(encode('OK'))
+                elif name == b'SUBSCRIBE':
+                    for channel in args[1:]:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscribed.add(channel)
+                        writer.write(encode([b'subscribe', channel, len(subscribed)]))
+                elif name == b'UNSUBSCRIBE':
+                    for channel in args[1:] or list(subscribed) or [b'']:
+                        self.channels.get(channel, set()).discard(writer)
+                        subscribed.discard(channel)
+                        writer.write(encode([b'unsubscribe', channel, len(subscribed)]))
+                elif name == b'PING' and subscribed:
+                    writer.write(encode([b'pong', args[1] if len(args) > 1 else b'']))
+                elif name == b'QUIT':
+                    writer.write(encode('OK'))
+                    break
+                else:
+                    writer.write(encode(self.execute(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    def execute(self, args):
+        name = args[0].decode(errors='replace').lower()
+        handler = getattr(self, 'cmd_' + name, None)
+        if handler is None:
+            return CommandError(f"unknown command '{name}'")
+        try:
+            return handler(*args[1:])
+        except (TypeError, ValueError, IndexError):
+            return CommandError(f"wrong arguments for '{name}' command")
+        except CommandError as e:
+            return e
+
+    def _zset(self, key: bytes, create: bool = False) -> Optional[Dict[bytes, float]]:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.zsets.pop(key, None)
+            self.expires.pop(key, None)
+        if create:
+            return self.zsets.setdefault(key, {})
+        return self.zsets.get(key)
+
+    # Connection
+    def cmd_ping(self, *message):
+        return message[0] if message else 'PONG'
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_select(self, index):
+        return 'OK'
+
+    def cmd_auth(self, *credentials):
+        return 'OK'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_hello(self, *args):
+        # Replies stay in RESP2 framing, which RESP3 clients also parse
+        proto = int(args[0]) if args else 2
+        fields = [b'server', b'redis', b'version', b'7.0.0', b'proto', proto]
+        if proto < 3:
+            return fields
+        return Map(fields)
+
+    # Pub/sub
+    def cmd_publish(self, channel, message):
+        frame = encode([b'message', channel, message])
+        writers = list(self.channels.get(channel, ()))
+        for writer in writers:
+            writer.write(frame)
+        return len(writers)
+
+    # Sorted sets
+    def cmd_zadd(self, key, *args):
+        args = list(args)
+        while args and args[0].upper() in (b'NX', b'XX', b'GT', b'LT', b'CH', b'INCR'):
+            args.pop(0)
+        if not args or len(args) % 2:
+            raise ValueError
+        zset = self._zset(key, create=True)
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        zset = self._zset(key) or {}
+        return sum(zset.pop(m, None) is not None for m in members)
+
+    def cmd_zrange(self, key, start, stop, *options):
+        ranked = sorted((self._zset(key) or {}).items(), key=lambda item: (item[1], item[0]))
+        start, stop = int(start), int(stop)
+        if stop < 0:
+            stop += len(ranked)
+        picked = ranked[max(0, start + len(ranked) if start < 0 else start):stop + 1]
+        if any(o.upper() == b'WITHSCORES' for o in options):
+            return [v for member, score in picked for v in (member, repr(score).encode())]
+        return [member for member, _ in picked]
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        (low, low_open), (high, high_open) = score_bound(low), score_bound(high)
+        zset = self._zset(key) or {}
+        doomed = [m for m, s in zset.items()
+                  if (s > low if low_open else s >= low) and (s < high if high_open else s <= high)]
+        for member in doomed:
+            del zset[member]
+        return len(doomed)
+
+    def cmd_expire(self, key, seconds):
+        if self._zset(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += self._zset(key) is not None
+            self.zsets.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+
+async def run(host: str, port: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.serve, host, port)
+    print(f'local pub/sub listening on redis://{host}:{port}/0', flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -32,3 +32,91 @@ class Config:
     REDIS_PORT = int(os.environ.get('REDIS_PORT'))
     REDIS_DB = int(os.environ.get('REDIS_DB'))
     REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD')
+
+    # Server-Sent Events
+    SSE_BATCH_WINDOW_MS = int(os.environ.get('SSE_BATCH_WINDOW_MS', '50'))  # coalesce events arriving within this window
+    SSE_BATCH_MAX = int(os.environ.get('SSE_BATCH_MAX', '200'))
+    SSE_GZIP = os.environ.get('SSE_GZIP', '1') == '1'
+    SSE_GZIP_LEVEL = int(os.environ.get('SSE_GZIP_LEVEL', '6'))
+
+    # Real-time gateway (gateway.py): one greenlet per connection instead of one thread
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None  # None = auto-detect
+    GATEWAY_MAX_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_CONNECTIONS', '20000'))
+    # Regular REST requests are forwarded to this threaded pool (startup.sh); unset = the gateway serves everything
+    GATEWAY_UPSTREAM = os.environ.get('GATEWAY_UPSTREAM') or None  # e.g. http://127.0.0.1:8001
+    GATEWAY_UPSTREAM_TIMEOUT = float(os.environ.get('GATEWAY_UPSTREAM_TIMEOUT', '75'))  # above the pool's 60 s worker timeout
+
+    # Multi-worker Socket.IO: emits go through this queue (e.g. rediss://:<password>@<host>:6380/0)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None  # None = single worker
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'flask-socketio')
+
+    # Admission control for long-lived connections (per worker process)
+    STREAM_MAX_TOTAL = int(os.environ.get('STREAM_MAX_TOTAL', '15000'))
+    STREAM_MAX_DEFAULT_PER_ENDPOINT = int(os.environ.get('STREAM_MAX_DEFAULT_PER_ENDPOINT', '5000'))
+    STREAM_MAX_PER_ENDPOINT = {
+        'order_track': int(os.environ.get('STREAM_MAX_ORDER_TRACK', '5000')),
+        'driver_location': int(os.environ.get('STREAM_MAX_DRIVER_LOCATION', '5000')),
+        'orders': int(os.environ.get('STREAM_MAX_ORDERS', '500')),
+        'announcements': int(os.environ.get('STREAM_MAX_ANNOUNCEMENTS', '5000')),
+        'chat': int(os.environ.get('STREAM_MAX_CHAT', '5000')),
+        'events': int(os.environ.get('STREAM_MAX_EVENTS', '10000')),
+        'image_jobs': int(os.environ.get('STREAM_MAX_IMAGE_JOBS', '5000')),
+    }
+    STREAM_MAX_PER_CLIENT = int(os.environ.get('STREAM_MAX_PER_CLIENT', '20'))
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))  # proxies in front of the app that append X-Forwarded-For (Azure App Service front end; 0 when clients connect directly)
+    STREAM_IDLE_TIMEOUT = int(os.environ.get('STREAM_IDLE_TIMEOUT', '600'))  # seconds without data before eviction
+    STREAM_RETRY_AFTER = int(os.environ.get('STREAM_RETRY_AFTER', '5'))  # base back-off, jittered up to 2x
+    STREAM_DRAIN_TIMEOUT = int(os.environ.get('STREAM_DRAIN_TIMEOUT', '10'))  # seconds to wait for streams on shutdown
+    STREAM_DRAIN_RETRY_SPREAD = int(os.environ.get('STREAM_DRAIN_RETRY_SPREAD', '30'))  # reconnect delays spread over this window
+
+    # Announcements: in-memory snapshot of recent active announcements
+    ANNOUNCEMENT_SNAPSHOT_SIZE = int(os.environ.get('ANNOUNCEMENT_SNAPSHOT_SIZE', '50'))  # larger list limits go to the database
+    ANNOUNCEMENT_SNAPSHOT_MAX_AGE = int(os.environ.get('ANNOUNCEMENT_SNAPSHOT_MAX_AGE', '30'))  # seconds before another worker's changes show up
+    ANNOUNCEMENT_RESCAN_INTERVAL = int(os.environ.get('ANNOUNCEMENT_RESCAN_INTERVAL', '30'))  # seconds between reloads of due releases/expiries scheduled by other processes
+
+    # Support chat group commit: messages are written in batches, then emitted
+    CHAT_WRITE_BATCH_WINDOW_MS = int(os.environ.get('CHAT_WRITE_BATCH_WINDOW_MS', '5'))
+    CHAT_WRITE_BATCH_MAX = int(os.environ.get('CHAT_WRITE_BATCH_MAX', '500'))
+    # Typing/presence state shared by all workers; in-process when unset
+    CHAT_STATE_REDIS_URL = os.environ.get('CHAT_STATE_REDIS_URL') or SOCKETIO_MESSAGE_QUEUE
+    CHAT_TYPING_TTL = int(os.environ.get('CHAT_TYPING_TTL', '6'))  # seconds a typing flag lives without a refresh
+    CHAT_TYPING_DEBOUNCE_MS = int(os.environ.get('CHAT_TYPING_DEBOUNCE_MS', '2000'))  # at most one repeat broadcast per user per interval
+    CHAT_PRESENCE_TTL = int(os.environ.get('CHAT_PRESENCE_TTL', '60'))  # agent shows offline without a presence_ping for this long
+    CHAT_PRESENCE_SEEN_TTL = int(os.environ.get('CHAT_PRESENCE_SEEN_TTL', '86400'))  # offline agents stay listed this long
+    CHAT_DIGEST_INTERVAL_MS = int(os.environ.get('CHAT_DIGEST_INTERVAL_MS', '250'))  # chat_updated deltas are merged within this tick
+    # Sessions idle this long move to compressed cold storage (chat_archives); 0 disables the sweep
+    CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', '30'))
+    CHAT_ARCHIVE_INTERVAL = int(os.environ.get('CHAT_ARCHIVE_INTERVAL', '3600'))  # seconds between archive sweeps
+
+    # Image jobs: a bounded pool drains a queue persisted in image_jobs (status 'pending')
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))  # pool threads in the web process (0 = image_worker.py only)
+    IMAGE_QUEUE_DEPTH = int(os.environ.get('IMAGE_QUEUE_DEPTH', '100'))  # pending jobs before uploads get 429
+    IMAGE_QUEUE_POLL = float(os.environ.get('IMAGE_QUEUE_POLL', '1'))  # seconds between checks for jobs queued by other processes
+    IMAGE_JOB_STALE_AFTER = int(os.environ.get('IMAGE_JOB_STALE_AFTER', '600'))  # 'processing' this long = worker died, requeue
+    IMAGE_WORKER_HEARTBEAT = int(os.environ.get('IMAGE_WORKER_HEARTBEAT', '15'))  # seconds; each pool's heartbeat and stale-job requeue timer
+    # image_worker.py: separate processes doing the CPU-bound work (set IMAGE_WORKERS=0 on the web process)
+    IMAGE_PROCESSES = int(os.environ.get('IMAGE_PROCESSES', str(os.cpu_count() or 1)))
+    IMAGE_WORKER_THREADS = int(os.environ.get('IMAGE_WORKER_THREADS', '1'))  # per image worker process
+    # Uploaded bytes are handed to the image workers as files here (same host; /dev/shm keeps them in memory)
+    IMAGE_SPOOL_DIR = os.environ.get('IMAGE_SPOOL_DIR', os.path.join(basedir, 'instance', 'image_spool'))
+    # Image storage backend: azure | local (default: azure when a connection string is set)
+    IMAGE_STORAGE = os.environ.get('IMAGE_STORAGE') or None
+    AZURE_STORAGE_CONNECTION_STRING = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+    AZURE_CONTAINER = os.environ.get('AZURE_CONTAINER', 'menu-images')
+    AZURE_ACCOUNT_NAME = os.environ.get('AZURE_ACCOUNT_NAME', 'gsg')
+    IMAGE_LOCAL_ROOT = os.environ.get('IMAGE_LOCAL_ROOT', os.path.join(basedir, 'instance', 'images'))
+    IMAGE_PUBLIC_BASE_URL = os.environ.get('IMAGE_PUBLIC_BASE_URL') or None  # CDN / custom domain in front of the store
+    # Derivatives made from one decode: name:longest_edge, each in every format (first = preferred)
+    IMAGE_VARIANTS = os.environ.get('IMAGE_VARIANTS', 'thumb:200,card:600,full:1600')
+    IMAGE_FORMATS = os.environ.get('IMAGE_FORMATS', 'webp,jpeg')
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '85'))
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))
+    # Upload limits: bytes are streamed to disk, and decodes are bounded by pixel count
+    IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+    IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', str(40_000_000)))  # largest decode; JPEGs count at their reduced draft size
+    IMAGE_UPLOAD_CHUNK_SIZE = int(os.environ.get('IMAGE_UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))  # resumable uploads
+    IMAGE_UPLOAD_TTL = int(os.environ.get('IMAGE_UPLOAD_TTL', '86400'))  # resumable uploads are dropped after this long without a chunk
+    # Job status waits: GET /api/v1/image-jobs/<id>?wait=, /api/v1/image-jobs/stream, /api/v1/image-jobs/batch
+    IMAGE_JOB_MAX_WAIT = int(os.environ.get('IMAGE_JOB_MAX_WAIT', '60'))  # cap on ?wait= seconds
+    IMAGE_JOB_RECHECK = float(os.environ.get('IMAGE_JOB_RECHECK', '2'))  # one status query per web worker for all watched jobs (no Redis / lost notification)
+    IMAGE_JOB_BATCH_MAX = int(os.environ.get('IMAGE_JOB_BATCH_MAX', '100'))  # job ids per batch request or stream
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Real-time gateway for the streaming endpoints (SSE, long polling, Socket.IO chat).
+Serves the same Flask app (shared models and config) on gevent, so every open
+connection is a greenlet instead of a worker thread. Blocking calls in the
+controllers (time.sleep, Queue.get, Redis pub/sub reads) become cooperative
+after monkey patching, so one process can hold tens of thousands of idle streams.
+
+With GATEWAY_UPSTREAM set (startup.sh does), only streaming paths are served here;
+every other request is forwarded to the threaded REST pool, so CPU work such as
+bcrypt or large JSON responses runs on other cores and never stalls open streams.
+
+Run directly:   python gateway.py
+Or via gunicorn: gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker gateway:application
+"""
+import os
+
+# Must happen before anything imports socket/threading/time
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+# Image decoding would block the event loop; image_worker.py processes do it instead
+os.environ.setdefault('IMAGE_WORKERS', '0')
+from gevent import monkey
+monkey.patch_all()
+
+import re
+import sys
+import http.client
+import json
+import logging
+from urllib.parse import parse_qs, quote, urlsplit
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+from app import app, socketio
+from config.settings import Config
+
+# Served by the gateway itself: SSE streams, long polls and Socket.IO
+STREAMING_PATHS = re.compile(r'^/socket\.io/|/stream$|^/api/v1/orders/\d+/track$|^/api/v1/events/?$')
+# Not forwarded to the upstream (end-to-end headers only)
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailers', 'transfer-encoding', 'upgrade'}
+
+
+def is_streaming(environ) -> bool:
+    path = environ.get('PATH_INFO', '')
+    if STREAMING_PATHS.search(path):
+        return True
+    # Image job long polls: GET /api/v1/image-jobs/<id>?wait=N
+    return path.startswith('/api/v1/image-jobs/') and 'wait' in parse_qs(environ.get('QUERY_STRING', ''))
+
+
+def _upstream_headers(environ) -> dict:
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            name = key[5:].replace('_', '-').title()
+            if name.lower() not in HOP_BY_HOP:
+                headers[name] = value
+    if environ.get('CONTENT_TYPE'):
+        headers['Content-Type'] = environ['CONTENT_TYPE']
+    if environ.get('CONTENT_LENGTH'):
+        headers['Content-Length'] = environ['CONTENT_LENGTH']
+    forwarded = headers.get('X-Forwarded-For')
+    remote = environ.get('REMOTE_ADDR', '')
+    headers['X-Forwarded-For'] = f'{forwarded}, {remote}' if forwarded else remote
+    headers.setdefault('X-Forwarded-Proto', environ.get('wsgi.url_scheme', 'http'))
+    return headers
+
+
+def forward(environ, start_response):
+    """Pass a regular REST request to the threaded pool, streaming both bodies through."""
+    upstream = urlsplit(Config.GATEWAY_UPSTREAM)
+    target = environ.get('RAW_URI') or (
+        quote(environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''), safe="/;:@&=+$,%~!*'()")
+        + (f"?{environ['QUERY_STRING']}" if environ.get('QUERY_STRING') else ''))
+    headers = _upstream_headers(environ)
+    body = None
+    if 'Content-Length' in headers or 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower():
+        stream = environ['wsgi.input']
+        body = iter(lambda: stream.read(64 * 1024), b'')
+    conn = http.client.HTTPConnection(upstream.hostname, upstream.port or 80,
+                                      timeout=Config.GATEWAY_UPSTREAM_TIMEOUT)
+    try:
+        conn.request(environ['REQUEST_METHOD'], target, body=body, headers=headers)
+        resp = conn.getresponse()
+    except (OSError, http.client.HTTPException) as e:
+        conn.close()
+        logger.error(f"REST pool unavailable: {e}")
+        start_response('502 Bad Gateway', [('Content-Type', 'application/json'), ('Retry-After', '1')])
+        return [json.dumps({'success': False, 'error': 'upstream_unavailable'}).encode()]
+    start_response(f'{resp.status} {resp.reason}',
+                   [(k, v) for k, v in resp.getheaders() if k.lower() not in HOP_BY_HOP])
+
+    def relay():
+        try:
+            for chunk in iter(lambda: resp.read1(64 * 1024), b''):
+                yield chunk
+        finally:
+            conn.close()
+    return relay()
+
+
+def application(environ, start_response):
+    """WSGI callable for gunicorn's gevent websocket worker."""
+    if Config.GATEWAY_UPSTREAM and not is_streaming(environ):
+        return forward(environ, start_response)
+    return app(environ, start_response)
+
+if __name__ == "__main__":
+    try:
+        port = int(os.environ.get('PORT', 8000))
+        logger.info(f"Starting real-time gateway on port {port} "
+                    f"(max {Config.GATEWAY_MAX_CONNECTIONS} connections)")
+        socketio.run(
+            app,
+            host='0.0.0.0',
+            port=port,
+            debug=False,
+            use_reloader=False,
+            log_output=True,
+            spawn=Config.GATEWAY_MAX_CONNECTIONS
+        )
+    except Exception as e:
+        logger.error(f"Gateway error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
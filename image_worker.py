@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Image worker for Feature 7 (image upload processing).
+Decoding, background flattening and JPEG encoding are CPU-bound; run here they use their
+own processes (and GIL) instead of competing with request handling in the web process.
+Each process claims pending jobs from the image_jobs queue, so throughput scales with
+--processes up to the number of cores. Uploads are read from IMAGE_SPOOL_DIR when the
+web process runs on the same host.
+
+Run:  python image_worker.py [--processes N] [--threads N]
+Pair it with IMAGE_WORKERS=0 on the web process (gateway.py sets that default).
+The parent brings the image_jobs schema up to date, then supervises the worker processes:
+a process that dies is restarted, and SIGTERM/SIGINT stop them all after their current job.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+RESTART_BACKOFF_MAX = 60  # seconds between restarts of a process that keeps dying at startup
+
+
+def create_worker_app(migrate: bool = False):
+    """Just enough of the app for database access (no blueprints, sockets or streams).
+    With `migrate`, also create/upgrade the tables the worker uses, in case it starts before
+    the web app has migrated the database."""
+    from flask import Flask
+    from sqlalchemy import inspect
+    from config.settings import Config
+    from implementations.extensions import db
+    from implementations.schema import migrate_image_jobs
+    from implementations.feature7_image_upload.models.image_job import ImageJob  # noqa: F401 (create_all)
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    if migrate:
+        with app.app_context():
+            try:
+                db.create_all()
+                migrate_image_jobs(inspect(db.engine))
+            except Exception as e:
+                logger.error(f"Image job schema migration failed: {e}")  # the pool retries its queries
+    return app
+
+
+def run_worker(threads: int):
+    from implementations.feature7_image_upload.services.image_queue import image_queue
+    from implementations.feature7_image_upload.services.image_processing import process_job
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    image_queue.workers = threads
+    image_queue.init_app(create_worker_app(), process_job)
+    logger.info(f"Image worker started ({threads} thread(s))")
+    while not stop.wait(1):
+        pass
+    image_queue.stop()
+    for thread in image_queue.threads:
+        thread.join(timeout=30)  # let in-flight jobs finish
+    logger.info("Image worker stopped")
+
+
+def main():
+    from config.settings import Config
+    parser = argparse.ArgumentParser(description='Process queued image jobs')
+    parser.add_argument('--processes', type=int, default=Config.IMAGE_PROCESSES)
+    parser.add_argument('--threads', type=int, default=Config.IMAGE_WORKER_THREADS)
+    args = parser.parse_args()
+
+    create_worker_app(migrate=True)  # once, before any worker queries image_jobs
+
+    ctx = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+
+    def spawn(n):
+        child = ctx.Process(target=run_worker, args=(args.threads,), name=f'image-worker-{n}')
+        child.start()
+        return child
+
+    children = [spawn(n) for n in range(max(1, args.processes))]
+    started = [time.time()] * len(children)
+    backoff = [1] * len(children)
+    restart_at = [0.0] * len(children)
+
+    def forward(signum, _frame):
+        stopping.set()
+        for child in children:
+            if child.is_alive():
+                child.terminate()  # SIGTERM: each child finishes its current job and exits
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    while not stopping.wait(1):
+        for n, child in enumerate(children):
+            if child.is_alive():
+                continue
+            if not restart_at[n]:
+                # Quick deaths (bad config, database down) back off; a long run resets the delay
+                backoff[n] = 1 if time.time() - started[n] > RESTART_BACKOFF_MAX else \
+                    min(backoff[n] * 2, RESTART_BACKOFF_MAX)
+                restart_at[n] = time.time() + backoff[n]
+                logger.warning(f"{child.name} exited with code {child.exitcode}; restarting in {backoff[n]}s")
+            elif time.time() >= restart_at[n] and not stopping.is_set():
+                children[n] = spawn(n)
+                started[n], restart_at[n] = time.time(), 0.0
+    for child in children:
+        if child.is_alive():
+            child.terminate()  # one spawned while the signal arrived
+        child.join()
+
+
+if __name__ == "__main__":
+    main()
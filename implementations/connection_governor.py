@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional
+from flask import g, jsonify, make_response, request, Response
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from config.settings import Config
+from implementations.sse import sse_event
+
+# Admission control shared by every long-lived connection (SSE, long polling, Socket.IO)
+
+
+class StreamLease:
+    """One admitted connection. Generators call touch() when they deliver data
+    and stop once should_close() is true (idle eviction or shutdown)."""
+    def __init__(self, endpoint: str, client: str, idle_timeout: float):
+        self.endpoint = endpoint
+        self.client = client
+        self.idle_timeout = idle_timeout
+        self.opened_at = time.time()
+        self.last_activity = self.opened_at
+        self.closed = False
+        self.released = False
+
+    def touch(self):
+        self.last_activity = time.time()
+
+    def is_idle(self) -> bool:
+        return bool(self.idle_timeout) and time.time() - self.last_activity > self.idle_timeout
+
+    def should_close(self) -> bool:
+        return self.closed or self.is_idle()
+
+    @property
+    def close_reason(self) -> str:
+        return 'shutdown' if self.closed else 'idle'
+
+
+class ConnectionGovernor:
+    """Caps open streams globally, per endpoint and per client, and keeps live gauges."""
+    def __init__(self, max_total: int, max_per_endpoint: Dict[str, int], default_per_endpoint: int,
+                 max_per_client: int, idle_timeout: float):
+        self.max_total = max_total
+        self.max_per_endpoint = max_per_endpoint
+        self.default_per_endpoint = default_per_endpoint
+        self.max_per_client = max_per_client
+        self.idle_timeout = idle_timeout
+        self.open_by_endpoint: Dict[str, int] = {}
+        self.open_by_client: Dict[str, int] = {}
+        self.rejected_by_endpoint: Dict[str, int] = {}
+        self.evicted_by_endpoint: Dict[str, int] = {}
+        self.total = 0
+        self.leases = set()
+        self.draining = False
+        self.lock = threading.Lock()
+
+    def endpoint_limit(self, endpoint: str) -> int:
+        return self.max_per_endpoint.get(endpoint, self.default_per_endpoint)
+
+    def acquire(self, endpoint: str, client: str) -> Optional[StreamLease]:
+        """Admit a connection or return None when any cap is reached."""
+        with self.lock:
+            if (self.draining
+                    or self.total >= self.max_total
+                    or self.open_by_endpoint.get(endpoint, 0) >= self.endpoint_limit(endpoint)
+                    or self.open_by_client.get(client, 0) >= self.max_per_client):
+                self.rejected_by_endpoint[endpoint] = self.rejected_by_endpoint.get(endpoint, 0) + 1
+                return None
+            self.total += 1
+            self.open_by_endpoint[endpoint] = self.open_by_endpoint.get(endpoint, 0) + 1
+            self.open_by_client[client] = self.open_by_client.get(client, 0) + 1
+            lease = StreamLease(endpoint, client, self.idle_timeout)
+            self.leases.add(lease)
+        return lease
+
+    def release(self, lease: Optional[StreamLease]):
+        """Return the slot. Safe to call more than once."""
+        if lease is None:
+            return
+        with self.lock:
+            if lease.released:
+                return
+            lease.released = True
+            self.leases.discard(lease)
+            if lease.is_idle():
+                self.evicted_by_endpoint[lease.endpoint] = self.evicted_by_endpoint.get(lease.endpoint, 0) + 1
+            self.total -= 1
+            self._decrement(self.open_by_endpoint, lease.endpoint)
+            self._decrement(self.open_by_client, lease.client)
+
+    @staticmethod
+    def _decrement(counter: Dict[str, int], key: str):
+        counter[key] = counter.get(key, 0) - 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def drain(self):
+        """Stop admitting connections and ask every open stream to close."""
+        with self.lock:
+            self.draining = True
+            for lease in self.leases:
+                lease.closed = True
+
+    def wait_drained(self, timeout: float) -> bool:
+        """Block until all streams have been released or the timeout passes."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if self.total <= 0:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def stats(self) -> dict:
+        with self.lock:
+            names = set(self.open_by_endpoint) | set(self.rejected_by_endpoint) | set(self.max_per_endpoint)
+            return {
+                'open': self.total,
+                'max_total': self.max_total,
+                'draining': self.draining,
+                'clients': len(self.open_by_client),
+                'endpoints': {
+                    name: {
+                        'open': self.open_by_endpoint.get(name, 0),
+                        'limit': self.endpoint_limit(name),
+                        'rejected': self.rejected_by_endpoint.get(name, 0),
+                        'evicted_idle': self.evicted_by_endpoint.get(name, 0)
+                    } for name in sorted(names)
+                }
+            }
+
+
+def retry_after_seconds() -> int:
+    """Jittered back-off so rejected clients do not all come back together."""
+    base = Config.STREAM_RETRY_AFTER
+    return int(base + random.uniform(0, base))
+
+
+def retry_hint_ms(retry_after: Optional[int] = None) -> int:
+    """Value for an SSE `retry:` field, jittered to the millisecond."""
+    if retry_after is None:
+        retry_after = retry_after_seconds()
+    return retry_after * 1000 + random.randint(0, 999)
+
+
+def reconnect_delay_ms(reason: str) -> int:
+    """On shutdown the delay is spread over STREAM_DRAIN_RETRY_SPREAD so clients do not return at once."""
+    if reason == 'shutdown':
+        return random.randint(1000, max(1000, Config.STREAM_DRAIN_RETRY_SPREAD * 1000))
+    return retry_hint_ms()
+
+
+def closing_event(reason: str) -> str:
+    """Final SSE block: the server is closing the stream, reconnect after a jittered delay."""
+    delay = reconnect_delay_ms(reason)
+    return f'retry: {delay}\n' + sse_event({'reason': reason, 'retry_ms': delay}, event='reconnect')
+
+
+def client_key() -> str:
+    """Identify the caller: the authenticated user when a valid JWT is sent, else the
+    originating address. Never a caller-supplied id, which could change per connection."""
+    try:
+        if verify_jwt_in_request(optional=True) is not None:
+            return f'user:{get_jwt_identity()}'
+    except Exception:
+        pass  # missing, expired or invalid token: fall back to the address
+    return client_address()
+
+
+def client_address() -> str:
+    """Originating address. Only the last TRUSTED_PROXY_HOPS X-Forwarded-For entries were
+    added by our own proxies; anything before them is whatever the caller sent."""
+    forwarded = [a.strip() for a in request.headers.get('X-Forwarded-For', '').split(',') if a.strip()]
+    chain = forwarded + [request.remote_addr or 'unknown']
+    return chain[max(0, len(chain) - 1 - Config.TRUSTED_PROXY_HOPS)]
+
+
+def overloaded_response(endpoint: str, sse: bool) -> Response:
+    """Fast 503 with Retry-After; SSE callers also get a jittered `retry:` hint in the body."""
+    retry_after = retry_after_seconds()
+    if sse:
+        body = f'retry: {retry_hint_ms(retry_after)}\n' + sse_event(
+            {'error': 'too_many_streams', 'endpoint': endpoint}, event='overloaded')
+        resp = Response(body, status=503, mimetype='text/event-stream')
+    else:
+        resp = make_response(jsonify({
+            'success': False,
+            'error': 'too_many_streams',
+            'message': 'Server is at its connection limit, retry later',
+            'retry_after': retry_after
+        }), 503)
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
+
+
+def current_lease() -> StreamLease:
+    """Lease of the request being served (a non-expiring one outside governed views)."""
+    lease = g.get('stream_lease')
+    if lease is None:
+        lease = StreamLease('ungoverned', 'local', 0)
+    return lease
+
+
+def governed(endpoint: str, sse: bool = True):
+    """Decorator: admit the request through the governor and release when the response closes."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            lease = governor.acquire(endpoint, client_key())
+            if lease is None:
+                return overloaded_response(endpoint, sse)
+            g.stream_lease = lease
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except Exception:
+                governor.release(lease)
+                raise
+            if resp.is_streamed:
+                resp.call_on_close(lambda: governor.release(lease))
+            else:
+                governor.release(lease)
+            return resp
+        return wrapper
+    return decorator
+
+
+# Global governor (per worker process)
+governor = ConnectionGovernor(
+    max_total=Config.STREAM_MAX_TOTAL,
+    max_per_endpoint=Config.STREAM_MAX_PER_ENDPOINT,
+    default_per_endpoint=Config.STREAM_MAX_DEFAULT_PER_ENDPOINT,
+    max_per_client=Config.STREAM_MAX_PER_CLIENT,
+    idle_timeout=Config.STREAM_IDLE_TIMEOUT
+)
@@ -23,13 +23,17 @@ class User(db.Model):
     # Relationships
     payment_methods = db.relationship('PaymentMethod', backref='user', lazy=True, cascade='all, delete-orphan')
 
-    def __init__(self, email, password, first_name, last_name, phone=None, role: str = 'customer'):
+    def __init__(self, email, password, first_name, last_name, phone=None, role: str = 'customer', password_hash=None):
         self.email = email.lower().strip()
         self.first_name = first_name.strip()
         self.last_name = last_name.strip()
         self.phone = phone.strip() if phone else None
         self.role = (role or 'customer').strip().lower()
-        self.set_password(password)
+        if password_hash:
+            # Pre-computed hash (e.g. shared placeholder for synthetic chat users)
+            self.password_hash = password_hash
+        else:
+            self.set_password(password)
 
     def set_password(self, password):
         """Hash and set password."""
@@ -5,6 +5,8 @@ import json
 from implementations.feature2_order_tracking.services.order_service import order_service
 from implementations.feature1_account_management.models.user import User
 from implementations.feature4_restaurant_notifications.services.redis_client import get_redis
+from implementations.connection_governor import governed, current_lease, reconnect_delay_ms
+from implementations.extensions import db
 import redis.exceptions
 
 order_bp = Blueprint('order_tracking', __name__, url_prefix='/api/v1/orders')
@@ -17,6 +19,7 @@ def get_order(order_id):
     return jsonify({'success': True, 'data': order.to_dict()})
 
 @order_bp.route('/<int:order_id>/track', methods=['GET'])
+@governed('order_track', sse=False)
 def track_order_long_polling(order_id):
     last_status = request.args.get('last_status')
     timeout = int(request.args.get('timeout', 30))
@@ -38,23 +41,30 @@ def track_order_long_polling(order_id):
     # If status already different right away
     if order.status != last_status:
         return jsonify({'success': True, 'data': order.to_dict(), 'has_update': True})
+    db.session.rollback()
 
     # Poll until status changes or timeout
+    lease = current_lease()
     start = time.time()
     interval = 2
-    while time.time() - start < timeout:
+    while time.time() - start < timeout and not lease.closed:
         current = order_service.get_order(order_id)
         if not current:
             return jsonify({'success': False, 'error': 'order_not_found'}), 404
         if current.status != last_status:
             return jsonify({'success': True, 'data': current.to_dict(), 'has_update': True})
+        db.session.rollback()  # hand the connection back to the pool while waiting
         time.sleep(interval)
 
     # Timeout without change
     current = order_service.get_order(order_id)
     if not current:
         return jsonify({'success': False, 'error': 'order_not_found'}), 404
-    return jsonify({'success': True, 'data': current.to_dict(), 'has_update': False})
+    payload = {'success': True, 'data': current.to_dict(), 'has_update': False}
+    if lease.closed:
+        # Worker is shutting down: spread the clients' next polls instead of an instant re-poll
+        payload['retry_after_ms'] = reconnect_delay_ms('shutdown')
+    return jsonify(payload)
 
 @order_bp.route('/customer/<int:customer_id>', methods=['GET'])
 def get_customer_orders(customer_id):
@@ -1,5 +1,7 @@
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask import Blueprint, request, jsonify, stream_with_context
 import json, time
+from implementations.sse import sse_response
+from implementations.connection_governor import governed, current_lease, closing_event
 from implementations.feature3_driver_location.services.location_service import location_service
 from implementations.feature3_driver_location.models.driver import Driver, db
 
@@ -85,6 +87,7 @@ def get_driver_location(order_id):
     return (jsonify({'success': True, 'data': location_data}), 200) if location_data else (jsonify({'success': False, 'error': 'no_location_available'}), 404)
 
 @customer_bp.route('/order/<int:order_id>/stream', methods=['GET'])
+@governed('driver_location')
 def stream_driver_location(order_id):
     """Stream driver location using SSE WITHOUT queue/stream_manager.
     Simple polling of DB every 1s; emits only on change + keepalive every 15s."""
@@ -92,12 +95,15 @@ def stream_driver_location(order_id):
     if not customer_id:
         return jsonify({'success': False, 'error': 'customer_id_required'}), 400
 
+    lease = current_lease()
+
     def event_stream():
         last_payload = None
         last_emit_ts = 0
         last_keepalive = time.time()
         # send current once if exists
         first = location_service.get_driver_current_location(order_id)
+        db.session.rollback()  # no connection held between polls
         if first:
             last_payload = first
             yield f"data: {json.dumps(first)}\n\n"
@@ -105,10 +111,15 @@ def stream_driver_location(order_id):
         try:
             while True:
                 time.sleep(1)
+                if lease.should_close():
+                    yield closing_event(lease.close_reason)
+                    return
                 current = location_service.get_driver_current_location(order_id)
+                db.session.rollback()
                 if current and current != last_payload:
                     last_payload = current
                     last_emit_ts = time.time()
+                    lease.touch()
                     yield f"data: {json.dumps(current)}\n\n"
                 # keepalive every 15s of no data changes
                 now = time.time()
@@ -119,12 +130,4 @@ def stream_driver_location(order_id):
             # client disconnected
             return
 
-    return Response(
-        stream_with_context(event_stream()),
-        headers={
-            'Content-Type': 'text/event-stream; charset=utf-8',
-            'Cache-Control': 'no-cache, no-transform',
-            'Connection': 'keep-alive',
-            'X-Accel-Buffering': 'no'
-        }
-    )
+    return sse_response(stream_with_context(event_stream()))
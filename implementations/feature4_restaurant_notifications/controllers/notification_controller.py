@@ -1,6 +1,8 @@
-from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask import Blueprint, request, jsonify, stream_with_context
 import json, time
 from implementations.feature4_restaurant_notifications.services.redis_client import get_redis
+from implementations.sse import sse_response, collect_batch, format_batch, wants_batch
+from implementations.connection_governor import governed, current_lease, closing_event
 import redis.exceptions  # added for error handling
 
 notification_bp = Blueprint('restaurant_notifications', __name__, url_prefix='/api/v1')
@@ -11,9 +13,11 @@ PING_INTERVAL = 15  # keep-alive comment every 15s
 RETRY_MS = 3000     # client reconnection hint
 
 @notification_bp.route('/orders/stream')
+@governed('orders')
 def simple_orders_stream():
     """Simple SSE endpoint streaming every published message from Redis channel 'orders'.
-    Each published message is sent verbatim as one SSE data block.
+    Each published message is sent verbatim as one SSE data block. Messages arriving
+    within the batch window are written together; with ?batch=1 they form one JSON array event.
     """
     # Graceful Redis connection error handling
     try:
@@ -36,6 +40,20 @@ def simple_orders_stream():
             'message': f'Service error: {str(e)}'
         }), 503
 
+    as_array = wants_batch()
+    lease = current_lease()
+
+    def next_data(timeout):
+        """Return the next published payload or None when the timeout elapses."""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            message = pubsub.get_message(timeout=remaining)
+            if message and message.get('type') == 'message':
+                return message['data']  # already a string (decode_responses=True)
+
     def event_stream():
         last_ping = time.time()
         # Tell browser how long to wait before auto-reconnect
@@ -43,7 +61,8 @@ def simple_orders_stream():
         try:
             while True:
                 try:
-                    message = pubsub.get_message(timeout=1.0)
+                    data = next_data(1.0)
+                    batch = collect_batch(data, next_data) if data is not None else None
                 except redis.exceptions.ConnectionError:
                     yield 'event: error\ndata: {"error":"redis_lost","message":"Lost Redis connection"}\n\n'
                     break
@@ -52,22 +71,21 @@ def simple_orders_stream():
                     # Comment line acts as keep-alive
                     yield ': ping\n\n'
                     last_ping = now
-                if message and message.get('type') == 'message':
-                    data = message['data']  # already a string (decode_responses=True)
-                    # One SSE event (default event type 'message')
-                    yield f'data: {data}\n\n'
+                if batch:
+                    # Coalesced events go out in a single write
+                    lease.touch()
+                    yield format_batch(batch, as_array)
+                if lease.should_close():
+                    # Idle eviction or worker shutdown: buffered events were flushed above
+                    yield closing_event(lease.close_reason)
+                    break
         finally:
             try: pubsub.unsubscribe(ORDERS_CHANNEL)
             except Exception: pass
             try: pubsub.close()
             except Exception: pass
 
-    headers = {
-        'Content-Type': 'text/event-stream',
-        'Cache-Control': 'no-cache',
-        'Connection': 'keep-alive'
-    }
-    return Response(stream_with_context(event_stream()), headers=headers)
+    return sse_response(stream_with_context(event_stream()))
 
 @notification_bp.route('/orders', methods=['POST'])
 def publish_order():
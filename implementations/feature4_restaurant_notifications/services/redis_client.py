@@ -25,6 +25,16 @@ def get_redis() -> redis.Redis:
 def get_pubsub():
     return get_redis().pubsub()
 
+def close_redis():
+    """Disconnect pooled connections (called after streams are drained on shutdown)."""
+    global _redis
+    if _redis is not None:
+        try:
+            _redis.close()
+        except Exception:
+            pass
+        _redis = None
+
 def main():
     r = get_redis()
 
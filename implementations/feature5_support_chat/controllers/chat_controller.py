@@ -1,17 +1,44 @@
-from flask import Blueprint, send_from_directory
+from flask import Blueprint, send_from_directory, request, jsonify, current_app
 from flask_socketio import join_room, leave_room, emit
-from datetime import datetime
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, timedelta
 import threading
-from implementations.extensions import db
+import time
+from typing import Optional
+from config.settings import Config
+from implementations.extensions import db, bcrypt
 from implementations.feature1_account_management.models.user import User
 from implementations.feature5_support_chat.models.chat import ChatSession, ChatMessage
+from implementations.feature5_support_chat.services.message_writer import message_writer
+from implementations.feature5_support_chat.services.presence_store import presence_store
+from implementations.feature5_support_chat.services.message_search import message_search
+from implementations.feature5_support_chat.services.chat_digest import chat_digest
+from implementations.feature5_support_chat.services.chat_archive import ensure_hot
+from implementations.connection_governor import governor, client_key
+from implementations.shutdown import register_drain_hook
 
 # Create Blueprint for chat functionality
 chat_bp = Blueprint('support_chat', __name__, url_prefix='/api/v1/chat')
 
+# History paging (newest page first, then `before=<message_id>` cursors)
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Agent chat list paging
+CHAT_LIST_PAGE_SIZE = 50
+CHAT_LIST_MAX_PAGE_SIZE = 200
+CHAT_LIST_RECENT_DAYS = 30  # default window; days=0 lists every session
+
+# Message search paging
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
 # Global chat state - moved from feature5 app.py
-typing_users = {}  # chat_id -> set of usernames
 chat_lock = threading.Lock()
+socket_leases = {}  # sid -> connection governor lease
+socket_identities = {}  # sid -> {'user_id', 'user', 'role', 'chat_ids'} resolved at handshake/subscribe
+typing_sent = {}  # sid -> {chat_id: (username, sent_at)} typing broadcasts per socket, for debouncing and cleanup
+_placeholder_hash = None  # bcrypt hash shared by synthetic chat users, computed once
 
 # Utility helper functions (extracted from feature5 app.py)
 def _get_or_create_user(username: str, role: str) -> User:
@@ -22,36 +49,138 @@ def _get_or_create_user(username: str, role: str) -> User:
         email = f"{username.lower()}@local.test"
     user = User.query.filter_by(email=email).first()
     if not user:
+        global _placeholder_hash
+        if _placeholder_hash is None:
+            _placeholder_hash = bcrypt.generate_password_hash('Temp1234!!').decode('utf-8')
         # Simple placeholder names
         first = username.split('@')[0][:30] or 'User'
-        user = User(email=email, password='Temp1234!!', first_name=first, last_name=role.capitalize())
+        user = User(email=email, password=None, first_name=first, last_name=role.capitalize(),
+                    password_hash=_placeholder_hash)
         db.session.add(user)
         db.session.commit()
     return user
 
-def _chat_history(chat_id: int):
-    msgs = (ChatMessage.query
-            .filter(ChatMessage.chat_id == chat_id)
-            .order_by(ChatMessage.id.asc())
-            .all())
-    return [m.to_dict() for m in msgs]
+def _bind_identity(user: User, username: str, role: str, chat_id: int = None) -> dict:
+    """Cache who is behind this socket so later events skip the user/session lookups."""
+    identity = {'user_id': user.id, 'user': username, 'role': role,
+                'sender': user.email.split('@')[0], 'chat_ids': set()}
+    if chat_id:
+        identity['chat_ids'].add(chat_id)
+    with chat_lock:
+        socket_identities[request.sid] = identity
+    return identity
+
+def _bound_identity() -> Optional[dict]:
+    """Identity bound to the current socket at customer_handshake / agent_subscribe."""
+    with chat_lock:
+        return socket_identities.get(request.sid)
+
+def _identity_for(username: str, role: str) -> dict:
+    """Identity bound to the current socket; resolved (once) if the socket never identified
+    itself or is bound to a different user or role."""
+    identity = _bound_identity()
+    if identity and identity['user'] == username and identity['role'] == role:
+        return identity
+    return _bind_identity(_get_or_create_user(username, role), username, role)
+
+def _page_size(value, default: int, maximum: int) -> int:
+    try:
+        return min(max(int(value or default), 1), maximum)
+    except (TypeError, ValueError):
+        return default
+
+def _chat_history(chat_id: int, before: int = None, limit: int = None):
+    """One page of history: the newest `limit` messages older than message id `before`,
+    returned oldest first. `next_before` is the cursor for the page before this one."""
+    limit = _page_size(limit, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+    query = ChatMessage.query.filter(ChatMessage.chat_id == chat_id)
+    if str(before or '').isdigit():
+        query = query.filter(ChatMessage.id < int(before))
+    msgs = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(msgs) > limit
+    page = list(reversed(msgs[:limit]))
+    return {
+        'history': [m.to_dict() for m in page],
+        'has_more': has_more,
+        'next_before': page[0].id if has_more and page else None
+    }
 
 def _session_summary(session: ChatSession):
-    last_msg = (ChatMessage.query
-                .filter(ChatMessage.chat_id == session.id)
-                .order_by(ChatMessage.id.desc())
-                .first())
+    """Built from the denormalized columns on ChatSession (no message query)."""
     return {
         'chat_id': session.id,
         'customer': session.customer.email.split('@')[0],
         'created_ts': session.created_at.isoformat(),
-        'last_text': last_msg.text if last_msg else '',
-        'last_ts': (last_msg.created_at if last_msg else session.created_at).isoformat()
+        'last_text': session.last_message_text or '',
+        'last_ts': (session.last_message_at or session.created_at).isoformat(),
+        'last_activity_ts': session.last_activity_at.isoformat(),
+        'unread': session.unread_agent_count or 0
     }
 
-def _list_chats():
-    sessions = ChatSession.query.order_by(ChatSession.last_activity_at.desc()).all()
-    return [_session_summary(s) for s in sessions]
+def _list_chats(limit: int = None, before: str = None, days=None):
+    """One page of sessions, newest activity first, in a single query.
+    `before` is the `next_cursor` ("<last_activity_ts>|<chat_id>") of the previous page; the id
+    breaks ties so sessions sharing a timestamp at a page boundary are not skipped.
+    `days` limits the list to sessions active that recently (default CHAT_LIST_RECENT_DAYS, 0 = all)."""
+    limit = _page_size(limit, CHAT_LIST_PAGE_SIZE, CHAT_LIST_MAX_PAGE_SIZE)
+    days = int(days) if str(days if days is not None else '').isdigit() else CHAT_LIST_RECENT_DAYS
+    query = ChatSession.query
+    if days:
+        query = query.filter(ChatSession.last_activity_at >= datetime.utcnow() - timedelta(days=days))
+    if before:
+        ts, _, last_id = str(before).partition('|')
+        try:
+            ts = datetime.fromisoformat(ts)
+        except ValueError:
+            ts = None
+        if ts is not None and last_id.isdigit():
+            query = query.filter(db.or_(ChatSession.last_activity_at < ts,
+                                        db.and_(ChatSession.last_activity_at == ts, ChatSession.id < int(last_id))))
+        elif ts is not None:
+            query = query.filter(ChatSession.last_activity_at < ts)
+    sessions = query.order_by(ChatSession.last_activity_at.desc(), ChatSession.id.desc()).limit(limit + 1).all()
+    page = sessions[:limit]
+    next_cursor = f"{page[-1].last_activity_at.isoformat()}|{page[-1].id}" if len(sessions) > limit else None
+    return {'chats': [_session_summary(s) for s in page], 'next_cursor': next_cursor}
+
+def _typing_should_broadcast(sid: str, cid: str, username: str, is_typing: bool) -> bool:
+    """Debounce: start/stop always go out, a repeated "still typing" at most once per interval."""
+    now = time.time()
+    with chat_lock:
+        sent = typing_sent.setdefault(sid, {})
+        last = sent.get(cid)
+        if not is_typing:
+            # Nothing to clear unless this socket was announced as typing
+            return sent.pop(cid, None) is not None
+        if last and now - last[1] < Config.CHAT_TYPING_DEBOUNCE_MS / 1000.0:
+            return False
+        sent[cid] = (username, now)
+        return True
+
+def _typing_status(cid: str) -> dict:
+    """Everyone currently typing in the chat (sent to the rest of the room, so the typist is included)."""
+    return {'chat_id': int(cid), 'users': presence_store.members(f'typing:{cid}'),
+            'expires_in': Config.CHAT_TYPING_TTL}
+
+def _agent_presence() -> dict:
+    """{agent: 'online' | 'offline'} for every agent seen within CHAT_PRESENCE_SEEN_TTL.
+    Online members are stored per socket ("<sid>:<agent>") so one closed tab does not hide an agent."""
+    online = {m.split(':', 1)[1] for m in presence_store.members('agents:online')}
+    seen = set(presence_store.members('agents:seen')) | online
+    return {name: ('online' if name in online else 'offline') for name in sorted(seen)}
+
+def _agent_online(username: str) -> bool:
+    return any(m.split(':', 1)[1] == username for m in presence_store.members('agents:online'))
+
+def _mark_agent(sid: str, username: str, online: bool) -> bool:
+    """Record an agent socket coming or going; True when the agent's online state flipped."""
+    was_online = _agent_online(username)
+    if online:
+        presence_store.touch('agents:online', f'{sid}:{username}', Config.CHAT_PRESENCE_TTL)
+        presence_store.touch('agents:seen', username, Config.CHAT_PRESENCE_SEEN_TTL)
+    else:
+        presence_store.remove('agents:online', f'{sid}:{username}')
+    return was_online != _agent_online(username)
 
 # HTTP routes for serving chat static files
 @chat_bp.route('/client')
@@ -59,9 +188,49 @@ def chat_client():
     """Serve the chat client HTML file"""
     return send_from_directory('implementations/feature5_support_chat/static', 'chat_client.html')
 
+@chat_bp.route('/sessions', methods=['GET'])
+def list_sessions():
+    """Paginated agent chat list: ?limit=50&before=<next_cursor>&days=30 (days=0: all sessions)"""
+    return jsonify({'success': True, **_list_chats(request.args.get('limit', type=int), request.args.get('before'),
+                                                   request.args.get('days'))})
+
+@chat_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_messages():
+    """Full-text search: ?q=refund&chat_id=<optional>&limit=20&before=<next_before>.
+    Employees search every chat, customers only their own (as the socket 'search' event)."""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'success': False, 'error': 'query_required'}), 400
+    user = db.session.get(User, int(get_jwt_identity()))
+    if not user:
+        return jsonify({'success': False, 'error': 'forbidden'}), 403
+    chat_id = request.args.get('chat_id', type=int)
+    chat_ids = [chat_id] if chat_id else None
+    if user.role != 'employee':
+        own = [row.id for row in ChatSession.query.with_entities(ChatSession.id).filter_by(customer_user_id=user.id)]
+        chat_ids = [c for c in (chat_ids or own) if c in own]
+    page = message_search.search(q, chat_ids, request.args.get('before', type=int),
+                                 _page_size(request.args.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE))
+    return jsonify({'success': True, 'query': q, **page})
+
+@chat_bp.route('/agents/presence', methods=['GET'])
+def agents_presence():
+    """Online/offline map of recently seen support agents"""
+    return jsonify({'success': True, 'agents': _agent_presence()})
+
+@chat_bp.route('/<int:chat_id>/messages', methods=['GET'])
+def chat_messages(chat_id):
+    """Paginated history: ?limit=50&before=<message_id>"""
+    if not ensure_hot(ChatSession.query.filter_by(id=chat_id).first()):
+        return jsonify({'success': False, 'error': 'chat_not_found'}), 404
+    page = _chat_history(chat_id, request.args.get('before', type=int), request.args.get('limit', type=int))
+    return jsonify({'success': True, 'chat_id': chat_id, **page})
+
 # SocketIO event handlers (to be registered with the main app's socketio instance)
 def register_chat_socketio_handlers(socketio):
     """Register all chat-related SocketIO event handlers with the main socketio instance"""
+    chat_digest.init_socketio(socketio)
     
     @socketio.on('customer_handshake')
     def customer_handshake(data):
@@ -75,11 +244,20 @@ def register_chat_socketio_handlers(socketio):
             db.session.add(session)
             db.session.commit()
             new_chat = True
+        else:
+            # A returning customer gets an archived conversation back transparently
+            ensure_hot(session)
+        if session.unread_customer_count:
+            session.unread_customer_count = 0
+            db.session.commit()
+        _bind_identity(user, username, 'customer', session.id)
         join_room(str(session.id))
-        history = _chat_history(session.id)
+        page = _chat_history(session.id)
         emit('customer_chat', {
             'chat_id': session.id,
-            'history': history,
+            'history': page['history'],
+            'has_more': page['has_more'],
+            'next_before': page['next_before'],
             'user': username,
             'new_chat': new_chat
         })
@@ -88,26 +266,80 @@ def register_chat_socketio_handlers(socketio):
                 'chat_id': session.id,
                 'customer': username
             }, to='agents')
+            chat_digest.record(session.id, customer=user.email.split('@')[0],
+                               last_activity_ts=session.last_activity_at.isoformat(), unread=0)
 
     @socketio.on('agent_subscribe')
     def agent_subscribe(data):
+        username = (data or {}).get('user') or 'agent'
+        _bind_identity(_get_or_create_user(username, 'agent'), username, 'agent')
         join_room('agents')
-        emit('chats_list', {'chats': _list_chats()})
+        emit('chats_list', _list_chats((data or {}).get('limit')))
+        if _mark_agent(request.sid, username, True):
+            emit('agent_presence', {'agents': _agent_presence()}, to='agents')
+        else:
+            emit('agent_presence', {'agents': _agent_presence()})
+
+    @socketio.on('presence_ping')
+    def presence_ping(data=None):
+        """Agents refresh their online TTL periodically; lapsed agents show as offline."""
+        with chat_lock:
+            identity = socket_identities.get(request.sid)
+        if identity and identity['role'] == 'agent' and _mark_agent(request.sid, identity['user'], True):
+            emit('agent_presence', {'agents': _agent_presence()}, to='agents')
 
     @socketio.on('get_chats')
-    def get_chats():
-        emit('chats_list', {'chats': _list_chats()})
+    def get_chats(data=None):
+        data = data or {}
+        emit('chats_list', _list_chats(data.get('limit'), data.get('before'), data.get('days')))
 
     @socketio.on('open_chat')
     def open_chat(data):
         cid = (data or {}).get('chat_id')
         if not cid:
             return
-        session = ChatSession.query.filter_by(id=cid).first()
+        session = ensure_hot(ChatSession.query.filter_by(id=cid).first())
         if not session:
             return
+        if session.unread_agent_count:
+            session.unread_agent_count = 0
+            db.session.commit()
+            chat_digest.record(session.id, unread=0)
+        with chat_lock:
+            identity = socket_identities.get(request.sid)
+            if identity:
+                identity['chat_ids'].add(session.id)
         join_room(str(cid))
-        emit('chat_opened', {'chat_id': cid, 'history': _chat_history(cid)})
+        emit('chat_opened', {'chat_id': cid, **_chat_history(cid)})
+
+    @socketio.on('load_history')
+    def load_history(data):
+        """Older messages for a chat: {chat_id, before, limit} -> 'chat_history'."""
+        data = data or {}
+        cid = data.get('chat_id')
+        if not cid or not ensure_hot(ChatSession.query.filter_by(id=cid).first()):
+            return
+        page = _chat_history(cid, data.get('before'), data.get('limit'))
+        emit('chat_history', {'chat_id': cid, 'before': data.get('before'), **page})
+
+    @socketio.on('search_messages')
+    def handle_search(data):
+        """{q, chat_id?, before?, limit?} -> 'search_results'. Customers only search their own chat."""
+        data = data or {}
+        q = (data.get('q') or '').strip()
+        if not q:
+            return
+        with chat_lock:
+            identity = socket_identities.get(request.sid)
+        if not identity:
+            return
+        chat_ids = [int(data['chat_id'])] if str(data.get('chat_id') or '').isdigit() else None
+        if identity['role'] != 'agent':
+            chat_ids = [c for c in (chat_ids or identity['chat_ids']) if c in identity['chat_ids']]
+        before = data.get('before')
+        page = message_search.search(q, chat_ids, int(before) if str(before or '').isdigit() else None,
+                                     _page_size(data.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE))
+        emit('search_results', {'query': q, 'chat_id': data.get('chat_id'), **page})
 
     @socketio.on('send_message')
     def handle_send_message(data):
@@ -117,40 +349,98 @@ def register_chat_socketio_handlers(socketio):
         text = (data.get('text') or '').strip()
         if not text:
             return
-        role = data.get('role', 'customer')
-        username = data.get('user', 'anonymous')
-        user = _get_or_create_user(username, role)
-        session = ChatSession.query.filter_by(id=cid).first()
-        if not session:
+        # The socket's bound identity wins over whatever user/role the event claims
+        identity = _bound_identity() or _identity_for(data.get('user', 'anonymous'), data.get('role', 'customer'))
+        role = identity['role']
+        try:
+            cid = int(cid)
+        except (TypeError, ValueError):
             return
-        msg = ChatMessage(chat_id=session.id, sender_user_id=user.id, role=role, text=text)
-        session.last_activity_at = datetime.utcnow()
-        db.session.add(msg)
-        db.session.commit()
-        payload = msg.to_dict()
-        emit('message', payload, to=str(session.id))
-        emit('delivered', {'chat_id': session.id, 'message_id': payload['id']})
+        if cid not in identity['chat_ids']:
+            # First message to a chat this socket has not opened: verify it exists once
+            if not ensure_hot(ChatSession.query.filter_by(id=cid).first()):
+                return
+            with chat_lock:
+                identity['chat_ids'].add(cid)
+        now = datetime.utcnow()
+        sid = request.sid
+        ack = {'chat_id': cid}
+        if data.get('client_id') is not None:
+            ack['client_id'] = data['client_id']  # lets the sender match acks to what it sent
+
+        def on_durable(message_id):
+            # Fanned out only once the row is committed (group commit, CHAT_WRITE_BATCH_WINDOW_MS)
+            payload = ChatMessage.payload(message_id, cid, identity['user_id'], identity['sender'], role, text, now)
+            socketio.emit('message', payload, to=str(cid))
+            socketio.emit('delivered', {**ack, 'message_id': message_id}, to=sid)
+            # Agents' chat lists get a small delta (merged into digest ticks under load)
+            chat_digest.record(cid, last_text=text, last_activity_ts=payload['created_at'],
+                               unread_added=1 if role == 'customer' else 0)
+
+        message_writer.submit(
+            current_app._get_current_object(),
+            {'chat_id': cid, 'sender_user_id': identity['user_id'], 'role': role, 'text': text, 'created_at': now},
+            on_durable=on_durable,
+            on_failed=lambda: socketio.emit('delivery_failed', ack, to=sid)
+        )
 
     @socketio.on('typing')
     def handle_typing(data):
         cid = str(data.get('chat_id'))
         if not cid:
             return
-        username = data.get('user', 'anonymous')
+        identity = _bound_identity()
+        if not identity:
+            return
+        username = identity['user']
         is_typing = bool(data.get('is_typing'))
-        with chat_lock:
-            typing_users.setdefault(cid, set())
-            if is_typing:
-                typing_users[cid].add(username)
-            else:
-                typing_users[cid].discard(username)
-            others = [u for u in typing_users[cid] if u != username]
-        emit('typing_status', {'chat_id': int(cid), 'users': others}, to=cid, include_self=False)
+        if not _typing_should_broadcast(request.sid, cid, username, is_typing):
+            return
+        # Shared TTL store: typing flags set on one worker are visible to all, and expire on their own.
+        # Each debounced "still typing" re-broadcast also refreshes the TTL.
+        key = f'typing:{cid}'
+        if is_typing:
+            presence_store.touch(key, username, Config.CHAT_TYPING_TTL)
+        else:
+            presence_store.remove(key, username)
+        emit('typing_status', _typing_status(cid), to=cid, include_self=False)
 
     @socketio.on('connect')
     def on_connect():
+        lease = governor.acquire('chat', client_key())
+        if lease is None:
+            # Rejects the Socket.IO handshake; the client retries with its own back-off
+            return False
+        with chat_lock:
+            socket_leases[request.sid] = lease
         emit('connected', {'message': 'connected'})
 
+    def disconnect_sockets():
+        """Shutdown drain: close every chat socket on this worker so its lease is released
+        (the client library reconnects, with its own randomized back-off, to another worker)."""
+        with chat_lock:
+            sids = list(socket_leases)
+        for sid in sids:
+            try:
+                socketio.server.disconnect(sid, namespace='/')
+            except Exception:
+                pass
+            with chat_lock:
+                lease = socket_leases.pop(sid, None)
+            governor.release(lease)  # no-op when the disconnect handler already did
+
+    register_drain_hook(disconnect_sockets)
+
     @socketio.on('disconnect')
     def on_disconnect():
-        pass
\ No newline at end of file
+        with chat_lock:
+            lease = socket_leases.pop(request.sid, None)
+            identity = socket_identities.pop(request.sid, None)
+            typing_in = typing_sent.pop(request.sid, {})
+        governor.release(lease)
+        # Clear typing flags this socket left behind so rooms do not show a ghost typist
+        for cid, (username, _) in typing_in.items():
+            presence_store.remove(f'typing:{cid}', username)
+            socketio.emit('typing_status', _typing_status(cid), to=cid)
+        if identity and identity['role'] == 'agent' and _mark_agent(request.sid, identity['user'], False):
+            socketio.emit('agent_presence', {'agents': _agent_presence()}, to='agents')
\ No newline at end of file
@@ -8,7 +8,13 @@ class ChatSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Denormalized summary, maintained on every message so the agent list needs no per-session query
+    last_message_text = db.Column(db.String(200), nullable=True)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    unread_agent_count = db.Column(db.Integer, nullable=False, default=0)     # customer messages agents have not opened
+    unread_customer_count = db.Column(db.Integer, nullable=False, default=0)  # agent replies the customer has not seen
+    archived_at = db.Column(db.DateTime, nullable=True)  # set while the messages live in chat_archives
 
     # relationship
     customer = db.relationship(User, lazy='joined')
@@ -20,9 +26,29 @@ class ChatSession(db.Model):
             'customer_user_id': self.customer_user_id,
             'created_at': self.created_at.isoformat(),
             'last_activity_at': self.last_activity_at.isoformat(),
-            'customer': self.customer.email if self.customer else None
+            'customer': self.customer.email if self.customer else None,
+            'last_message_text': self.last_message_text or '',
+            'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
+            'unread_agent_count': self.unread_agent_count or 0,
+            'unread_customer_count': self.unread_customer_count or 0,
+            'archived': self.archived_at is not None
         }
 
+    @classmethod
+    def message_summary_values(cls, text: str, at: datetime, from_customer: int = 0, from_agent: int = 0) -> dict:
+        """Column values for Query.update() recording the latest message and how many
+        messages each side sent since the last update (no SELECT needed)."""
+        values = {
+            cls.last_message_text: text[:200],
+            cls.last_message_at: at,
+            cls.last_activity_at: at
+        }
+        if from_customer:
+            values[cls.unread_agent_count] = cls.unread_agent_count + from_customer
+        if from_agent:
+            values[cls.unread_customer_count] = cls.unread_customer_count + from_agent
+        return values
+
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
 
@@ -36,14 +62,31 @@ class ChatMessage(db.Model):
     sender = db.relationship(User, lazy='joined')
 
     def to_dict(self):
+        return self.payload(self.id, self.chat_id, self.sender_user_id,
+                            self.sender.email.split('@')[0] if self.sender else None,
+                            self.role, self.text, self.created_at)
+
+    @staticmethod
+    def payload(message_id, chat_id, sender_user_id, sender, role, text, created_at):
+        """Wire format of a message, buildable without loading the row."""
         return {
-            'id': self.id,
-            'chat_id': self.chat_id,
-            'sender_user_id': self.sender_user_id,
-            'sender': (self.sender.email.split('@')[0] if self.sender else None),
-            'role': self.role,
-            'text': self.text,
-            'ts': self.created_at.isoformat(),
-            'created_at': self.created_at.isoformat()
+            'id': message_id,
+            'chat_id': chat_id,
+            'sender_user_id': sender_user_id,
+            'sender': sender,
+            'role': role,
+            'text': text,
+            'ts': created_at.isoformat(),
+            'created_at': created_at.isoformat()
         }
 
+
+class ChatArchive(db.Model):
+    """Cold storage for an inactive session: its messages as zlib-compressed JSON, one row per chat."""
+    __tablename__ = 'chat_archives'
+
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id'), primary_key=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+from config.settings import Config
+from implementations.extensions import db
+from ..models.chat import ChatSession, ChatMessage, ChatArchive
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ('id', 'chat_id', 'sender_user_id', 'role', 'text', 'created_at')
+
+
+def _pack(rows) -> bytes:
+    data = [[r.id, r.chat_id, r.sender_user_id, r.role, r.text, r.created_at.isoformat()] for r in rows]
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _unpack(payload: bytes):
+    rows = []
+    for values in json.loads(zlib.decompress(payload)):
+        row = dict(zip(_COLUMNS, values))
+        row['created_at'] = datetime.fromisoformat(row['created_at'])
+        rows.append(row)
+    return rows
+
+
+def archive_session(chat_id: int, cutoff: datetime) -> Optional[int]:
+    """Move one inactive session's messages into chat_archives; returns how many moved
+    (None if it was no longer eligible).
+    The conditional UPDATE claims the session, so concurrent workers never archive it twice."""
+    messages = ChatMessage.__table__
+    try:
+        claimed = ChatSession.query.filter(ChatSession.id == chat_id,
+                                           ChatSession.archived_at.is_(None),
+                                           ChatSession.last_activity_at < cutoff)\
+                                   .update({ChatSession.archived_at: datetime.utcnow()}, synchronize_session=False)
+        if not claimed:
+            db.session.rollback()
+            return None
+        rows = db.session.execute(db.select(messages).where(messages.c.chat_id == chat_id)
+                                  .order_by(messages.c.id)).all()
+        raw = _pack(rows)
+        db.session.add(ChatArchive(chat_id=chat_id, message_count=len(rows), raw_bytes=len(raw),
+                                   payload=zlib.compress(raw, 6)))
+        db.session.execute(messages.delete().where(messages.c.chat_id == chat_id))
+        db.session.commit()
+        return len(rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def rehydrate_session(chat_id: int) -> bool:
+    """Bring an archived session's messages back into chat_messages (same ids). No-op when hot."""
+    try:
+        released = ChatSession.query.filter(ChatSession.id == chat_id, ChatSession.archived_at.isnot(None))\
+                                    .update({ChatSession.archived_at: None}, synchronize_session=False)
+        if not released:
+            db.session.rollback()
+            return False
+        archive = ChatArchive.query.filter_by(chat_id=chat_id).first()
+        if archive is not None:
+            rows = _unpack(archive.payload)
+            if rows:
+                db.session.execute(ChatMessage.__table__.insert(), rows)
+            db.session.delete(archive)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def ensure_hot(session: ChatSession) -> ChatSession:
+    """Call before reading or writing a session's messages; rehydrates it if it was archived."""
+    if session is not None and session.archived_at is not None:
+        if rehydrate_session(session.id):
+            logger.info(f"Rehydrated archived chat {session.id}")
+        db.session.refresh(session)
+    return session
+
+
+def archive_inactive(older_than_days: int = None, limit: int = 500) -> dict:
+    """Archive up to `limit` sessions idle for longer than `older_than_days`."""
+    if older_than_days is None:
+        older_than_days = Config.CHAT_ARCHIVE_AFTER_DAYS
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    chat_ids = [cid for (cid,) in db.session.query(ChatSession.id)
+                .filter(ChatSession.archived_at.is_(None), ChatSession.last_activity_at < cutoff)
+                .order_by(ChatSession.last_activity_at).limit(limit)]
+    sessions = messages = 0
+    for chat_id in chat_ids:
+        try:
+            moved = archive_session(chat_id, cutoff)
+        except Exception as e:
+            logger.error(f"Archiving chat {chat_id} failed: {e}")
+            continue
+        if moved is not None:
+            sessions += 1
+            messages += moved
+    return {'sessions': sessions, 'messages': messages}
+
+
+class ChatArchiver:
+    """Background sweep every CHAT_ARCHIVE_INTERVAL seconds (per worker; claims make overlap safe)."""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self, app):
+        if self.interval <= 0 or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, args=(app,), name='chat-archiver', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self, app):
+        while not self.stop_event.wait(self.interval):
+            with app.app_context():
+                try:
+                    result = archive_inactive()
+                    if result['sessions']:
+                        logger.info(f"Archived {result['sessions']} chats ({result['messages']} messages)")
+                except Exception as e:
+                    logger.error(f"Chat archive sweep failed: {e}")
+                finally:
+                    db.session.remove()
+
+
+# Global instance
+chat_archiver = ChatArchiver(interval=Config.CHAT_ARCHIVE_INTERVAL)
@@ -0,0 +1,61 @@
+import threading
+import time
+from typing import Dict, Optional
+from config.settings import Config
+
+
+class ChatUpdateDigest:
+    """Coalesces per-chat changes into `chat_updated` events for the agents room.
+    A quiet chat list gets each change at once; under load changes are merged per chat
+    and flushed at most once per interval as one event."""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.socketio = None
+        self.pending: Dict[int, dict] = {}
+        self.last_flush = 0.0
+        self.timer: Optional[threading.Timer] = None
+        self.lock = threading.Lock()
+
+    def init_socketio(self, socketio):
+        self.socketio = socketio
+
+    def record(self, chat_id: int, last_text: str = None, last_activity_ts: str = None,
+               unread_added: int = 0, unread: int = None, customer: str = None):
+        """Merge one change. `unread_added` accumulates until flushed; `unread` is an absolute reset."""
+        with self.lock:
+            delta = self.pending.setdefault(chat_id, {'chat_id': chat_id})
+            if last_text is not None:
+                delta['last_text'] = last_text[:200]
+            if last_activity_ts is not None:
+                delta['last_activity_ts'] = last_activity_ts
+            if customer is not None:
+                delta['customer'] = customer
+            if unread is not None:
+                delta['unread'] = unread
+                delta.pop('unread_added', None)
+            if unread_added:
+                delta['unread_added'] = delta.get('unread_added', 0) + unread_added
+            if self.timer is not None:
+                return  # a digest tick is already scheduled
+            wait = self.last_flush + self.interval - time.time()
+            if wait > 0:
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.timer = None
+            if not self.pending:
+                return
+            chats = list(self.pending.values())
+            self.pending = {}
+            self.last_flush = time.time()
+        if self.socketio is not None:
+            self.socketio.emit('chat_updated', {'chats': chats}, to='agents')
+
+
+# Global instance
+chat_digest = ChatUpdateDigest(interval=Config.CHAT_DIGEST_INTERVAL_MS / 1000.0)
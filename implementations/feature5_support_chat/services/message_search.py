@@ -0,0 +1,171 @@
+import html
+import logging
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from implementations.extensions import db
+from ..models.chat import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Highlight markers placed by the database, swapped for <mark> after HTML-escaping the snippet
+_OPEN, _CLOSE = '\x02', '\x03'
+SNIPPET_TOKENS = 12
+
+
+def _terms(query: str) -> List[str]:
+    """Words of the query; punctuation and search operators are dropped."""
+    return re.findall(r'\w+', query or '')[:10]
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def _window(text: str, pattern: re.Pattern) -> str:
+    """About SNIPPET_TOKENS words around the first match, marked, with '…' where the text was cut."""
+    words = text.split()
+    hit = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(0, min(hit - SNIPPET_TOKENS // 2, len(words) - SNIPPET_TOKENS))
+    end = start + SNIPPET_TOKENS
+    snippet = pattern.sub(lambda m: f'{_OPEN}{m.group(0)}{_CLOSE}', ' '.join(words[start:end]))
+    return ('…' if start else '') + snippet + ('…' if end < len(words) else '')
+
+
+class SQLiteFTSIndex:
+    """FTS5 index over chat_messages.text (external content table), kept in sync by triggers,
+    so the write-behind's bulk INSERTs are indexed in the same transaction."""
+    name = 'sqlite_fts5'
+
+    def ensure(self):
+        with db.engine.begin() as conn:
+            exists = conn.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages_fts'")).first()
+            conn.execute(db.text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5("
+                "text, content='chat_messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"))
+            conn.execute(db.text(
+                "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN "
+                "INSERT INTO chat_messages_fts(rowid, text) VALUES (new.id, new.text); END"))
+            conn.execute(db.text(
+                "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ad AFTER DELETE ON chat_messages BEGIN "
+                "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, text) VALUES ('delete', old.id, old.text); END"))
+            conn.execute(db.text(
+                "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF text ON chat_messages BEGIN "
+                "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+                "INSERT INTO chat_messages_fts(rowid, text) VALUES (new.id, new.text); END"))
+            if not exists:
+                # Index messages written before the search table existed
+                conn.execute(db.text("INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')"))
+
+    def search(self, terms: List[str], chat_ids: Optional[List[int]], before: Optional[int],
+               limit: int) -> List[Tuple[int, str]]:
+        # Every term must match; the last one as a prefix so results follow the agent's typing
+        match = ' '.join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        sql = ("SELECT f.rowid, snippet(chat_messages_fts, 0, :open, :close, '…', :tokens) "
+               "FROM chat_messages_fts f")
+        params = {'match': match, 'open': _OPEN, 'close': _CLOSE, 'tokens': SNIPPET_TOKENS, 'limit': limit}
+        where = ["chat_messages_fts MATCH :match"]
+        if chat_ids is not None:
+            sql += " JOIN chat_messages m ON m.id = f.rowid"
+            where.append(f"m.chat_id IN ({','.join(str(int(c)) for c in chat_ids) or 'NULL'})")
+        if before:
+            where.append("f.rowid < :before")
+            params['before'] = before
+        sql += " WHERE " + ' AND '.join(where) + " ORDER BY f.rowid DESC LIMIT :limit"
+        return [(row[0], row[1]) for row in db.session.execute(db.text(sql), params)]
+
+
+class PostgresTSVectorIndex:
+    """Generated tsvector column with a GIN index; Postgres keeps it current on every INSERT/UPDATE."""
+    name = 'postgres_tsvector'
+
+    def ensure(self):
+        with db.engine.begin() as conn:
+            conn.execute(db.text(
+                "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS text_tsv tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED"))
+            conn.execute(db.text(
+                "CREATE INDEX IF NOT EXISTS ix_chat_messages_text_tsv ON chat_messages USING GIN (text_tsv)"))
+
+    def search(self, terms: List[str], chat_ids: Optional[List[int]], before: Optional[int],
+               limit: int) -> List[Tuple[int, str]]:
+        tsquery = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+        sql = ("SELECT id, ts_headline('simple', text, to_tsquery('simple', :q), "
+               ":options) FROM chat_messages WHERE text_tsv @@ to_tsquery('simple', :q)")
+        params = {'q': tsquery, 'limit': limit,
+                  'options': f'StartSel={_OPEN}, StopSel={_CLOSE}, MaxWords={SNIPPET_TOKENS}, '
+                             f'MinWords={SNIPPET_TOKENS // 2}, FragmentDelimiter=…'}
+        if chat_ids is not None:
+            sql += f" AND chat_id IN ({','.join(str(int(c)) for c in chat_ids) or 'NULL'})"
+        if before:
+            sql += " AND id < :before"
+            params['before'] = before
+        sql += " ORDER BY id DESC LIMIT :limit"
+        return [(row[0], row[1]) for row in db.session.execute(db.text(sql), params)]
+
+
+class LikeScanIndex:
+    """Fallback for databases without a full-text index (scans; fine for small dev databases)."""
+    name = 'like_scan'
+
+    def ensure(self):
+        pass
+
+    def search(self, terms: List[str], chat_ids: Optional[List[int]], before: Optional[int],
+               limit: int) -> List[Tuple[int, str]]:
+        query = ChatMessage.query.with_entities(ChatMessage.id, ChatMessage.text)
+        for term in terms:
+            query = query.filter(func.lower(ChatMessage.text).contains(term.lower(), autoescape=True))
+        if chat_ids is not None:
+            query = query.filter(ChatMessage.chat_id.in_(chat_ids))
+        if before:
+            query = query.filter(ChatMessage.id < before)
+        pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+        return [(mid, _window(text, pattern)) for mid, text in query.order_by(ChatMessage.id.desc()).limit(limit)]
+
+
+class MessageSearch:
+    """Picks the index for the configured database and turns hits into message payloads."""
+    def __init__(self):
+        self.index = None
+
+    def init_app(self):
+        """Create/verify the index (inside an app context, after db.create_all()); returns its name."""
+        dialect = db.engine.dialect.name
+        candidates = {'sqlite': [SQLiteFTSIndex()], 'postgresql': [PostgresTSVectorIndex()]}.get(dialect, [])
+        for index in candidates + [LikeScanIndex()]:
+            try:
+                index.ensure()
+                self.index = index
+                break
+            except Exception as e:
+                logger.error(f"Chat search index {index.name} unavailable: {e}")
+        return self.index.name
+
+    def search(self, query: str, chat_ids: Optional[List[int]] = None, before: Optional[int] = None,
+               limit: int = 20) -> dict:
+        """Newest matches first; `next_before` pages further back (same cursor as chat history)."""
+        terms = _terms(query)
+        if not terms:
+            return {'results': [], 'has_more': False, 'next_before': None}
+        if self.index is None:
+            self.init_app()
+        hits = self.index.search(terms, chat_ids, before, limit + 1)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+        messages = {m.id: m for m in ChatMessage.query.filter(ChatMessage.id.in_([h[0] for h in hits])).all()}
+        results = []
+        for message_id, snippet in hits:
+            message = messages.get(message_id)
+            if message is not None:
+                results.append({**message.to_dict(), 'snippet': _highlight(snippet)})
+        return {
+            'results': results,
+            'has_more': has_more,
+            'next_before': hits[-1][0] if has_more and hits else None
+        }
+
+
+# Global instance
+message_search = MessageSearch()
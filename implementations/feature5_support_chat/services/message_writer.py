@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from queue import Queue, Empty
+from typing import Callable, List, Optional
+from config.settings import Config
+from implementations.extensions import db
+from ..models.chat import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBehind:
+    """Group-commit writer: messages from every socket are written many per transaction, and
+    `on_durable(message_id)` runs once a message's transaction has committed. Callers emit
+    from that callback, so nobody ever sees a message the database could still lose; a crash
+    only drops messages nobody saw and whose sender got no `delivered` ack. A batch that keeps
+    failing is retried one row per transaction, so only the offending message gets `on_failed`.
+    Ids come from the table's own sequence (one per database, so they follow commit order
+    across workers) and are read back with RETURNING."""
+    def __init__(self, batch_max: int, window: float, retries: int = 3):
+        self.batch_max = batch_max
+        self.window = window
+        self.retries = retries
+        self.queue: Queue = Queue()
+        self.app = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def submit(self, app, row: dict, on_durable: Callable[[int], None] = None,
+               on_failed: Callable[[], None] = None):
+        """Queue one chat_messages row (without an id; the INSERT assigns it)."""
+        self._ensure_started(app)
+        self.idle.clear()
+        self.queue.put((row, on_durable, on_failed))
+
+    def _ensure_started(self, app):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.app = app
+                self.thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+                self.thread.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far is durable (used on shutdown)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.queue.empty() and self.idle.is_set():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _collect(self) -> List[tuple]:
+        batch = [self.queue.get()]
+        deadline = time.time() + self.window
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.time()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            ids = self._write_retrying(batch)
+            if ids is None and len(batch) > 1:
+                # One bad row must not fail its neighbours: retry each in its own transaction
+                ids = [(self._write_retrying([item], attempts=1) or [None])[0] for item in batch]
+            elif ids is None:
+                ids = [None]
+            for message_id, (_, on_durable, on_failed) in zip(ids, batch):
+                try:
+                    if message_id is not None and on_durable:
+                        on_durable(message_id)
+                    elif message_id is None and on_failed:
+                        on_failed()
+                except Exception as e:
+                    logger.error(f"Chat write callback failed: {e}")
+            if self.queue.empty():
+                self.idle.set()
+
+    def _write_retrying(self, batch: List[tuple], attempts: int = None) -> Optional[List[int]]:
+        """Ids of the written batch, or None once every attempt failed."""
+        attempts = attempts or self.retries
+        for attempt in range(attempts):
+            try:
+                with self.app.app_context():
+                    return self._write(batch)
+            except Exception as e:
+                logger.error(f"Chat write of {len(batch)} message(s) failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < attempts:
+                    time.sleep(0.05 * (attempt + 1))
+        return None
+
+    @staticmethod
+    def _write(batch: List[tuple]) -> List[int]:
+        """One transaction: executemany INSERT plus one summary UPDATE per touched chat.
+        Returns the new message ids in batch order."""
+        rows = [row for row, _, _ in batch]
+        table = ChatMessage.__table__
+        try:
+            ids = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                                     rows).scalars().all()
+            per_chat = {}
+            for row in rows:
+                summary = per_chat.setdefault(row['chat_id'], {'last': row, 'customer': 0, 'agent': 0})
+                summary['last'] = row
+                summary['customer' if row['role'] == 'customer' else 'agent'] += 1
+            for chat_id, summary in per_chat.items():
+                last = summary['last']
+                ChatSession.query.filter_by(id=chat_id).update(
+                    ChatSession.message_summary_values(last['text'], last['created_at'],
+                                                       from_customer=summary['customer'],
+                                                       from_agent=summary['agent']),
+                    synchronize_session=False)
+            db.session.commit()
+            return ids
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+
+# Global instance
+message_writer = MessageWriteBehind(
+    batch_max=Config.CHAT_WRITE_BATCH_MAX,
+    window=Config.CHAT_WRITE_BATCH_WINDOW_MS / 1000.0
+)
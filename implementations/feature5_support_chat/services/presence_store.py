@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from typing import Dict, List
+from config.settings import Config
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTTLStore:
+    """In-process stand-in for single-worker and dev runs: key -> {member: expires_at}."""
+    def __init__(self):
+        self.data: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def touch(self, key: str, member: str, ttl: float):
+        """Add `member` to the set at `key`, or extend it, for `ttl` seconds."""
+        with self.lock:
+            self.data.setdefault(key, {})[member] = time.time() + ttl
+
+    def remove(self, key: str, member: str):
+        with self.lock:
+            members = self.data.get(key)
+            if members is not None:
+                members.pop(member, None)
+                if not members:
+                    del self.data[key]
+
+    def members(self, key: str) -> List[str]:
+        """Live members; expired ones are dropped on read."""
+        now = time.time()
+        with self.lock:
+            members = self.data.get(key)
+            if not members:
+                return []
+            for member in [m for m, expires in members.items() if expires <= now]:
+                del members[member]
+            if not members:
+                del self.data[key]
+                return []
+            return sorted(members)
+
+
+class RedisTTLStore:
+    """Shared across workers: each key is a sorted set scored by expiry time."""
+    def __init__(self, client, prefix: str = 'chat:'):
+        self.client = client
+        self.prefix = prefix
+
+    def touch(self, key: str, member: str, ttl: float):
+        name = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.zadd(name, {member: time.time() + ttl})
+        # The whole set disappears once its last member would have expired
+        pipe.expire(name, int(ttl) + 1)
+        pipe.execute()
+
+    def remove(self, key: str, member: str):
+        self.client.zrem(self.prefix + key, member)
+
+    def members(self, key: str) -> List[str]:
+        name = self.prefix + key
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(name, '-inf', now)
+        pipe.zrange(name, 0, -1)
+        members = pipe.execute()[1]
+        return sorted(m.decode() if isinstance(m, bytes) else m for m in members)
+
+
+def build_presence_store():
+    """Redis when CHAT_STATE_REDIS_URL (defaulting to the Socket.IO message queue) is set, else in-process."""
+    url = Config.CHAT_STATE_REDIS_URL
+    if url and redis is not None:
+        try:
+            return RedisTTLStore(redis.Redis.from_url(url, decode_responses=True))
+        except Exception as e:
+            logger.error(f"Chat state Redis unavailable, falling back to in-process store: {e}")
+    return LocalTTLStore()
+
+
+# Global instance
+presence_store = build_presence_store()
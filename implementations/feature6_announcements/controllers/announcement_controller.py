@@ -1,72 +1,35 @@
 from flask import Blueprint, request, jsonify, Response, stream_with_context
-import json
 import time
-import threading
-from typing import Dict, List, Optional
-from queue import Queue
-from config.settings import Config
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from queue import Empty
 from implementations.feature6_announcements.models.announcement import Announcement, db
+from implementations.feature6_announcements.services.announcement_snapshot import announcement_snapshot
+from implementations.feature6_announcements.services.announcement_hub import announcement_hub
+from implementations.feature6_announcements.services.announcement_scheduler import announcement_scheduler
+from implementations.feature6_announcements.services.stream_args import REPLAY_LIMIT, last_event_id, audience_args
+from implementations.sse import sse_response, sse_event, collect_batch, wants_batch
+from implementations.connection_governor import governed, current_lease, closing_event
 
-try:
-    import redis  # type: ignore
-except Exception:  # pragma: no cover
-    redis = None
+HEARTBEAT_INTERVAL = 15  # seconds; a write to a departed client fails and frees its thread
 
-# Redis client using central Config (points to Azure by default)
-redis_client = None
-if redis is not None:
-    try:
-        redis_client = redis.Redis(
-            host=Config.REDIS_HOST,
-            port=Config.REDIS_PORT,
-            password=Config.REDIS_PASSWORD or None,
-            db=Config.REDIS_DB,
-            decode_responses=True,
-            ssl=True,               # Azure uses TLS
-            ssl_cert_reqs=None      # relax cert verification for local/dev
-        )
-    except Exception:
-        redis_client = None
-
-CHANNEL = "announcements"
-
-class AnnouncementStreamManager:
-    """Simple manager for SSE client queues for announcements."""
-    def __init__(self):
-        self.active_streams: List[Queue] = []
-        self.lock = threading.Lock()
-
-    def register_client(self) -> Queue:
-        """Register a new SSE client."""
-        q = Queue(maxsize=50)
-        with self.lock:
-            self.active_streams.append(q)
-        return q
-
-    def unregister_client(self, q: Queue):
-        """Unregister an SSE client."""
-        with self.lock:
-            try:
-                self.active_streams.remove(q)
-            except ValueError:
-                pass
 
-    def broadcast_announcement(self, announcement_data: dict):
-        """Send announcement to all connected clients."""
-        data = json.dumps(announcement_data)
-        with self.lock:
-            alive = []
-            for q in self.active_streams:
-                try:
-                    q.put_nowait(data)
-                    alive.append(q)
-                except Exception:
-                    # Queue full or client disconnected
-                    pass
-            self.active_streams = alive
+def _parse_time(value) -> Optional[datetime]:
+    """ISO 8601 timestamp -> naive UTC (the database stores utcnow() values). Raises ValueError."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _format_items(items: List[Tuple[int, str]], as_array: bool) -> str:
+    """SSE blocks carrying announcement ids; array mode sends one event whose id is the newest."""
+    if as_array:
+        return sse_event(f"[{','.join(e for _, e in items)}]", event_id=items[-1][0])
+    return ''.join(sse_event(e, event_id=i) for i, e in items)
 
-# Global stream manager
-stream_manager = AnnouncementStreamManager()
 
 announcement_bp = Blueprint('announcements', __name__, url_prefix='/api/v1/announcements')
 
@@ -100,6 +63,22 @@ def create_announcement():
     
     if priority not in ['low', 'normal', 'high', 'urgent']:
         priority = 'normal'
+
+    audience = data.get('audience') or 'all'
+    if audience not in Announcement.AUDIENCES:
+        return _cors_headers(jsonify({'success': False, 'error': f"audience must be one of {', '.join(Announcement.AUDIENCES)}"})), 400
+    restaurant_ids = data.get('restaurant_ids') or []
+    if audience != 'restaurants' or not isinstance(restaurant_ids, list):
+        restaurant_ids = []
+    try:
+        publish_at = _parse_time(data.get('publish_at'))
+        expires_at = _parse_time(data.get('expires_at'))
+    except ValueError:
+        return _cors_headers(jsonify({'success': False, 'error': 'publish_at/expires_at must be ISO 8601 timestamps'})), 400
+    now = datetime.utcnow()
+    if expires_at and expires_at <= max(publish_at or now, now):
+        return _cors_headers(jsonify({'success': False, 'error': 'expires_at must be after publish time'})), 400
+    scheduled = publish_at is not None and publish_at > now
     
     try:
         # Save to database
@@ -107,7 +86,12 @@ def create_announcement():
             title=title,
             message=message,
             sender_name=sender_name,
-            priority=priority
+            priority=priority,
+            audience=audience,
+            restaurant_ids=','.join(str(int(r)) for r in restaurant_ids if str(r).isdigit()) or None,
+            publish_at=publish_at,
+            expires_at=expires_at,
+            released_at=None if scheduled else now
         )
         
         db.session.add(announcement)
@@ -115,22 +99,14 @@ def create_announcement():
         
         # Prepare announcement data
         announcement_data = announcement.to_dict()
+        # Future releases and any expiry are handled by the timer-based scheduler
+        announcement_scheduler.track(announcement)
+        if not scheduled:
+            announcement_snapshot.refresh()
+            # One delivery path: Redis when subscribed (reaches every worker), else local clients
+            announcement_hub.publish(announcement_data)
         
-        # Broadcast via Redis if available
-        if redis_client is not None:
-            try:
-                event = {
-                    "announcement": announcement_data,
-                    "ts": int(time.time()),
-                }
-                redis_client.publish(CHANNEL, json.dumps(event))
-            except Exception:
-                pass  # Continue even if Redis fails
-        
-        # Broadcast to local SSE clients
-        stream_manager.broadcast_announcement(announcement_data)
-        
-        return _cors_headers(jsonify({'success': True, 'announcement': announcement_data})), 201
+        return _cors_headers(jsonify({'success': True, 'announcement': announcement_data, 'scheduled': scheduled})), 201
         
     except Exception as e:
         db.session.rollback()
@@ -138,89 +114,96 @@ def create_announcement():
 
 @announcement_bp.route('', methods=['GET'])
 def get_announcements():
-    """Get recent announcements."""
+    """Get recent live announcements (?audience=customers|employees|restaurants&restaurant_id=)."""
     limit = request.args.get('limit', 10, type=int)
+    audience, restaurant_id = audience_args()
     try:
-        announcements = Announcement.query.filter_by(is_active=True)\
-                                       .order_by(Announcement.created_at.desc())\
-                                       .limit(limit).all()
-        announcement_list = [ann.to_dict() for ann in announcements]
+        if 0 < limit <= announcement_snapshot.size:
+            # Served from the pre-serialized snapshot: no query, no re-encoding
+            return _cors_headers(Response(announcement_snapshot.list_body(limit, audience, restaurant_id),
+                                          mimetype='application/json'))
+        query = Announcement.query.filter(Announcement.live_filter(datetime.utcnow()))
+        if audience:
+            query = query.filter(Announcement.audience.in_(['all', audience]))
+        announcements = query.order_by(Announcement.created_at.desc()).limit(limit).all()
+        announcement_list = [d for d in (ann.to_dict() for ann in announcements)
+                             if Announcement.visible_to(d, audience, restaurant_id)]
         return _cors_headers(jsonify({'success': True, 'announcements': announcement_list}))
     except Exception:
         return _cors_headers(jsonify({'success': True, 'announcements': []}))
 
 @announcement_bp.route('/stream', methods=['GET'])
+@governed('announcements')
 def stream_announcements():
-    """Stream announcements using SSE for real-time notifications."""
-    
+    """Stream announcements using SSE for real-time notifications.
+    Each event's id is the announcement id; a reconnect with Last-Event-ID only replays ones released since.
+    ?audience=customers|employees|restaurants&restaurant_id= limits the stream to targeted announcements;
+    retired ones arrive as `expired` events. Announcements arriving within the batch window share
+    one write (?batch=1 for JSON arrays)."""
+    as_array = wants_batch()
+    lease = current_lease()
+    resume_from = last_event_id()
+    audience, restaurant_id = audience_args()
+
     def event_stream():
-        # Try Redis first
-        if redis_client is not None:
-            try:
-                pubsub = redis_client.pubsub()
-                pubsub.subscribe(CHANNEL)
-                
-                # Let client know stream is alive
-                yield "event: ping\ndata: connected\n\n"
-                
-                # Send recent announcements first
-                try:
-                    recent = Announcement.query.filter_by(is_active=True)\
-                                           .order_by(Announcement.created_at.desc())\
-                                           .limit(5).all()
-                    for announcement in recent:
-                        yield f"data: {json.dumps(announcement.to_dict())}\n\n"
-                except Exception:
-                    pass
-                
-                # Listen for new announcements via Redis
-                for message in pubsub.listen():
-                    if message.get("type") != "message":
-                        continue
-                    data = message.get("data")
-                    yield f"data: {data}\n\n"
-                return
-                
-            except Exception:
-                # Fall back to local streaming
-                pass
-        
-        # Fallback: Local SSE streaming
-        client_queue = stream_manager.register_client()
-        
+        # Register before reading the snapshot so nothing published in between is missed
+        client_queue = announcement_hub.register_client(audience, restaurant_id)
+        sent = set()  # ids already on this connection (replay overlap, duplicate deliveries)
         try:
-            # Send recent announcements first
+            # Let client know stream is alive
+            yield "event: ping\ndata: connected\n\n"
+
+            # Replay from the in-memory snapshot: newer than Last-Event-ID, or the most recent few
             try:
-                recent = Announcement.query.filter_by(is_active=True)\
-                                       .order_by(Announcement.created_at.desc())\
-                                       .limit(5).all()
-                for announcement in recent:
-                    yield f"data: {json.dumps(announcement.to_dict())}\n\n"
+                replay = announcement_snapshot.since(resume_from, audience, restaurant_id)
+                if not resume_from:
+                    replay = replay[-REPLAY_LIMIT:]
+                if replay:
+                    sent.update(i for i, _ in replay)
+                    yield ''.join(sse_event(e, event_id=i) for i, e in replay)
             except Exception:
                 pass
-            
-            # Send a connection confirmation
-            yield f"data: {json.dumps({'type': 'connected', 'message': 'Connected to announcements'})}\n\n"
-            
-            # Listen for new announcements
-            while True:
+
+            def next_data(timeout):
                 try:
-                    # Wait for new announcement or timeout for keepalive
-                    data = client_queue.get(timeout=30)
-                    yield f"data: {data}\n\n"
-                except:
-                    # Timeout - send keepalive
+                    return client_queue.get(timeout=timeout)
+                except Empty:
+                    return None
+
+            last_heartbeat = time.time()
+            while True:
+                # Short waits so idle eviction and shutdown are noticed quickly
+                item = next_data(1.0)
+                if item is not None:
+                    batch, chunk, dropped = [], '', False
+                    for i, e, kind in collect_batch(item, next_data):
+                        if kind == 'closed':
+                            dropped = True
+                        elif kind == 'expired':
+                            sent.discard(i)
+                            chunk += sse_event(e, event='expired')
+                        elif i not in sent:
+                            sent.add(i)
+                            batch.append((i, e))
+                    if batch:
+                        chunk += _format_items(batch, as_array)
+                    if chunk:
+                        lease.touch()
+                        last_heartbeat = time.time()
+                        yield chunk
+                    if dropped:
+                        # Fell behind and the hub stopped feeding us: reconnect and replay from Last-Event-ID
+                        yield closing_event('lagging')
+                        return
+                if lease.should_close():
+                    yield closing_event(lease.close_reason)
+                    return
+                if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    # Fails once the client is gone, which ends this generator and frees the slot
+                    last_heartbeat = time.time()
                     yield ": keepalive\n\n"
-                    
-        except GeneratorExit:
-            # Client disconnected
-            stream_manager.unregister_client(client_queue)
-            return
         finally:
-            # Cleanup
-            stream_manager.unregister_client(client_queue)
+            announcement_hub.unregister_client(client_queue)
 
-    resp = Response(stream_with_context(event_stream()), mimetype="text/event-stream")
-    resp.headers["Cache-Control"] = "no-cache"
-    resp.headers["Connection"] = "keep-alive"
-    return _cors_headers(resp)
\ No newline at end of file
+    resp = sse_response(stream_with_context(event_stream()))
+    return _cors_headers(resp)
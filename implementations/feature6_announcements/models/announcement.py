@@ -23,7 +23,33 @@ class Announcement(db.Model):
     priority = db.Column(db.String(20), nullable=False, default='normal')  # low, normal, high, urgent
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
-    
+    # Targeting: all, customers, employees or restaurants (optionally only `restaurant_ids`, comma separated)
+    audience = db.Column(db.String(20), nullable=False, default='all')
+    restaurant_ids = db.Column(db.String(500), nullable=True)
+    # Scheduling: released at publish_at (now when empty), retired at expires_at
+    publish_at = db.Column(db.DateTime, nullable=True, index=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    released_at = db.Column(db.DateTime, nullable=True)
+
+    AUDIENCES = ('all', 'customers', 'employees', 'restaurants')
+
+    @staticmethod
+    def visible_to(data: dict, audience: str = None, restaurant_id: int = None) -> bool:
+        """Whether a serialized announcement targets this client (no audience = unfiltered staff view)."""
+        if not audience or data.get('audience', 'all') == 'all':
+            return True
+        if data.get('audience') != audience:
+            return False
+        ids = data.get('restaurant_ids') or []
+        return audience != 'restaurants' or not ids or restaurant_id in ids
+
+    @classmethod
+    def live_filter(cls, now: datetime):
+        """SQL criteria for announcements clients should currently see."""
+        return db.and_(cls.is_active.is_(True),
+                       cls.released_at.isnot(None),
+                       db.or_(cls.expires_at.is_(None), cls.expires_at > now))
+
     def to_dict(self):
         """Convert announcement to dictionary."""
         return {
@@ -33,7 +59,12 @@ class Announcement(db.Model):
             'sender_name': self.sender_name,
             'priority': self.priority,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'is_active': self.is_active
+            'is_active': self.is_active,
+            'audience': self.audience or 'all',
+            'restaurant_ids': [int(r) for r in (self.restaurant_ids or '').split(',') if r.strip().isdigit()],
+            'publish_at': self.publish_at.isoformat() if self.publish_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'released_at': self.released_at.isoformat() if self.released_at else None
         }
     
     def __repr__(self):
@@ -0,0 +1,211 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from queue import Empty, Full, Queue
+from typing import Dict, Optional, Tuple
+from config.settings import Config
+from implementations.shutdown import register_shutdown_callback
+from .announcement_snapshot import announcement_snapshot
+from ..models.announcement import Announcement
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "announcements"
+CLOSED = (0, None, 'closed')  # queue sentinel: the hub dropped this stream
+
+# Redis client using central Config (points to Azure by default)
+redis_client = None
+if redis is not None:
+    try:
+        redis_client = redis.Redis(
+            host=Config.REDIS_HOST,
+            port=Config.REDIS_PORT,
+            password=Config.REDIS_PASSWORD or None,
+            db=Config.REDIS_DB,
+            decode_responses=True,
+            ssl=True,               # Azure uses TLS
+            ssl_cert_reqs=None      # relax cert verification for local/dev
+        )
+    except Exception:
+        redis_client = None
+
+
+class AnnouncementHub:
+    """The single delivery path for announcements in a worker.
+    One Redis subscription per worker (not per client) feeds every local stream queue.
+    Every announcement is published to Redis from a background sender so other processes
+    (the gateway, other REST workers) always get it; the publishing worker also delivers it
+    locally while its own subscription is down, and repeats are dropped by id. Queue items are
+    (announcement_id, json, kind) so streams can use ids as SSE event ids and skip repeats;
+    kind is 'new', 'expired' or 'closed' (the stream fell too far behind and must end).
+    Each queue only receives announcements targeted at it."""
+    def __init__(self, client, channel: str):
+        self.client = client
+        self.channel = channel
+        self.active_streams: Dict[Queue, Tuple[Optional[str], Optional[int]]] = {}  # queue -> (audience, restaurant_id)
+        self.lock = threading.Lock()
+        self.subscribed = threading.Event()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.outbox: Queue = Queue(maxsize=1000)  # events waiting for the Redis publish
+        self.sender: Optional[threading.Thread] = None
+        self.handled: OrderedDict = OrderedDict()  # recent (kind, id) already applied here
+
+    def register_client(self, audience: str = None, restaurant_id: int = None) -> Queue:
+        """Register a new SSE client (no audience = every announcement)."""
+        self.start()
+        q = Queue(maxsize=50)
+        with self.lock:
+            self.active_streams[q] = (audience, restaurant_id)
+        return q
+
+    def unregister_client(self, q: Queue):
+        """Unregister an SSE client."""
+        with self.lock:
+            self.active_streams.pop(q, None)
+
+    def client_count(self) -> int:
+        with self.lock:
+            return len(self.active_streams)
+
+    def publish(self, announcement_data: dict):
+        """Deliver a new announcement to every worker; never blocks the caller."""
+        self._send({"announcement": announcement_data, "ts": int(time.time())})
+
+    def retire(self, announcement_data: dict):
+        """Tell every worker an announcement expired: dropped from snapshots, clients told to remove it."""
+        self._send({"retired": announcement_data, "ts": int(time.time())})
+
+    def _send(self, event: dict):
+        self.start()
+        if not self.subscribed.is_set():
+            self._handle(event)
+        if self.client is None:
+            return
+        try:
+            self.outbox.put_nowait(event)
+        except Full:
+            logger.error("Announcement outbox full, event not sent to other workers")
+
+    def _publish_loop(self):
+        """Publish queued events in order, retrying each until Redis takes it."""
+        while not self.stopping.is_set():
+            try:
+                event = self.outbox.get(timeout=1.0)
+            except Empty:
+                continue
+            backoff = 1
+            while not self.stopping.is_set():
+                try:
+                    self.client.publish(self.channel, json.dumps(event))
+                    break
+                except Exception as e:
+                    logger.error(f"Announcement publish failed, retrying in {backoff}s: {e}")
+                    if self.subscribed.is_set():
+                        self._handle(event)  # local streams need not wait for Redis
+                    self.stopping.wait(backoff)
+                    backoff = min(backoff * 2, 30)
+
+    def _handle(self, event: dict):
+        retired = 'retired' in event
+        data = event['retired'] if retired else event.get('announcement', event)
+        key = ('retired' if retired else 'new', data.get('id'))
+        with self.lock:
+            if key in self.handled:
+                return  # delivered locally and again through Redis
+            self.handled[key] = True
+            if len(self.handled) > 1000:
+                self.handled.popitem(last=False)
+        if retired:
+            announcement_snapshot.remove(data.get('id'))
+            self._deliver(data, json.dumps({'id': data.get('id'), 'expired': True}), 'expired')
+        else:
+            announcement_snapshot.add(data)
+            self._deliver(data, json.dumps(data), 'new')
+
+    def _deliver(self, data: dict, encoded: str, kind: str):
+        """Fan out to the local streams this announcement targets (filtered here, not in each client)."""
+        item = (data.get('id') or 0, encoded, kind)
+        with self.lock:
+            for q, (audience, restaurant_id) in list(self.active_streams.items()):
+                if not Announcement.visible_to(data, audience, restaurant_id):
+                    continue
+                try:
+                    q.put_nowait(item)
+                except Full:
+                    # Client stopped reading: end its stream so it replays on reconnect
+                    del self.active_streams[q]
+                    self._close(q)
+
+    @staticmethod
+    def _close(q: Queue):
+        try:
+            q.get_nowait()  # make room for the sentinel; the stream replays it anyway
+        except Empty:
+            pass
+        try:
+            q.put_nowait(CLOSED)
+        except Full:
+            pass
+
+    def start(self):
+        """Start the worker's Redis listener and publisher once (no-op without Redis)."""
+        if self.client is None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._listen, name='announcement-hub', daemon=True)
+            self.thread.start()
+            self.sender = threading.Thread(target=self._publish_loop, name='announcement-publish', daemon=True)
+            self.sender.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _listen(self):
+        backoff = 1
+        while not self.stopping.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub()
+                pubsub.subscribe(self.channel)
+                self.subscribed.set()
+                backoff = 1
+                while not self.stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._handle(json.loads(message['data']))
+            except Exception as e:
+                logger.error(f"Announcement subscription lost: {e}")
+            finally:
+                self.subscribed.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self.stopping.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+def _close_redis():
+    """Stop the listener and disconnect pooled connections once streams are drained on shutdown."""
+    announcement_hub.stop()
+    if redis_client is not None:
+        try:
+            redis_client.close()
+        except Exception:
+            pass
+
+
+# Global hub (per worker process)
+announcement_hub = AnnouncementHub(redis_client, CHANNEL)
+register_shutdown_callback(_close_redis)
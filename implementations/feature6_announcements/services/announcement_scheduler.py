@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+from config.settings import Config
+from implementations.extensions import db
+from .announcement_hub import announcement_hub
+from ..models.announcement import Announcement
+
+logger = logging.getLogger(__name__)
+
+
+class AnnouncementScheduler:
+    """Releases announcements at publish_at and retires them at expires_at.
+    Pending transitions sit in a heap and one timer is armed for the earliest, so nothing
+    scans the table per request. The heap only knows what this process created or loaded, so
+    the timer also wakes every `rescan` seconds to load transitions that fall due soon, which
+    picks up announcements scheduled by other processes (or by one that has since exited).
+    Each transition is claimed with a conditional UPDATE, so when several workers schedule the
+    same one only the winner fans it out, and the hub publishes it to every process."""
+    def __init__(self, rescan: float):
+        self.rescan = rescan
+        self.heap: List[Tuple[datetime, int, str, int]] = []
+        self.queued: Set[Tuple[str, int]] = set()  # (action, announcement_id) already in the heap
+        self.counter = itertools.count()
+        self.timer: Optional[threading.Timer] = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.last_scan = 0.0
+        self.app = None
+
+    def init_app(self, app):
+        """Load pending transitions (indexed publish_at / expires_at lookups) and arm the timer."""
+        self.app = app
+        with app.app_context():
+            self.load()
+            db.session.remove()
+        with self.lock:
+            if self.timer is None:
+                self._arm()
+
+    def load(self, horizon: Optional[datetime] = None):
+        """Track pending transitions from the database, only those due before `horizon` when given."""
+        query = Announcement.query.filter(Announcement.is_active.is_(True))
+        if horizon is None:
+            query = query.filter(db.or_(Announcement.released_at.is_(None),
+                                        Announcement.expires_at.isnot(None)))
+        else:
+            query = query.filter(db.or_(db.and_(Announcement.released_at.is_(None),
+                                                db.or_(Announcement.publish_at.is_(None),
+                                                       Announcement.publish_at <= horizon)),
+                                        Announcement.expires_at <= horizon))
+        self.last_scan = time.time()
+        for a in query.all():
+            self.track(a)
+
+    def track(self, announcement: Announcement):
+        """Schedule whatever transitions this announcement still has ahead of it."""
+        if announcement.released_at is None:
+            self.schedule(announcement.publish_at or datetime.utcnow(), 'release', announcement.id)
+        if announcement.expires_at is not None:
+            self.schedule(announcement.expires_at, 'retire', announcement.id)
+
+    def schedule(self, when: datetime, action: str, announcement_id: int):
+        entry = (when, next(self.counter), action, announcement_id)
+        with self.lock:
+            if (action, announcement_id) in self.queued:
+                return
+            self.queued.add((action, announcement_id))
+            heapq.heappush(self.heap, entry)
+            # Only a new earliest transition moves the timer
+            if self.heap[0] is entry or self.timer is None:
+                self._arm()
+
+    def _arm(self):
+        """(Re)arm the single timer for the earliest pending transition, or the next rescan
+        if that comes first. Caller holds the lock."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.stopping.is_set():
+            return
+        delay = max(0.0, self.last_scan + self.rescan - time.time())
+        if self.heap:
+            delay = min(delay, max(0.0, (self.heap[0][0] - datetime.utcnow()).total_seconds()))
+        self.timer = threading.Timer(delay, self._fire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def stop(self):
+        self.stopping.set()
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.heap = []
+            self.queued = set()
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, int, str, int]]:
+        """Take every transition due by `now` off the heap. Caller holds the lock."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            self.queued.discard((entry[2], entry[3]))
+            due.append(entry)
+        return due
+
+    def _fire(self):
+        now = datetime.utcnow()
+        with self.lock:
+            self.timer = None
+            due = self._pop_due(now)
+        if self.app is not None and time.time() - self.last_scan >= self.rescan:
+            try:
+                with self.app.app_context():
+                    self.load(now + timedelta(seconds=self.rescan))
+                    db.session.remove()
+            except Exception as e:
+                self.last_scan = time.time()  # retry on the next interval
+                logger.error(f"Announcement rescan failed: {e}")
+            with self.lock:
+                due += self._pop_due(now)
+        if due and self.app is not None:
+            with self.app.app_context():
+                for _, _, action, announcement_id in due:
+                    try:
+                        if action == 'release':
+                            self.release(announcement_id)
+                        else:
+                            self.retire(announcement_id)
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Announcement {action} failed for {announcement_id}: {e}")
+                db.session.remove()
+        with self.lock:
+            if self.timer is None:
+                self._arm()
+
+    @staticmethod
+    def release(announcement_id: int) -> bool:
+        """Mark released and fan out, unless another worker already did."""
+        claimed = Announcement.query.filter(Announcement.id == announcement_id,
+                                            Announcement.released_at.is_(None),
+                                            Announcement.is_active.is_(True))\
+                                    .update({Announcement.released_at: datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return False
+        announcement = db.session.get(Announcement, announcement_id)
+        if announcement.expires_at is None or announcement.expires_at > datetime.utcnow():
+            announcement_hub.publish(announcement.to_dict())
+        return True
+
+    @staticmethod
+    def retire(announcement_id: int) -> bool:
+        """Deactivate an expired announcement and tell clients to drop it."""
+        claimed = Announcement.query.filter(Announcement.id == announcement_id,
+                                            Announcement.is_active.is_(True),
+                                            Announcement.expires_at <= datetime.utcnow())\
+                                    .update({Announcement.is_active: False}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return False
+        announcement_hub.retire(db.session.get(Announcement, announcement_id).to_dict())
+        return True
+
+
+# Global scheduler (per worker process)
+announcement_scheduler = AnnouncementScheduler(rescan=Config.ANNOUNCEMENT_RESCAN_INTERVAL)
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from config.settings import Config
+from ..models.announcement import Announcement
+
+
+class AnnouncementSnapshot:
+    """Recent live announcements kept in memory, already JSON-encoded, so stream connects
+    and list calls do not touch the database. create_announcement and the scheduler keep it
+    current; the max age bounds how stale a worker that missed a change can be."""
+    def __init__(self, size: int, max_age: float):
+        self.size = size
+        self.max_age = max_age
+        self.items: List[dict] = []
+        self.encoded: List[str] = []
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def _load(self):
+        rows = Announcement.query.filter(Announcement.live_filter(datetime.utcnow()))\
+                                 .order_by(Announcement.released_at.desc())\
+                                 .limit(self.size).all()
+        items = [a.to_dict() for a in rows]
+        encoded = [json.dumps(item) for item in items]
+        with self.lock:
+            self.items, self.encoded, self.loaded_at = items, encoded, time.time()
+
+    def refresh(self):
+        """Reload from the database (call inside an app context)."""
+        with self.refresh_lock:
+            self._load()
+
+    def _current(self) -> List[Tuple[dict, str]]:
+        if not self.loaded_at:
+            with self.refresh_lock:
+                if not self.loaded_at:
+                    self._load()
+        elif time.time() - self.loaded_at > self.max_age and self.refresh_lock.acquire(blocking=False):
+            # One caller reloads; concurrent callers keep serving the previous snapshot
+            try:
+                self._load()
+            except Exception:
+                pass
+            finally:
+                self.refresh_lock.release()
+        with self.lock:
+            return list(zip(self.items, self.encoded))
+
+    def add(self, item: dict):
+        """Put a just-released announcement in front without a reload (ignored until first load)."""
+        with self.lock:
+            if not self.loaded_at or any(i.get('id') == item.get('id') for i in self.items):
+                return
+            self.items = ([item] + self.items)[:self.size]
+            self.encoded = ([json.dumps(item)] + self.encoded)[:self.size]
+
+    def remove(self, announcement_id: int):
+        """Drop a retired announcement."""
+        with self.lock:
+            keep = [n for n, i in enumerate(self.items) if i.get('id') != announcement_id]
+            self.items = [self.items[n] for n in keep]
+            self.encoded = [self.encoded[n] for n in keep]
+
+    def _visible(self, audience: Optional[str], restaurant_id: Optional[int]) -> List[Tuple[dict, str]]:
+        return [(i, e) for i, e in self._current() if Announcement.visible_to(i, audience, restaurant_id)]
+
+    def since(self, last_id: int, audience: str = None, restaurant_id: int = None) -> List[Tuple[int, str]]:
+        """(id, json) of snapshot announcements released after announcement `last_id`, oldest first
+        (reconnect replay). Scheduled releases mean ids are not in release order, so the anchor's
+        release time is used when it is still in the snapshot."""
+        visible = self._visible(audience, restaurant_id)
+        anchor = next((i for i, _ in visible if i.get('id') == last_id), None)
+        if anchor is not None and anchor.get('released_at'):
+            released = datetime.fromisoformat(anchor['released_at'])
+            newer = [(i, e) for i, e in visible
+                     if i.get('released_at') and datetime.fromisoformat(i['released_at']) > released]
+        else:
+            newer = [(i, e) for i, e in visible if (i.get('id') or 0) > last_id]
+        return [(i['id'], e) for i, e in newer][::-1]
+
+    def recent_json(self, limit: int, audience: str = None, restaurant_id: int = None) -> List[str]:
+        """Newest first, pre-serialized."""
+        return [e for _, e in self._visible(audience, restaurant_id)[:limit]]
+
+    def list_body(self, limit: int, audience: str = None, restaurant_id: int = None) -> str:
+        """Complete JSON body for GET /api/v1/announcements."""
+        return '{"success": true, "announcements": [' + ','.join(self.recent_json(limit, audience, restaurant_id)) + ']}'
+
+
+# Global instance (per worker process)
+announcement_snapshot = AnnouncementSnapshot(
+    size=Config.ANNOUNCEMENT_SNAPSHOT_SIZE,
+    max_age=Config.ANNOUNCEMENT_SNAPSHOT_MAX_AGE
+)
@@ -0,0 +1,21 @@
+from flask import request
+from ..models.announcement import Announcement
+
+# Request arguments shared by /api/v1/announcements/stream and the multiplexed /api/v1/events
+
+REPLAY_LIMIT = 5  # announcements sent on a fresh connect (no Last-Event-ID)
+
+
+def last_event_id() -> int:
+    """Announcement id the client saw last (Last-Event-ID header on EventSource reconnects, or ?last_event_id)."""
+    raw = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or ''
+    raw = raw.rsplit(':', 1)[-1]
+    return int(raw) if raw.isdigit() else 0
+
+
+def audience_args():
+    """(audience, restaurant_id) a client asked for; no audience means every announcement."""
+    audience = request.args.get('audience')
+    if audience not in Announcement.AUDIENCES or audience == 'all':
+        audience = None
+    return audience, request.args.get('restaurant_id', type=int)
@@ -1,82 +1,123 @@
 import os
-import threading
-from io import BytesIO
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+import time
+from queue import Empty
+from flask import Blueprint, request, jsonify, send_from_directory, stream_with_context
+from config.settings import Config
 from implementations.extensions import db
-from implementations.feature7_image_upload.models import ImageJob
-from PIL import Image
-from azure.storage.blob import BlobServiceClient, ContentSettings
-from dotenv import load_dotenv
+from implementations.sse import sse_response, sse_event, collect_batch
+from implementations.connection_governor import governed, current_lease, closing_event, reconnect_delay_ms
+from implementations.feature7_image_upload.models import ImageJob, ImageUpload
+from implementations.feature7_image_upload.services.image_queue import image_queue
+from implementations.feature7_image_upload.services.image_events import image_events
+from implementations.feature7_image_upload.services.image_storage import storage
+from implementations.feature7_image_upload.services.image_processing import (
+    FORMATS, original_blob_name, probe_image, spool_original
+)
+from implementations.feature7_image_upload.services.image_uploads import (
+    receive_to_file, hash_file, discard, create_upload, append_chunk, part_path
+)
 
-load_dotenv()
 image_upload_bp = Blueprint('image_upload', __name__, static_folder='../static')
 
-# ---- Azure Blob Storage Configuration ----
-AZURE_CONNECTION_STRING = os.environ.get(
-    'AZURE_STORAGE_CONNECTION_STRING'
-)
-CONTAINER_NAME = os.environ.get('AZURE_CONTAINER', 'menu-images')
-ACCOUNT_NAME = 'gsg'
-BLOB_BASE_URL = f"https://{ACCOUNT_NAME}.blob.core.windows.net/{CONTAINER_NAME}"
+ALLOWED_EXT = {'.jpg', '.jpeg', '.png', '.webp'}
+CONTENT_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+FINISHED = ('completed', 'failed')
+HEARTBEAT_INTERVAL = 15  # seconds, job streams
 
-_blob_service = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-_container_client = _blob_service.get_container_client(CONTAINER_NAME)
-try:
-    _container_client.create_container()
-except Exception:
-    pass
+# Processing (services/image_processing.py) runs in image_worker.py processes,
+# or in this process's pool threads when IMAGE_WORKERS > 0
 
-# In-memory mapping for blob names (original / processed)
-_image_blobs = {}  # job_id -> {original: ..., processed: ...}
+def _job_payload(job: ImageJob) -> dict:
+    """Status response, built only from the job row (any worker can answer it)."""
+    payload = {'job_id': job.id, 'status': job.status, 'error': job.error}
+    if job.original_key:
+        payload['original_url'] = storage.url(job.original_key)
+    if job.status == 'completed':
+        if job.processed_key:
+            payload['processed_url'] = storage.url(job.processed_key)
+        derivatives = job.derivative_keys()
+        if derivatives:
+            # {variant: {width, height, webp: url, jpeg: url}}
+            payload['derivatives'] = {
+                name: {k: storage.url(v) if k in FORMATS else v for k, v in variant.items()}
+                for name, variant in derivatives.items()
+            }
+        payload.update(content_hash=job.content_hash, size_bytes=job.size_bytes,
+                       width=job.width, height=job.height)
+    return payload
 
-ALLOWED_EXT = {'.jpg', '.jpeg', '.png', '.webp'}
+def _check_extension(filename: str):
+    """Lower-case extension, or None if it is not an accepted image type."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    return ext if ext in ALLOWED_EXT else None
 
-# -------- Image Processing Logic ---------
+def _submit_file(filename: str, path: str, content_hash: str, size: int, keep_if_busy: bool = False):
+    """Turn a fully received upload (a spool file) into a job. Returns (body, status code).
+    The file is consumed: moved to the spool for the workers, or removed (kept on 429 when
+    `keep_if_busy`, so a resumable upload can retry without sending the bytes again)."""
+    ext = os.path.splitext(filename)[1].lower()
+    content_type = CONTENT_TYPES[ext]
 
-def _remove_background_make_white(img: Image.Image) -> Image.Image:
-    if img.mode not in ('RGBA', 'LA'):
-        img = img.convert('RGBA')
-    white_bg = Image.new('RGB', img.size, (255, 255, 255))
-    white_bg.paste(img, mask=img.split()[3])
-    return white_bg
+    # Same bytes already processed: reuse its stored objects (no decode, encode or blob write)
+    existing = ImageJob.processed_with_hash(content_hash)
+    if existing is not None:
+        discard(path)
+        job = ImageJob(filename=filename, content_type=content_type, content_hash=content_hash,
+                       size_bytes=size)
+        job.adopt_results(existing)
+        db.session.add(job)
+        db.session.commit()
+        return {'job_id': job.id, 'status': job.status, 'deduplicated': True}, 200
 
-def _upload_blob(blob_name: str, data: bytes, content_type: str):
-    blob_client = _blob_service.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
-    blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
+    # Header-only check: refuse non-images and oversized decodes before queueing
+    try:
+        probe_image(path)
+    except ValueError as e:
+        discard(path)
+        return {'error': str(e)}, 413 if 'too large' in str(e) else 400
 
-def _process_job(job_id: int):
-    with current_app.app_context():
-        job = ImageJob.query.get(job_id)
-        if not job:
-            return
-        job.status = 'processing'
+    # Backpressure: refuse new work rather than queueing without bound
+    if image_queue.is_full():
+        if not keep_if_busy:
+            discard(path)
+        retry_after = image_queue.retry_after()
+        return {'error': 'queue full', 'retry_after': retry_after}, 429
+
+    # 'uploading' until the original is stored, so no worker claims it early
+    job = ImageJob(filename=filename, status='uploading')
+    db.session.add(job)
+    db.session.commit()
+
+    orig_blob = original_blob_name(job)
+    try:
+        storage.put_file(orig_blob, path, content_type)
+        if storage.is_local:
+            discard(path)
+        else:
+            # Same-host workers read the bytes from the spool instead of downloading them again
+            spool_original(job, path)
+    except Exception as e:  # noqa
+        discard(path)
+        job.status = 'failed'
+        job.error = f"upload failed: {e}"[:200]
         db.session.commit()
-        blob_info = _image_blobs.get(job_id)
-        if not blob_info:
-            job.status = 'failed'
-            job.error = 'Missing original blob info'
-            db.session.commit()
-            return
-        try:
-            orig_blob = blob_info['original']
-            blob_client = _blob_service.get_blob_client(CONTAINER_NAME, orig_blob)
-            stream = blob_client.download_blob()
-            original_bytes = stream.readall()
-            img = Image.open(BytesIO(original_bytes))
-            processed_img = _remove_background_make_white(img)
-            out_buf = BytesIO()
-            processed_img.save(out_buf, format='JPEG', quality=90)
-            out_buf.seek(0)
-            processed_blob = f"processed/job{job.id}.jpg"
-            _upload_blob(processed_blob, out_buf.read(), 'image/jpeg')
-            blob_info['processed'] = processed_blob
-            job.status = 'completed'
-            job.error = None
-        except Exception as e:  # noqa
-            job.status = 'failed'
-            job.error = str(e)[:200]
-        finally:
-            db.session.commit()
+        return {'job_id': job.id, 'status': job.status, 'error': job.error}, 502
+
+    # Queued: committed as pending, picked up by the bounded worker pool
+    job.original_key = orig_blob
+    job.content_type = content_type
+    job.content_hash = content_hash
+    job.size_bytes = size
+    job.status = 'pending'
+    db.session.commit()
+    image_queue.notify()
+    return {'job_id': job.id, 'status': job.status}, 200
+
+def _json_response(body: dict, code: int):
+    resp = jsonify(body)
+    if code == 429:
+        resp.headers['Retry-After'] = str(body['retry_after'])
+    return resp, code
 
 # -------- Routes ---------
 
@@ -88,43 +129,248 @@ def upload_page():
 
 @image_upload_bp.route('/api/v1/image-jobs', methods=['POST'])
 def create_job():
+    # Checked before the multipart body is parsed (the form parser spools file parts to disk)
+    if (request.content_length or 0) > Config.IMAGE_MAX_UPLOAD_BYTES + 64 * 1024:
+        return jsonify({'error': 'upload too large', 'max_bytes': Config.IMAGE_MAX_UPLOAD_BYTES}), 413
     if 'file' not in request.files:
         return jsonify({'error': 'file required'}), 400
     f = request.files['file']
     if not f.filename:
         return jsonify({'error': 'empty filename'}), 400
-    ext = os.path.splitext(f.filename)[1].lower()
-    if ext not in ALLOWED_EXT:
+    if not _check_extension(f.filename):
         return jsonify({'error': 'unsupported extension'}), 400
+    # Streamed to disk in chunks (hashed on the way), never held in memory whole
+    try:
+        path, content_hash, size = receive_to_file(f.stream, Config.IMAGE_MAX_UPLOAD_BYTES)
+    except ValueError:
+        return jsonify({'error': 'upload too large', 'max_bytes': Config.IMAGE_MAX_UPLOAD_BYTES}), 413
+    return _json_response(*_submit_file(f.filename, path, content_hash, size))
 
-    job = ImageJob(filename=f.filename, status='pending')
-    db.session.add(job)
-    db.session.commit()
+# -------- Resumable uploads ---------
+# POST /api/v1/image-uploads {filename, size} -> {upload_id, offset, chunk_size}
+# PUT  /api/v1/image-uploads/<id> (Upload-Offset header, raw bytes) -> {offset} ... last chunk -> job
+# GET  /api/v1/image-uploads/<id> -> {offset} to resume after a dropped connection
+
+@image_upload_bp.route('/api/v1/image-uploads', methods=['POST'])
+def start_upload():
+    data = request.get_json() or {}
+    filename = (data.get('filename') or '').strip()
+    size = data.get('size')
+    if not filename or not _check_extension(filename):
+        return jsonify({'error': 'filename with a supported extension required'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size (bytes) required'}), 400
+    if size > Config.IMAGE_MAX_UPLOAD_BYTES:
+        return jsonify({'error': 'upload too large', 'max_bytes': Config.IMAGE_MAX_UPLOAD_BYTES}), 413
+    upload = create_upload(filename, size)
+    return jsonify({**upload.to_dict(), 'chunk_size': Config.IMAGE_UPLOAD_CHUNK_SIZE}), 201
+
+@image_upload_bp.route('/api/v1/image-uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    upload = db.session.get(ImageUpload, upload_id)
+    if not upload:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(upload.to_dict())
+
+@image_upload_bp.route('/api/v1/image-uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    upload = db.session.get(ImageUpload, upload_id)
+    if not upload:
+        return jsonify({'error': 'not found'}), 404
+    if upload.job_id is not None:
+        job = db.session.get(ImageJob, upload.job_id)
+        return jsonify({**upload.to_dict(), **(_job_payload(job) if job else {})})
+    offset = request.headers.get('Upload-Offset', request.args.get('offset', ''))
+    if not str(offset).isdigit():
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    try:
+        new_offset = append_chunk(upload, int(offset), request.stream)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'chunk_size': Config.IMAGE_UPLOAD_CHUNK_SIZE}), 413
+    if new_offset is None:
+        db.session.refresh(upload)
+        return jsonify({'error': 'offset mismatch', **upload.to_dict()}), 409
+    if new_offset < upload.size_bytes:
+        return jsonify(upload.to_dict())
+    # Last chunk: hash the assembled file and submit it like a single-request upload.
+    # After a 429 the client repeats the PUT at the final offset with an empty body.
+    path = part_path(upload)
+    body, code = _submit_file(upload.filename, path, hash_file(path), upload.size_bytes, keep_if_busy=True)
+    result = {**upload.to_dict(), **body}
+    if body.get('job_id') is not None:
+        upload.job_id = body['job_id']
+        db.session.commit()
+        result['job_id'] = upload.job_id
+    elif code in (400, 413):
+        db.session.delete(upload)  # not an acceptable image; the bytes are already gone
+        db.session.commit()
+    return _json_response(result, code)
 
-    orig_blob = f"original/job{job.id}{ext}"
-    data = f.read()
-    content_type = 'image/jpeg' if ext in ('.jpg', '.jpeg') else 'image/png'
-    _upload_blob(orig_blob, data, content_type)
-    _image_blobs[job.id] = {'original': orig_blob}
+# -------- Job status: plain, long-poll (?wait=), batch and SSE ---------
+# Waits are woken by image_events (workers publish every status change), so a waiting
+# request costs no queries until its job actually changes.
+
+def _job_ids():
+    """Job ids from ?ids=1,2,3 (or a JSON body {"job_ids": [...]}), de-duplicated, in order."""
+    raw = request.args.get('ids')
+    if raw is not None:
+        ids = [part.strip() for part in raw.split(',')]
+    else:
+        ids = (request.get_json(silent=True) or {}).get('job_ids') or []
+    result = []
+    for job_id in ids:
+        if not str(job_id).isdigit():
+            return None
+        if int(job_id) not in result:
+            result.append(int(job_id))
+    return result
+
+def _load_jobs(job_ids) -> dict:
+    return {job.id: job for job in ImageJob.query.filter(ImageJob.id.in_(list(job_ids))).all()}
 
-    threading.Thread(target=_process_job, args=(job.id,), daemon=True).start()
-    return jsonify({'job_id': job.id, 'status': job.status})
-#here is the short polling to check the status of the image  job
 @image_upload_bp.route('/api/v1/image-jobs/<int:job_id>', methods=['GET'])
 def job_status(job_id):
-    job = ImageJob.query.get(job_id)
+    """Current status. ?wait=N holds the request up to N seconds (max IMAGE_JOB_MAX_WAIT) until the
+    status differs from ?status= (default: the current one); a finished job returns at once."""
+    wait = request.args.get('wait', '')
+    if wait.isdigit() and int(wait) > 0:
+        return _wait_for_job(job_id, min(int(wait), Config.IMAGE_JOB_MAX_WAIT), request.args.get('status'))
+    job = db.session.get(ImageJob, job_id)
     if not job:
         return jsonify({'error': 'not found'}), 404
-    payload = {'job_id': job.id, 'status': job.status, 'error': job.error}
-    blob_info = _image_blobs.get(job_id)
-    if blob_info:
-        if 'original' in blob_info:
-            payload['original_url'] = f"{BLOB_BASE_URL}/{blob_info['original']}"
-        if job.status == 'completed' and blob_info.get('processed'):
-            payload['processed_url'] = f"{BLOB_BASE_URL}/{blob_info['processed']}"
+    return jsonify(_job_payload(job))
+
+@governed('image_jobs', sse=False)
+def _wait_for_job(job_id: int, wait: int, known_status):
+    # Watch before reading so a change committed in between is not missed
+    events = image_events.watch([job_id])
+    try:
+        job = db.session.get(ImageJob, job_id)
+        if not job:
+            return jsonify({'error': 'not found'}), 404
+        if job.status in FINISHED or (known_status and job.status != known_status):
+            return jsonify({**_job_payload(job), 'has_update': True})
+        known_status = job.status
+        db.session.rollback()  # hand the connection back to the pool while waiting
+        lease = current_lease()
+        deadline = time.time() + wait
+        while not lease.closed:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                # Short waits so shutdown is noticed quickly
+                _, status = events.get(timeout=min(remaining, 1.0))
+            except Empty:
+                continue
+            if status == known_status:
+                continue
+            job = db.session.get(ImageJob, job_id)
+            if not job:
+                return jsonify({'error': 'not found'}), 404
+            if job.status != known_status:
+                return jsonify({**_job_payload(job), 'has_update': True})
+            db.session.rollback()
+    finally:
+        image_events.unwatch(events)
+
+    job = db.session.get(ImageJob, job_id)
+    if not job:
+        return jsonify({'error': 'not found'}), 404
+    payload = {**_job_payload(job), 'has_update': job.status != known_status}
+    if lease.closed:
+        payload['retry_after_ms'] = reconnect_delay_ms('shutdown')
     return jsonify(payload)
 
+@image_upload_bp.route('/api/v1/image-jobs/batch', methods=['GET', 'POST'])
+def job_status_batch():
+    """Status of many jobs in one query: ?ids=1,2,3 or POST {"job_ids": [...]}."""
+    job_ids = _job_ids()
+    if not job_ids:
+        return jsonify({'error': 'job ids required'}), 400
+    if len(job_ids) > Config.IMAGE_JOB_BATCH_MAX:
+        return jsonify({'error': 'too many job ids', 'max': Config.IMAGE_JOB_BATCH_MAX}), 400
+    jobs = _load_jobs(job_ids)
+    return jsonify({
+        'jobs': [_job_payload(jobs[job_id]) for job_id in job_ids if job_id in jobs],
+        'missing': [job_id for job_id in job_ids if job_id not in jobs],
+    })
+
+@image_upload_bp.route('/api/v1/image-jobs/stream', methods=['GET'])
+@governed('image_jobs')
+def stream_jobs():
+    """SSE for ?ids=1,2,3: a `job` event with each job's current status on connect, then one per
+    status change; `done` once every job has completed or failed, and the stream ends.
+    Unknown ids are reported once in a `missing` event."""
+    job_ids = _job_ids()
+    if not job_ids:
+        return jsonify({'error': 'job ids required'}), 400
+    if len(job_ids) > Config.IMAGE_JOB_BATCH_MAX:
+        return jsonify({'error': 'too many job ids', 'max': Config.IMAGE_JOB_BATCH_MAX}), 400
+    lease = current_lease()
+
+    def event_stream():
+        events = image_events.watch(job_ids)
+        sent = {}  # job_id -> status last sent on this connection
+        try:
+            def changes(only):
+                """Events for jobs whose status differs from what this client has."""
+                chunk = ''
+                for job in _load_jobs(only).values():
+                    if sent.get(job.id) != job.status:
+                        sent[job.id] = job.status
+                        chunk += sse_event(_job_payload(job), event='job')
+                db.session.rollback()  # no connection held between events
+                return chunk
+
+            chunk = changes(job_ids)
+            missing = [job_id for job_id in job_ids if job_id not in sent]
+            if missing:
+                chunk += sse_event({'job_ids': missing}, event='missing')
+            yield chunk or ": connected\n\n"
+
+            def next_event(timeout):
+                try:
+                    return events.get(timeout=timeout)
+                except Empty:
+                    return None
+
+            last_heartbeat = time.time()
+            while any(status not in FINISHED for status in sent.values()):
+                item = next_event(1.0)
+                if item is not None:
+                    changed = {job_id for job_id, status in collect_batch(item, next_event)
+                               if job_id in sent and sent[job_id] != status}
+                    chunk = changes(changed) if changed else ''
+                    if chunk:
+                        lease.touch()
+                        last_heartbeat = time.time()
+                        yield chunk
+                if lease.should_close():
+                    yield closing_event(lease.close_reason)
+                    return
+                if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    last_heartbeat = time.time()
+                    yield ": keepalive\n\n"
+            yield sse_event({'job_ids': list(sent)}, event='done')
+        finally:
+            image_events.unwatch(events)
+
+    return sse_response(stream_with_context(event_stream()))
+
+@image_upload_bp.route('/media/images/<path:key>')
+def local_image(key):
+    """Serve images kept by the local storage backend."""
+    if not storage.is_local:
+        return jsonify({'error': 'not found'}), 404
+    return send_from_directory(os.path.abspath(storage.root), key, max_age=86400)
+
 @image_upload_bp.route('/api/v1/image-jobs/health')
 def health():
     return {'status': 'ok'}
 
+@image_upload_bp.route('/api/v1/image-jobs/metrics')
+def queue_metrics():
+    """Queue length and processing times of the image worker pool."""
+    return jsonify(image_queue.metrics())
+
@@ -1,2 +1,2 @@
 from .image_job import ImageJob  # re-export
-
+from .image_upload import ImageUpload  # re-export
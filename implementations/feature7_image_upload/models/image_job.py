@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from implementations.extensions import db
 
@@ -5,10 +6,42 @@ class ImageJob(db.Model):
     __tablename__ = 'image_jobs'
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
-    status = db.Column(db.String(32), nullable=False, default='pending')  # pending, processing, completed, failed
+    status = db.Column(db.String(32), nullable=False, default='pending', index=True)  # uploading, pending, processing, completed, failed
     error = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = db.Column(db.DateTime)   # claimed by a pool worker
+    finished_at = db.Column(db.DateTime, index=True)  # completed or failed
+    # Stored objects (storage keys, not URLs: the public base URL is configuration)
+    original_key = db.Column(db.String(255))
+    processed_key = db.Column(db.String(255))
+    derivatives = db.Column(db.Text)  # JSON {variant: {width, height, <format>: key}}
+    content_type = db.Column(db.String(64))
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 hex of the upload
+    size_bytes = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+
+    def derivative_keys(self) -> dict:
+        return json.loads(self.derivatives) if self.derivatives else {}
+
+    @classmethod
+    def processed_with_hash(cls, content_hash: str):
+        """Earliest completed job for identical content (the content-addressed index), or None."""
+        if not content_hash:
+            return None
+        return cls.query.filter(cls.content_hash == content_hash, cls.status == 'completed')\
+                        .order_by(cls.id).first()
+
+    def adopt_results(self, source: 'ImageJob'):
+        """Point this job at another job's stored objects and mark it completed (no processing)."""
+        self.original_key = source.original_key
+        self.processed_key = source.processed_key
+        self.derivatives = source.derivatives
+        self.width, self.height = source.width, source.height
+        self.status = 'completed'
+        self.error = None
+        self.started_at = self.finished_at = datetime.utcnow()
 
     def to_dict(self):
         return {
@@ -17,6 +50,9 @@ class ImageJob(db.Model):
             'status': self.status,
             'error': self.error,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'content_hash': self.content_hash,
+            'size_bytes': self.size_bytes,
+            'width': self.width,
+            'height': self.height
         }
-
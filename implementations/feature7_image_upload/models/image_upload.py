@@ -0,0 +1,22 @@
+from datetime import datetime
+from implementations.extensions import db
+
+class ImageUpload(db.Model):
+    """A resumable upload in progress; its bytes are assembled in the spool directory."""
+    __tablename__ = 'image_uploads'
+    id = db.Column(db.String(32), primary_key=True)  # random hex token
+    filename = db.Column(db.String(255), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    received_bytes = db.Column(db.Integer, nullable=False, default=0)
+    job_id = db.Column(db.Integer)  # set once the upload is complete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size_bytes': self.size_bytes,
+            'offset': self.received_bytes,
+            'job_id': self.job_id
+        }
@@ -0,0 +1,10 @@
+from datetime import datetime
+from implementations.extensions import db
+
+class ImageWorkerHeartbeat(db.Model):
+    """A running image worker pool (web or image_worker.py process), refreshed on a timer,
+    so every process can count the pool threads of the whole deployment."""
+    __tablename__ = 'image_workers'
+    id = db.Column(db.String(128), primary_key=True)  # host:pid
+    threads = db.Column(db.Integer, nullable=False)
+    seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
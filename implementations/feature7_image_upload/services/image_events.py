@@ -0,0 +1,177 @@
+import json
+import logging
+import threading
+import time
+from queue import Empty, Full, Queue
+from typing import Dict, Iterable, List, Optional, Set
+from config.settings import Config
+from implementations.extensions import db
+from implementations.feature4_restaurant_notifications.services.redis_client import get_redis
+from ..models.image_job import ImageJob
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "image_jobs"
+
+
+class ImageJobEvents:
+    """Job state-change notifications from the image workers to waiting requests.
+    Whoever changes a job's status calls publish(); it goes out on one Redis channel (the
+    image_worker.py processes are separate from the web process) and every web worker keeps a
+    single subscription that wakes only the long polls and streams watching that job.
+    As a safety net (no Redis, or a notification lost) one sweep per worker re-reads the status
+    of every watched job each `recheck` seconds in a single query, whatever the number of waiters.
+    Items are (job_id, status) and only a wake-up: waiters re-read the row when the status is
+    new to them, so duplicates are harmless."""
+    def __init__(self, channel: str, recheck: float):
+        self.channel = channel
+        self.recheck = recheck
+        self.app = None
+        self.watchers: Dict[int, Set[Queue]] = {}  # job_id -> queues of the requests watching it
+        self.seen: Dict[int, str] = {}  # last status delivered per watched job
+        self.lock = threading.Lock()
+        self.subscribed = threading.Event()
+        self.stopping = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.outbox: Queue = Queue(maxsize=1000)  # events waiting for the Redis publish
+        self.sender: Optional[threading.Thread] = None
+        self.redis_retry_at = 0.0  # publishing skips Redis until then after a failure
+
+    def init_app(self, app):
+        """Web process only: enables the sweep (workers just publish)."""
+        self.app = app
+
+    def watch(self, job_ids: Iterable[int]) -> Queue:
+        """Register a waiter for these jobs; (job_id, status) items arrive on the returned queue."""
+        self.start()
+        q = Queue(maxsize=100)
+        with self.lock:
+            for job_id in job_ids:
+                self.watchers.setdefault(job_id, set()).add(q)
+        return q
+
+    def unwatch(self, q: Queue):
+        with self.lock:
+            for job_id in [j for j, queues in self.watchers.items() if q in queues]:
+                self.watchers[job_id].discard(q)
+                if not self.watchers[job_id]:
+                    del self.watchers[job_id]
+                    self.seen.pop(job_id, None)
+
+    def watcher_count(self) -> int:
+        with self.lock:
+            return len({q for queues in self.watchers.values() for q in queues})
+
+    def publish(self, job_id: int, status: str):
+        """Announce a committed status change to every web worker; never blocks the caller.
+        Local waiters are woken directly unless this process's own subscription will deliver
+        it back, and the Redis publish happens on a background thread."""
+        event = {'job_id': job_id, 'status': status}
+        if not self.subscribed.is_set():
+            self._deliver(event)
+        self._start_sender()
+        try:
+            self.outbox.put_nowait(event)
+        except Full:
+            pass  # Redis is stuck; other workers' waiters see the change on their next sweep
+
+    def _send(self):
+        while not self.stopping.is_set():
+            try:
+                event = self.outbox.get(timeout=1.0)
+            except Empty:
+                continue
+            if time.time() < self.redis_retry_at:
+                continue
+            try:
+                get_redis().publish(self.channel, json.dumps(event))
+            except Exception as e:
+                self.redis_retry_at = time.time() + 30
+                logger.warning(f"Image job notification via Redis failed: {e}")
+                if self.subscribed.is_set():
+                    self._deliver(event)
+
+    def _deliver(self, event: dict):
+        job_id, status = event.get('job_id'), event.get('status')
+        with self.lock:
+            queues = list(self.watchers.get(job_id, ()))
+            if queues:
+                self.seen[job_id] = status
+        for q in queues:
+            try:
+                q.put_nowait((job_id, status))
+            except Full:
+                pass  # the waiter is far behind; the next sweep delivers the latest status again
+
+    def start(self):
+        """Start the worker's Redis listener and the sweep on first use."""
+        with self.lock:
+            if self.threads:
+                return
+            targets = [('image-job-events', self._listen)]
+            if self.app is not None:
+                targets.append(('image-job-sweep', self._sweep))
+            for name, target in targets:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _start_sender(self):
+        with self.lock:
+            if self.sender is None:
+                self.sender = threading.Thread(target=self._send, name='image-job-publish', daemon=True)
+                self.sender.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _listen(self):
+        backoff = 1
+        while not self.stopping.is_set():
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub()
+                pubsub.subscribe(self.channel)
+                self.subscribed.set()
+                backoff = 1
+                while not self.stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._deliver(json.loads(message['data']))
+            except Exception as e:
+                logger.error(f"Image job event subscription lost: {e}")
+            finally:
+                self.subscribed.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self.stopping.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _sweep(self):
+        while not self.stopping.wait(self.recheck):
+            with self.lock:
+                job_ids = list(self.watchers)
+            if not job_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    try:
+                        rows = []
+                        for start in range(0, len(job_ids), 500):
+                            rows += db.session.query(ImageJob.id, ImageJob.status)\
+                                              .filter(ImageJob.id.in_(job_ids[start:start + 500])).all()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                logger.error(f"Image job sweep failed: {e}")
+                continue
+            for job_id, status in rows:
+                if self.seen.get(job_id) != status:
+                    self._deliver({'job_id': job_id, 'status': status})
+
+
+# Global instance (per worker process)
+image_events = ImageJobEvents(CHANNEL, recheck=Config.IMAGE_JOB_RECHECK)
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+from datetime import datetime
+from io import BytesIO
+from typing import Tuple
+from PIL import Image, ImageOps
+from config.settings import Config
+from implementations.extensions import db
+from .image_storage import storage
+from ..models.image_job import ImageJob
+
+logger = logging.getLogger(__name__)
+
+
+def original_blob_name(job: ImageJob) -> str:
+    return f"original/job{job.id}{os.path.splitext(job.filename)[1].lower()}"
+
+def derivative_key(job: ImageJob, variant: str, fmt: str) -> str:
+    return f"derivatives/job{job.id}/{variant}.{FORMATS[fmt][0]}"
+
+
+# -------- Spool: uploaded bytes handed from the web process to the image workers ---------
+
+def spool_path(job: ImageJob) -> str:
+    return os.path.join(Config.IMAGE_SPOOL_DIR, f"job{job.id}{os.path.splitext(job.filename)[1].lower()}")
+
+def spool_original(job: ImageJob, received_path: str) -> str:
+    """Move the received upload (already on disk) to where a worker on this host reads it."""
+    os.makedirs(Config.IMAGE_SPOOL_DIR, exist_ok=True)
+    path = spool_path(job)
+    os.replace(received_path, path)
+    return path
+
+
+def _remove_spooled(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# -------- Image Processing Logic ---------
+
+# format -> (file extension, content type)
+FORMATS = {'webp': ('webp', 'image/webp'), 'jpeg': ('jpg', 'image/jpeg')}
+
+def _parse_variants(spec: str):
+    """'thumb:200,card:600' -> [('card', 600), ('thumb', 200)] (largest first)."""
+    variants = []
+    for part in spec.split(','):
+        name, _, edge = part.strip().partition(':')
+        if name and edge.isdigit():
+            variants.append((name, int(edge)))
+    return sorted(variants, key=lambda v: v[1], reverse=True)
+
+VARIANTS = _parse_variants(Config.IMAGE_VARIANTS) or [('full', 1600)]
+OUTPUT_FORMATS = [f.strip() for f in Config.IMAGE_FORMATS.split(',') if f.strip() in FORMATS] or ['jpeg']
+
+def _remove_background_make_white(img: Image.Image) -> Image.Image:
+    if 'A' not in img.getbands() and 'transparency' not in img.info:
+        return img if img.mode == 'RGB' else img.convert('RGB')
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    white_bg = Image.new('RGB', img.size, (255, 255, 255))
+    white_bg.paste(img, mask=img.getchannel('A'))
+    return white_bg
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    out_buf = BytesIO()
+    if fmt == 'webp':
+        img.save(out_buf, format='WEBP', quality=Config.IMAGE_WEBP_QUALITY, method=4)
+    else:
+        img.save(out_buf, format='JPEG', quality=Config.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return out_buf.getvalue()
+
+def _draft_for_variants(img: Image.Image):
+    """JPEG only: decode at the smallest DCT scale (1/2, 1/4, 1/8) that still covers the
+    largest variant. Changes img.size to the reduced size without decoding anything."""
+    longest = max(img.size)
+    target = min(longest, VARIANTS[0][1])
+    if img.format == 'JPEG' and target < longest:
+        scale = target / longest
+        img.draft('RGB', (int(img.size[0] * scale) + 1, int(img.size[1] * scale) + 1))
+
+def _check_pixels(img: Image.Image):
+    if img.size[0] * img.size[1] > Config.IMAGE_MAX_PIXELS:
+        raise ValueError(f"image too large: {img.size[0]}x{img.size[1]} exceeds {Config.IMAGE_MAX_PIXELS} pixels")
+
+def probe_image(path: str) -> Tuple[int, int]:
+    """(width, height) from the header only; raises ValueError for non-images or images
+    whose decode would exceed IMAGE_MAX_PIXELS."""
+    try:
+        img = Image.open(path)
+    except Exception:
+        raise ValueError('not a supported image')
+    with img:
+        size = img.size
+        _draft_for_variants(img)
+        _check_pixels(img)
+    return size
+
+def _encode_variants(current: Image.Image):
+    for name, edge in VARIANTS:
+        # reducing_gap: integer-factor reduce() first, then a short high-quality resample
+        current.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=2.0)
+        for fmt in OUTPUT_FORMATS:
+            yield name, fmt, _encode(current, fmt), current.width, current.height
+
+def render_derivatives(source):
+    """Decode once; returns (original size, outputs) where outputs lazily yields
+    (variant, format, bytes, width, height), largest variant first.
+    JPEGs are decoded straight at the smallest DCT scale that still covers the largest
+    variant (draft mode), and each smaller variant is reduced from the previous one.
+    Peak memory is bounded by IMAGE_MAX_PIXELS, checked before anything is decoded."""
+    with Image.open(source) as img:
+        original_size = img.size
+        _draft_for_variants(img)
+        _check_pixels(img)
+        img.load()
+        current = _remove_background_make_white(ImageOps.exif_transpose(img))
+    return original_size, _encode_variants(current)
+
+def process_job(job_id: int) -> str:
+    """Queue handler (runs in an app context on a claimed job); returns the final status.
+    Reads the spooled upload when this host has it, otherwise the stored original
+    (memory-mapped with the local backend)."""
+    job = db.session.get(ImageJob, job_id)
+    if not job:
+        return 'failed'
+    path = spool_path(job)
+    # An identical upload finished while this one waited in the queue
+    existing = ImageJob.processed_with_hash(job.content_hash)
+    if existing is not None:
+        original_key = job.original_key
+        job.adopt_results(existing)
+        job.original_key = original_key
+        db.session.commit()
+        _remove_spooled(path)
+        return job.status
+    try:
+        source = path if os.path.exists(path) else storage.open(job.original_key or original_blob_name(job))
+        try:
+            (job.width, job.height), outputs = render_derivatives(source)
+            derivatives = {}
+            for name, fmt, data, width, height in outputs:
+                key = derivative_key(job, name, fmt)
+                storage.put(key, data, FORMATS[fmt][1])
+                derivatives.setdefault(name, {'width': width, 'height': height})[fmt] = key
+        finally:
+            if not isinstance(source, str):
+                source.close()
+        job.derivatives = json.dumps(derivatives)
+        # processed_url: the largest JPEG (falls back to whatever format was produced)
+        largest = derivatives[VARIANTS[0][0]]
+        job.processed_key = largest.get('jpeg') or largest[OUTPUT_FORMATS[0]]
+        job.status = 'completed'
+        job.error = None
+    except Exception as e:  # noqa
+        job.status = 'failed'
+        job.error = str(e)[:200]
+    finally:
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    _remove_spooled(path)
+    return job.status
@@ -0,0 +1,203 @@
+import logging
+import math
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from config.settings import Config
+from implementations.extensions import db
+from .image_events import image_events
+from ..models.image_job import ImageJob
+from ..models.worker_heartbeat import ImageWorkerHeartbeat
+
+logger = logging.getLogger(__name__)
+
+
+class ImageJobQueue:
+    """Bounded pool of image workers draining a queue kept in image_jobs itself.
+    A job is queued by being committed as 'pending', so the backlog survives restarts and is
+    shared by every worker process; each pool thread claims the oldest pending job with a
+    conditional UPDATE. Uploads are refused once `depth` jobs are waiting.
+    Metrics and Retry-After come from shared data (the job rows and the pools' heartbeats), so
+    a web process with no pool of its own reports the image_worker.py processes' figures."""
+    def __init__(self, workers: int, depth: int, poll: float, stale_after: int, heartbeat: int):
+        self.workers = workers
+        self.depth = depth
+        self.poll = poll
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat
+        self.app = None
+        self.handler: Optional[Callable[[int], str]] = None
+        self.threads: List[threading.Thread] = []
+        self.wakeup = threading.Condition()
+        self.stopping = threading.Event()
+
+    def init_app(self, app, handler: Callable[[int], str]):
+        """Start the pool. `handler(job_id)` runs in an app context on a claimed job and returns
+        its final status."""
+        self.app = app
+        self.handler = handler
+        self.start()
+
+    def start(self):
+        if self.threads or self.workers <= 0:
+            return
+        targets = [(f'image-worker-{n}', self._run) for n in range(self.workers)]
+        targets.append(('image-queue-housekeeping', self._housekeeping))
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
+
+    def notify(self):
+        """A job was just queued; wake one idle worker instead of waiting for its next poll."""
+        with self.wakeup:
+            self.wakeup.notify()
+
+    def pending_count(self) -> int:
+        return ImageJob.query.filter(ImageJob.status == 'pending').count()
+
+    def is_full(self) -> bool:
+        return self.pending_count() >= self.depth
+
+    def live_workers(self) -> int:
+        """Pool threads of every process (any host) whose heartbeat is recent."""
+        cutoff = datetime.utcnow() - timedelta(seconds=3 * self.heartbeat)
+        return int(db.session.query(db.func.coalesce(db.func.sum(ImageWorkerHeartbeat.threads), 0))
+                   .filter(ImageWorkerHeartbeat.seen_at >= cutoff).scalar())
+
+    def recent_timings(self, limit: int = 200) -> Tuple[List[float], List[float]]:
+        """(processing, queue wait) seconds of the last `limit` jobs that went through a worker."""
+        rows = db.session.query(ImageJob.created_at, ImageJob.started_at, ImageJob.finished_at)\
+                         .filter(ImageJob.finished_at.isnot(None), ImageJob.started_at.isnot(None),
+                                 ImageJob.finished_at > ImageJob.started_at)\
+                         .order_by(ImageJob.finished_at.desc()).limit(limit).all()
+        durations = [(finished - started).total_seconds() for _, started, finished in rows]
+        waits = [(started - created).total_seconds() for created, started, _ in rows if created]
+        return durations, waits
+
+    def retry_after(self) -> int:
+        """Seconds until the backlog has likely drained enough to accept another upload."""
+        durations, _ = self.recent_timings(50)
+        average = sum(durations) / len(durations) if durations else 1.0
+        return max(1, math.ceil(self.pending_count() * average / max(1, self.live_workers())))
+
+    def requeue_stale(self) -> int:
+        """Put jobs whose worker died mid-processing back in the queue."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        requeued = ImageJob.query.filter(ImageJob.status == 'processing', ImageJob.started_at < cutoff)\
+                                 .update({ImageJob.status: 'pending', ImageJob.started_at: None},
+                                         synchronize_session=False)
+        db.session.commit()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted image jobs")
+            with self.wakeup:
+                self.wakeup.notify_all()
+        return requeued
+
+    def _housekeeping(self):
+        """Every `heartbeat` seconds: refresh this pool's heartbeat and requeue orphaned jobs.
+        Runs in every pool, so a crashed process's jobs come back while the others keep running."""
+        name = f'{socket.gethostname()}:{os.getpid()}'[:128]
+        while True:
+            stopping = self.stopping.is_set()
+            with self.app.app_context():
+                try:
+                    if stopping:
+                        ImageWorkerHeartbeat.query.filter_by(id=name).delete()
+                    else:
+                        db.session.merge(ImageWorkerHeartbeat(id=name, threads=self.workers,
+                                                              seen_at=datetime.utcnow()))
+                        expired = datetime.utcnow() - timedelta(seconds=10 * self.heartbeat)
+                        ImageWorkerHeartbeat.query.filter(ImageWorkerHeartbeat.seen_at < expired).delete()
+                    db.session.commit()
+                    if not stopping:
+                        self.requeue_stale()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Image queue housekeeping failed: {e}")
+                finally:
+                    db.session.remove()
+            if stopping:
+                return
+            self.stopping.wait(self.heartbeat)
+
+    def _claim(self) -> Optional[int]:
+        while True:
+            job_id = db.session.query(ImageJob.id).filter(ImageJob.status == 'pending')\
+                                                  .order_by(ImageJob.id).limit(1).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            claimed = ImageJob.query.filter(ImageJob.id == job_id, ImageJob.status == 'pending')\
+                                    .update({ImageJob.status: 'processing', ImageJob.started_at: datetime.utcnow()},
+                                            synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return job_id
+            # Another thread or process took it; try the next one
+
+    def _run(self):
+        while not self.stopping.is_set():
+            job_id = None
+            with self.app.app_context():
+                try:
+                    job_id = self._claim()
+                    if job_id is not None:
+                        image_events.publish(job_id, 'processing')
+                        image_events.publish(job_id, self.handler(job_id))
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Image worker error (job {job_id}): {e}")
+                finally:
+                    db.session.remove()
+            if job_id is None:
+                with self.wakeup:
+                    self.wakeup.wait(self.poll)
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    def metrics(self) -> dict:
+        """Queue length, live pool size and timings of recent jobs, the same from any process."""
+        counts = dict(db.session.query(ImageJob.status, db.func.count(ImageJob.id))
+                      .group_by(ImageJob.status).all())
+        durations, waits = self.recent_timings()
+        return {
+            'queue_length': counts.get('pending', 0),
+            'queue_depth': self.depth,
+            'processing': counts.get('processing', 0),
+            'workers': self.live_workers(),
+            'busy_workers': counts.get('processing', 0),
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'processing_seconds': {
+                'avg': round(sum(durations) / len(durations), 3) if durations else None,
+                'p50': self._percentile(durations, 0.5),
+                'p95': self._percentile(durations, 0.95),
+            },
+            'queue_wait_seconds': {
+                'avg': round(sum(waits) / len(waits), 3) if waits else None,
+                'p95': self._percentile(waits, 0.95),
+            },
+        }
+
+
+# Global instance (per worker process)
+image_queue = ImageJobQueue(
+    workers=Config.IMAGE_WORKERS,
+    depth=Config.IMAGE_QUEUE_DEPTH,
+    poll=Config.IMAGE_QUEUE_POLL,
+    stale_after=Config.IMAGE_JOB_STALE_AFTER,
+    heartbeat=Config.IMAGE_WORKER_HEARTBEAT
+)
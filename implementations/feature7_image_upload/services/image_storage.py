@@ -0,0 +1,115 @@
+import logging
+import mmap
+import os
+import shutil
+import threading
+from io import BytesIO
+from config.settings import Config
+
+try:
+    from azure.storage.blob import BlobServiceClient, ContentSettings  # type: ignore
+except Exception:  # pragma: no cover
+    BlobServiceClient = ContentSettings = None
+
+logger = logging.getLogger(__name__)
+
+
+class AzureBlobStorage:
+    """Azure Blob Storage. The client and container are set up on first use, not at import,
+    so importing the app never touches the network."""
+    is_local = False
+
+    def __init__(self, connection_string: str, container: str, base_url: str):
+        self.connection_string = connection_string
+        self.container = container
+        self.base_url = base_url.rstrip('/')
+        self.service = None
+        self.lock = threading.Lock()
+
+    def _service(self):
+        with self.lock:
+            if self.service is None:
+                service = BlobServiceClient.from_connection_string(self.connection_string)
+                try:
+                    service.get_container_client(self.container).create_container()
+                except Exception:
+                    pass  # already exists
+                self.service = service
+            return self.service
+
+    def put(self, key: str, data: bytes, content_type: str):
+        blob_client = self._service().get_blob_client(container=self.container, blob=key)
+        blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
+
+    def put_file(self, key: str, path: str, content_type: str):
+        """Upload from a file; the SDK sends it in blocks, so memory use does not grow with size."""
+        blob_client = self._service().get_blob_client(container=self.container, blob=key)
+        with open(path, 'rb') as f:
+            blob_client.upload_blob(f, length=os.path.getsize(path), overwrite=True,
+                                    content_settings=ContentSettings(content_type=content_type))
+
+    def get(self, key: str) -> bytes:
+        return self._service().get_blob_client(self.container, key).download_blob().readall()
+
+    def open(self, key: str):
+        return BytesIO(self.get(key))
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class LocalStorage:
+    """Files under a directory, served by the app at `base_url` (dev, tests, single host)."""
+    is_local = True
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def local_path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError('invalid storage key')
+        return path
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.part', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.part', path)
+
+    def put_file(self, key: str, path: str, content_type: str):
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(path, dest + '.part')
+        os.replace(dest + '.part', dest)
+
+    def get(self, key: str) -> bytes:
+        with open(self.local_path(key), 'rb') as f:
+            return f.read()
+
+    def open(self, key: str):
+        """Memory-mapped, file-like view (read/seek) for decoders; no copy into the heap."""
+        with open(self.local_path(key), 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+def build_storage():
+    """IMAGE_STORAGE=azure|local; by default Azure when a connection string is configured."""
+    backend = Config.IMAGE_STORAGE or ('azure' if Config.AZURE_STORAGE_CONNECTION_STRING else 'local')
+    if backend == 'azure':
+        if BlobServiceClient is None:
+            logger.error("azure-storage-blob is not installed; image storage falls back to the local filesystem")
+        else:
+            return AzureBlobStorage(Config.AZURE_STORAGE_CONNECTION_STRING, Config.AZURE_CONTAINER,
+                                    Config.IMAGE_PUBLIC_BASE_URL or
+                                    f"https://{Config.AZURE_ACCOUNT_NAME}.blob.core.windows.net/{Config.AZURE_CONTAINER}")
+    return LocalStorage(Config.IMAGE_LOCAL_ROOT, Config.IMAGE_PUBLIC_BASE_URL or '/media/images')
+
+
+# Global instance
+storage = build_storage()
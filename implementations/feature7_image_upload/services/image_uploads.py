@@ -0,0 +1,112 @@
+import hashlib
+import os
+import secrets
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from config.settings import Config
+from implementations.extensions import db
+from ..models.image_upload import ImageUpload
+
+READ_CHUNK = 64 * 1024
+
+
+def _uploads_dir() -> str:
+    path = os.path.join(Config.IMAGE_SPOOL_DIR, 'uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def receive_to_file(stream, limit: int) -> Tuple[str, str, int]:
+    """Copy a request body to a spool file chunk by chunk, hashing as it goes.
+    Returns (path, sha256 hex, size); raises ValueError past `limit` bytes."""
+    path = os.path.join(_uploads_dir(), f"{uuid.uuid4().hex}.part")
+    hasher, size = hashlib.sha256(), 0
+    try:
+        with open(path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(READ_CHUNK), b''):
+                size += len(chunk)
+                if size > limit:
+                    raise ValueError('upload too large')
+                hasher.update(chunk)
+                f.write(chunk)
+    except Exception:
+        discard(path)
+        raise
+    return path, hasher.hexdigest(), size
+
+def hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# -------- Resumable uploads: create, then PUT chunks at the current offset ---------
+
+def part_path(upload: ImageUpload) -> str:
+    return os.path.join(_uploads_dir(), f"resumable-{upload.id}.part")
+
+def create_upload(filename: str, size: int) -> ImageUpload:
+    expire_uploads()
+    upload = ImageUpload(id=secrets.token_hex(16), filename=filename, size_bytes=size, received_bytes=0)
+    db.session.add(upload)
+    db.session.commit()
+    open(part_path(upload), 'wb').close()
+    return upload
+
+def append_chunk(upload: ImageUpload, offset: int, stream) -> Optional[int]:
+    """Write one chunk at `offset` (must equal the bytes received so far); returns the new offset,
+    or None if the offset is stale (another request got there first). Raises ValueError when
+    the chunk is larger than IMAGE_UPLOAD_CHUNK_SIZE or runs past the declared size.
+    The body is spooled to a file of its own first; it is copied into the assembled file only
+    while this request's conditional UPDATE holds the row, so of two PUTs at the same offset
+    just the winner ever writes there."""
+    if offset != upload.received_bytes:
+        return None
+    limit = min(Config.IMAGE_UPLOAD_CHUNK_SIZE, upload.size_bytes - offset)
+    chunk_path = os.path.join(_uploads_dir(), f"resumable-{upload.id}-{uuid.uuid4().hex}.chunk")
+    try:
+        written = 0
+        with open(chunk_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(READ_CHUNK), b''):
+                written += len(chunk)
+                if written > limit:
+                    raise ValueError('chunk too large')
+                f.write(chunk)
+        claimed = ImageUpload.query.filter(ImageUpload.id == upload.id, ImageUpload.received_bytes == offset)\
+                                   .update({ImageUpload.received_bytes: offset + written,
+                                            ImageUpload.updated_at: datetime.utcnow()}, synchronize_session=False)
+        if not claimed:
+            db.session.rollback()
+            return None
+        with open(chunk_path, 'rb') as src, open(part_path(upload), 'r+b') as dst:
+            # Anything past the offset is from a request that died before it committed
+            dst.seek(offset)
+            shutil.copyfileobj(src, dst, READ_CHUNK)
+            dst.truncate()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        discard(chunk_path)
+    db.session.refresh(upload)
+    return upload.received_bytes
+
+def expire_uploads():
+    """Drop uploads that received no chunk for IMAGE_UPLOAD_TTL, along with their partial files."""
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.IMAGE_UPLOAD_TTL)
+    stale = ImageUpload.query.filter(ImageUpload.updated_at < cutoff).limit(100).all()
+    for upload in stale:
+        discard(part_path(upload))
+        db.session.delete(upload)
+    if stale:
+        db.session.commit()
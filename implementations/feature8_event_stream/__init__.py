@@ -0,0 +1 @@
+# Feature 8: Multiplexed event stream (one SSE connection carrying several topics)
@@ -0,0 +1,179 @@
+from flask import Blueprint, request, jsonify, stream_with_context
+import json, time
+from queue import Empty
+from implementations.extensions import db
+from implementations.sse import sse_response, sse_event
+from implementations.connection_governor import governed, current_lease, closing_event
+from implementations.feature2_order_tracking.services.order_service import order_service
+from implementations.feature3_driver_location.services.location_service import location_service
+from implementations.feature6_announcements.services.announcement_snapshot import announcement_snapshot
+from implementations.feature6_announcements.services.announcement_hub import announcement_hub
+from implementations.feature6_announcements.services.stream_args import REPLAY_LIMIT, last_event_id, audience_args
+
+events_bp = Blueprint('event_stream', __name__, url_prefix='/api/v1/events')
+
+MAX_TOPICS = 20
+ORDER_POLL_INTERVAL = 2     # seconds between order status checks
+LOCATION_POLL_INTERVAL = 1  # seconds between driver location checks
+PING_INTERVAL = 15          # keep-alive comment every 15s
+RETRY_MS = 3000             # client reconnection hint
+
+
+def _parse_topics(raw: str):
+    """Split ?topics=order:12,location:12,announcements into order ids, location order ids and a flag."""
+    orders, locations, announcements, invalid = [], [], False, []
+    for topic in [t.strip() for t in raw.split(',') if t.strip()]:
+        kind, _, ident = topic.partition(':')
+        if kind == 'announcements' and not ident:
+            announcements = True
+        elif kind in ('order', 'location') and ident.isdigit():
+            (orders if kind == 'order' else locations).append(int(ident))
+        else:
+            invalid.append(topic)
+    return sorted(set(orders)), sorted(set(locations)), announcements, invalid
+
+
+class _AnnouncementFeed:
+    """New announcements for one connection, from the worker's announcement hub (the same
+    single delivery path as /api/v1/announcements/stream), skipping ids already sent."""
+    def __init__(self, last_id: int = 0, audience: str = None, restaurant_id: int = None):
+        self.queue = announcement_hub.register_client(audience, restaurant_id)
+        self.last_id = last_id
+        self.audience = audience
+        self.restaurant_id = restaurant_id
+        self.sent = set()
+        self.closed = False  # the hub dropped this feed for falling behind
+
+    def replay(self, resume: bool):
+        """Snapshot announcements to send on connect: released after Last-Event-ID, or the most recent few."""
+        items = announcement_snapshot.since(self.last_id, self.audience, self.restaurant_id)
+        if not resume:
+            items = items[-REPLAY_LIMIT:]
+        self.sent.update(i for i, _ in items)
+        return [(i, json.loads(e)) for i, e in items]
+
+    def next(self, timeout: float):
+        """Next unseen (id, announcement, expired), or None once the timeout elapses."""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                announcement_id, encoded, kind = self.queue.get(timeout=max(0.0, deadline - time.time()))
+            except Empty:
+                return None
+            if kind == 'closed':
+                self.closed = True
+                return None
+            if kind == 'expired':
+                self.sent.discard(announcement_id)
+                return announcement_id, json.loads(encoded), True
+            if announcement_id not in self.sent:
+                self.sent.add(announcement_id)
+                return announcement_id, json.loads(encoded), False
+
+    def close(self):
+        announcement_hub.unregister_client(self.queue)
+
+
+def _topic_event(kind: str, topic: str, data: dict, event_id: str = None) -> str:
+    """Named SSE event; clients demultiplex on the event name and `topic`."""
+    return sse_event({'topic': topic, 'data': data}, event=kind, event_id=event_id)
+
+
+@events_bp.route('', methods=['GET'])
+@governed('events')
+def stream_events():
+    """One SSE connection carrying several topics.
+    ?topics=order:<id>,location:<order_id>,announcements
+    Emits named events `order`, `location` and `announcement` with {"topic", "data"} payloads;
+    ?audience=&restaurant_id= target announcements as on /api/v1/announcements/stream and
+    retired ones arrive as {"id", "expired": true}."""
+    orders, locations, announcements, invalid = _parse_topics(request.args.get('topics', ''))
+    if invalid:
+        return jsonify({'success': False, 'error': 'invalid_topics', 'topics': invalid}), 400
+    if not (orders or locations or announcements):
+        return jsonify({'success': False, 'error': 'topics_required'}), 400
+    if len(orders) + len(locations) + int(announcements) > MAX_TOPICS:
+        return jsonify({'success': False, 'error': 'too_many_topics', 'max': MAX_TOPICS}), 400
+
+    lease = current_lease()
+    # Only announcements carry ids ("announcement:<id>"), so Last-Event-ID resumes that topic
+    resume_from = last_event_id()
+    audience, restaurant_id = audience_args()
+
+    def poll_orders(last_status):
+        chunk = []
+        for order_id in orders:
+            order = order_service.get_order(order_id)
+            if order and order.status != last_status.get(order_id):
+                last_status[order_id] = order.status
+                chunk.append(_topic_event('order', f'order:{order_id}', order.to_dict()))
+        return chunk
+
+    def poll_locations(last_location):
+        chunk = []
+        for order_id in locations:
+            current = location_service.get_driver_current_location(order_id)
+            if current and current != last_location.get(order_id):
+                last_location[order_id] = current
+                chunk.append(_topic_event('location', f'location:{order_id}', current))
+        return chunk
+
+    def event_stream():
+        feed = _AnnouncementFeed(resume_from, audience, restaurant_id) if announcements else None
+        last_status, last_location = {}, {}
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            # Current state of every topic in one write
+            chunk = poll_orders(last_status) + poll_locations(last_location)
+            db.session.rollback()  # no connection held between polls
+            if feed is not None:
+                try:
+                    chunk += [_topic_event('announcement', 'announcements', a, f'announcement:{i}')
+                              for i, a in feed.replay(bool(resume_from))]
+                except Exception:
+                    pass
+            if chunk:
+                yield ''.join(chunk)
+
+            last_order_poll = last_location_poll = last_ping = time.time()
+            while True:
+                chunk = []
+                # The announcement feed doubles as the loop's 1s tick
+                if feed is not None:
+                    item = feed.next(1.0)
+                    while item is not None:
+                        announcement_id, data, expired = item
+                        # Expiry notices carry no id so they never become the resume point
+                        chunk.append(_topic_event('announcement', 'announcements', data,
+                                                  None if expired else f'announcement:{announcement_id}'))
+                        item = feed.next(0)
+                else:
+                    time.sleep(1)
+                now = time.time()
+                if orders and now - last_order_poll >= ORDER_POLL_INTERVAL:
+                    last_order_poll = now
+                    chunk += poll_orders(last_status)
+                if locations and now - last_location_poll >= LOCATION_POLL_INTERVAL:
+                    last_location_poll = now
+                    chunk += poll_locations(last_location)
+                db.session.rollback()
+                if chunk:
+                    # All topics that changed during this tick share one write
+                    lease.touch()
+                    last_ping = now
+                    yield ''.join(chunk)
+                if lease.should_close():
+                    yield closing_event(lease.close_reason)
+                    return
+                if feed is not None and feed.closed:
+                    # Reconnect with Last-Event-ID to replay what the hub could not queue
+                    yield closing_event('lagging')
+                    return
+                if now - last_ping >= PING_INTERVAL:
+                    last_ping = now
+                    yield ': ping\n\n'
+        finally:
+            if feed is not None:
+                feed.close()
+
+    return sse_response(stream_with_context(event_stream()))
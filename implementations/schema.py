@@ -0,0 +1,48 @@
+from sqlalchemy.exc import OperationalError
+from implementations.extensions import db
+
+# Lightweight migrations, shared by the web app (app.py) and the standalone image_worker.py
+
+
+def add_missing_columns(inspector, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, ddl) not yet present.
+    Returns the names that were added."""
+    if table not in inspector.get_table_names():
+        return []
+    existing = [c['name'] for c in inspector.get_columns(table)]
+    added = []
+    for name, ddl in columns:
+        if name in existing:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl};"))
+            added.append(name)
+            print(f"[Schema] Added '{name}' column to {table} table")
+        except OperationalError as e:
+            print(f'[Schema] Migration failed ({table}.{name}):', e)
+    return added
+
+
+def migrate_image_jobs(inspector):
+    """Feature 7 columns on image_jobs; image_worker.py runs this too, since it may start first."""
+    # image_jobs doubles as the persistent work queue
+    if add_missing_columns(inspector, 'image_jobs', [('started_at', 'TIMESTAMP'), ('finished_at', 'TIMESTAMP')]):
+        with db.engine.begin() as conn:
+            conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_image_jobs_status ON image_jobs (status);"))
+    # Stored object keys and image metadata live on the job row
+    if add_missing_columns(inspector, 'image_jobs', [
+            ('original_key', 'VARCHAR(255)'),
+            ('processed_key', 'VARCHAR(255)'),
+            ('derivatives', 'TEXT'),
+            ('content_type', 'VARCHAR(64)'),
+            ('content_hash', 'VARCHAR(64)'),
+            ('size_bytes', 'INTEGER'),
+            ('width', 'INTEGER'),
+            ('height', 'INTEGER')]):
+        with db.engine.begin() as conn:
+            conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_image_jobs_content_hash ON image_jobs (content_hash);"))
+    # Queue timings are read from the most recently finished jobs
+    if 'image_jobs' in inspector.get_table_names():
+        with db.engine.begin() as conn:
+            conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_image_jobs_finished_at ON image_jobs (finished_at);"))
@@ -0,0 +1,66 @@
+import logging
+import signal
+import threading
+from typing import Callable, List
+from config.settings import Config
+from implementations.connection_governor import governor
+
+# Graceful drain of long-lived connections when a worker is recycled
+
+logger = logging.getLogger(__name__)
+
+_callbacks: List[Callable[[], None]] = []
+_drain_hooks: List[Callable[[], None]] = []
+_drain_started = threading.Event()
+
+
+def register_shutdown_callback(callback: Callable[[], None]):
+    """Run `callback` once streams are drained (flush buffers, close pub/sub, ...)."""
+    _callbacks.append(callback)
+
+
+def register_drain_hook(hook: Callable[[], None]):
+    """Run `hook` as soon as new streams are refused, for connections no generator closes
+    (Socket.IO sockets): it must end them so their leases are released."""
+    _drain_hooks.append(hook)
+
+
+def drain_and_shutdown(timeout: float = None):
+    """Refuse new streams, let open ones send their final reconnect event, then run callbacks."""
+    if _drain_started.is_set():
+        return
+    _drain_started.set()
+    if timeout is None:
+        timeout = Config.STREAM_DRAIN_TIMEOUT
+    logger.info(f"Draining {governor.total} open streams")
+    governor.drain()
+    for hook in _drain_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Drain hook failed: {e}")
+    if not governor.wait_drained(timeout):
+        logger.warning(f"{governor.total} streams still open after {timeout}s drain")
+    for callback in _callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Shutdown callback failed: {e}")
+
+
+def install_signal_handlers():
+    """Drain on SIGTERM. Under gunicorn its own handler still runs and waits for the
+    in-flight responses; standalone servers exit once the drain is done."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_sigterm(signum, frame):
+        if callable(previous):
+            threading.Thread(target=drain_and_shutdown, daemon=True).start()
+            previous(signum, frame)
+        else:
+            drain_and_shutdown()
+            raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
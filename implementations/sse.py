@@ -0,0 +1,94 @@
+import json
+import time
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional
+from flask import Response, request
+from config.settings import Config
+
+# Shared Server-Sent Events helpers used by all streaming features
+
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream; charset=utf-8',
+    'Cache-Control': 'no-cache, no-transform',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'
+}
+
+
+def sse_event(data, event: Optional[str] = None, event_id=None) -> str:
+    """Format one SSE block. Non-string data is JSON encoded."""
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+def wants_batch() -> bool:
+    """Client opted in to JSON array events with ?batch=1."""
+    return request.args.get('batch', '').lower() in ('1', 'true', 'yes')
+
+
+def collect_batch(first, fetch: Callable[[float], Optional[object]],
+                  window: Optional[float] = None, max_items: Optional[int] = None) -> List:
+    """Gather `first` plus whatever `fetch(timeout)` returns within the batch window.
+    `fetch` must return None when nothing arrived before the timeout."""
+    if window is None:
+        window = Config.SSE_BATCH_WINDOW_MS / 1000.0
+    if max_items is None:
+        max_items = Config.SSE_BATCH_MAX
+    items = [first]
+    deadline = time.time() + window
+    while len(items) < max_items:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        nxt = fetch(remaining)
+        if nxt is None:
+            break
+        items.append(nxt)
+    return items
+
+
+def format_batch(items: List[str], as_array: bool) -> str:
+    """Render already JSON-encoded payloads as one write.
+    Array mode sends a single `data: [...]` event, otherwise one event per item."""
+    if as_array:
+        return f"data: [{','.join(items)}]\n\n"
+    return ''.join(f'data: {item}\n\n' for item in items)
+
+
+def _accepts_gzip() -> bool:
+    return Config.SSE_GZIP and 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def gzip_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Compress an SSE stream incrementally; every chunk is sync-flushed so events are not held back."""
+    compressor = zlib.compressobj(Config.SSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            out = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if out:
+                yield out
+        yield compressor.flush(zlib.Z_FINISH)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def sse_response(stream: Iterable[str], headers: Optional[dict] = None) -> Response:
+    """Build a streaming SSE response, gzip-encoded when the client advertises support."""
+    merged = dict(SSE_HEADERS)
+    if headers:
+        merged.update(headers)
+    merged['Vary'] = 'Accept-Encoding'
+    if _accepts_gzip():
+        merged['Content-Encoding'] = 'gzip'
+        return Response(gzip_stream(stream), headers=merged)
+    return Response(stream, headers=merged)
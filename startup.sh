@@ -1,6 +1,28 @@
 #!/bin/bash
 export PORT=${PORT:-8000}
+export REST_PORT=${REST_PORT:-8001}
 
-# Run Gunicorn with Gevent WebSocket Worker
-exec gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker \
-    -w 1 -b 0.0.0.0:$PORT app:app
+pids=()
+stop() { kill -TERM "${pids[@]}" 2>/dev/null; }
+trap stop TERM INT
+
+# Image processing runs in its own processes (see image_worker.py)
+python image_worker.py &
+pids+=($!)
+
+# Regular REST API: threaded sync workers on several cores (bcrypt, JSON encoding, uploads);
+# reached through the gateway, so one proxy hop more than the public port
+IMAGE_WORKERS=0 TRUSTED_PROXY_HOPS=$(( ${TRUSTED_PROXY_HOPS:-1} + 1 )) gunicorn app:app --workers ${REST_WORKERS:-3} --threads ${REST_THREADS:-4} \
+    --timeout 60 -b 127.0.0.1:$REST_PORT &
+pids+=($!)
+
+# Public port: the gevent gateway holds SSE streams, long polls and Socket.IO,
+# and forwards every other request to the REST pool above
+GATEWAY_UPSTREAM=http://127.0.0.1:$REST_PORT gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker \
+    -w 1 --worker-connections ${GATEWAY_MAX_CONNECTIONS:-20000} --timeout 60 -b 0.0.0.0:$PORT gateway:application &
+pids+=($!)
+
+# If any of them exits, stop the others so the container restarts as a whole
+wait -n
+stop
+wait
@@ -9,7 +9,7 @@ const ANNOUNCEMENT_API = {
 };
 
 // Global variables for announcements
-let announcementSSE = null;
+let announcementUnsubscribe = null;
 
 // Employee Announcement Functions
 function initEmployeeAnnouncements() {
@@ -343,7 +343,7 @@ async function loadExistingAnnouncements() {
   console.log('Loading existing announcements from database');
   
   try {
-    const result = await apiFetch(ANNOUNCEMENT_API.list);
+    const result = await apiFetch(`${ANNOUNCEMENT_API.list}?audience=customers`);
     console.log('Announcements response:', result);
     
     if (result.success && result.data) {
@@ -388,6 +388,7 @@ function addAnnouncementToDisplay(announcement, isNew = false) {
   
   const announcementEl = document.createElement('div');
   announcementEl.className = 'announcement-item';
+  if (announcement.id) announcementEl.dataset.announcementId = announcement.id;
   announcementEl.style.cssText = `
     background: white;
     border-radius: 8px;
@@ -489,62 +490,40 @@ function displayAnnouncementError() {
 }
 
 function setupAnnouncementSSE() {
-  console.log('Setting up SSE for real-time announcements');
+  console.log('Subscribing to announcements on the shared event stream');
   
   try {
-    announcementSSE = new EventSource(ANNOUNCEMENT_API.stream);
-    
-    announcementSSE.onopen = function(event) {
-      console.log('Announcement SSE connected');
-      const badge = document.getElementById('announcementBadge');
-      if (badge) {
-        badge.style.display = 'inline-block';
-        badge.textContent = '🟢 Live';
-      }
-    };
-    
-    announcementSSE.onmessage = function(event) {
-      console.log('New announcement received via SSE:', event.data);
-      
-      try {
-        const data = JSON.parse(event.data);
-        console.log('Parsed SSE data:', data);
-        
-        // Extract the nested announcement object
-        let announcement = data;
-        if (data.announcement) {
-          announcement = data.announcement;
-          console.log('Extracted nested announcement:', announcement);
-        }
-        
-        // Add to display as new announcement
-        addAnnouncementToDisplay(announcement, true);
-        
-      } catch (error) {
-        console.error('Error parsing announcement SSE data:', error);
+    const seen = new Set();
+    // Announcements ride on the customer's single multiplexed SSE connection (see eventHub in app.js)
+    announcementUnsubscribe = eventHub.subscribe('announcements', (announcement) => {
+      console.log('New announcement received via SSE:', announcement);
+      if (announcement.expired) {
+        // Reached its expires_at: take it off the board
+        seen.delete(announcement.id);
+        document.querySelectorAll(`[data-announcement-id="${announcement.id}"]`).forEach(el => el.remove());
+        return;
       }
-    };
-    
-    announcementSSE.onerror = function(event) {
-      console.error('Announcement SSE error:', event);
-      const badge = document.getElementById('announcementBadge');
-      if (badge) {
-        badge.style.display = 'inline-block';
-        badge.textContent = '🔴 Offline';
-        badge.style.background = '#dc2626';
-      }
-    };
+      // Recent announcements are replayed whenever the shared stream reconnects
+      if (announcement.id && seen.has(announcement.id)) return;
+      if (announcement.id) seen.add(announcement.id);
+      addAnnouncementToDisplay(announcement, true);
+    });
     
+    const badge = document.getElementById('announcementBadge');
+    if (badge) {
+      badge.style.display = 'inline-block';
+      badge.textContent = '🟢 Live';
+    }
   } catch (error) {
     console.error('Failed to setup announcement SSE:', error);
   }
 }
 
 function closeAnnouncementSSE() {
-  if (announcementSSE) {
-    announcementSSE.close();
-    announcementSSE = null;
-    console.log('Announcement SSE connection closed');
+  if (announcementUnsubscribe) {
+    announcementUnsubscribe();
+    announcementUnsubscribe = null;
+    console.log('Announcement subscription closed');
   }
 }
 
@@ -29,7 +29,8 @@ const API = {
   ordersOf: (cid)=>`/api/v1/orders/customer/${cid}`,
   track: (oid,last)=>`/api/v1/orders/${oid}/track${last?`?last_status=${encodeURIComponent(last)}&timeout=45`:''}`,
   sseLocation: (oid,cid)=>`/api/v1/tracking/order/${oid}/stream?customer_id=${cid}`,
-  ordersSSE: '/api/v1/orders/stream',
+  ordersSSE: '/api/v1/orders/stream?batch=1',
+  events: (topics,cid)=>`/api/v1/events?topics=${encodeURIComponent(topics.join(','))}&audience=customers${cid?`&customer_id=${cid}`:''}`,
   driverOnline: (id)=>`/api/v1/drivers/${id}/online`,
   driverLoc: (id)=>`/api/v1/drivers/${id}/location`
 }
@@ -253,7 +254,7 @@ async function apiFetch(url, options = {}) {
 }
 
 // Global variables for SSE and chat
-let sse = null;
+let locationUnsubscribe = null;
 let sseOrders = null;
 let ioScriptLoaded = false, socket = null, currentChatId = null;
 
@@ -274,7 +275,11 @@ async function initCustomerChat(){
     currentChatId = payload.chat_id;
     console.log('Current chat ID set to:', currentChatId);
     const box = document.getElementById('chatMessages'); box.innerHTML='';
-    (payload.history||[]).forEach(m=>appendMsg(box, m, name));
+    prependHistory(box, payload, (c, m)=>appendMsg(c, m, name));
+    box.scrollTop = box.scrollHeight;
+  });
+  socket.on('chat_history', (page)=>{
+    if(page.chat_id===currentChatId) prependHistory(document.getElementById('chatMessages'), page, (c, m)=>appendMsg(c, m, name));
   });
   socket.on('message', (m)=>{ 
     const box = document.getElementById('chatMessages'); 
@@ -306,10 +311,34 @@ async function initCustomerChat(){
   const input = document.getElementById('chatInput');
   let typing=false, to=null;
   input.addEventListener('input', ()=>{
-    if(!typing){ typing=true; socket.emit('typing',{chat_id:currentChatId,user:name,is_typing:true}); }
+    // Every keystroke is reported; the server debounces what it broadcasts to the room
+    typing=true; socket.emit('typing',{chat_id:currentChatId,user:name,is_typing:true});
     clearTimeout(to); to=setTimeout(()=>{ typing=false; socket.emit('typing',{chat_id:currentChatId,user:name,is_typing:false}); }, 800);
   });
-  socket.on('typing_status', (d)=>{ document.getElementById('typing').textContent = d.users.length? `${d.users.join(', ')} typing...`:''; });
+  let typingExpiry=null;
+  socket.on('typing_status', (d)=>{
+    const el = document.getElementById('typing');
+    el.textContent = d.users.length? `${d.users.join(', ')} typing...`:'';
+    // Typing flags expire server-side too; hide the indicator if no refresh arrives in time
+    clearTimeout(typingExpiry);
+    if(d.users.length && d.expires_in) typingExpiry = setTimeout(()=>{ el.textContent=''; }, d.expires_in*1000);
+  });
+}
+
+// History arrives a page at a time; older pages are requested with 'load_history' {before: <message_id>}
+function prependHistory(box, page, render){
+  box.querySelector('.load-earlier')?.remove();
+  const tmp = document.createElement('div');
+  (page.history||[]).forEach(m=>render(tmp, m));
+  box.prepend(...tmp.childNodes);
+  if(page.has_more){
+    const more = document.createElement('div');
+    more.className = 'load-earlier';
+    more.style.cssText = 'text-align:center; cursor:pointer; color:#3b82f6; font-size:0.8rem; margin:0.25rem 0;';
+    more.textContent = 'Load earlier messages';
+    more.onclick = ()=>{ socket.emit('load_history', {chat_id: page.chat_id, before: page.next_before}); };
+    box.prepend(more);
+  }
 }
 
 function appendMsg(container, m, my, showNotification = false){
@@ -325,7 +354,67 @@ function appendMsg(container, m, my, showNotification = false){
   }
 }
 
-// Driver location SSE
+// Jittered reconnect delay for streams the server turned away
+function streamRetryDelayMs(){ return 5000 + Math.floor(Math.random()*5000); }
+
+// One multiplexed SSE connection for every customer topic (order:<id>, location:<order_id>, announcements).
+// The server sends named events (order / location / announcement) which are demultiplexed here by topic.
+const eventHub = {
+  source: null,
+  listeners: {},  // topic -> Set of callbacks
+  reconnectTimer: null,
+  subscribe(topic, fn){
+    const isNew = !this.listeners[topic];
+    (this.listeners[topic] = this.listeners[topic] || new Set()).add(fn);
+    if (isNew) this.reconnect();
+    return ()=>this.unsubscribe(topic, fn);
+  },
+  unsubscribe(topic, fn){
+    const set = this.listeners[topic];
+    if (!set) return;
+    set.delete(fn);
+    if (!set.size){ delete this.listeners[topic]; this.reconnect(); }
+  },
+  reconnect(){
+    // Topic set changed: debounce so several subscribe() calls share one connection
+    clearTimeout(this.reconnectTimer);
+    this.reconnectTimer = setTimeout(()=>this.connect(), 50);
+  },
+  connect(){
+    if (this.source){ this.source.close(); this.source = null; }
+    const topics = Object.keys(this.listeners);
+    if (!topics.length) return;
+    const src = new EventSource(API.events(topics, auth.user?.id));
+    ['order', 'location', 'announcement'].forEach(kind => src.addEventListener(kind, (e)=>{
+      try{
+        const msg = JSON.parse(e.data);
+        (this.listeners[msg.topic] || []).forEach(fn => fn(msg.data));
+      }catch(err){
+        console.error('Error parsing event stream data:', err, 'Raw data:', e.data);
+      }
+    }));
+    // Server is closing the stream (worker draining on deploy, idle eviction):
+    // come back after its randomized delay instead of all at once
+    src.addEventListener('reconnect', (e)=>{
+      let delay = streamRetryDelayMs();
+      try{ delay = JSON.parse(e.data).retry_ms || delay; }catch(err){}
+      src.close();
+      if (this.source === src){
+        clearTimeout(this.reconnectTimer);
+        this.reconnectTimer = setTimeout(()=>this.connect(), delay);
+      }
+    });
+    src.onerror = ()=>{
+      // Rejected while the server is at capacity (503): EventSource gives up, retry later
+      if (src.readyState === EventSource.CLOSED && this.source === src){
+        this.reconnectTimer = setTimeout(()=>this.connect(), streamRetryDelayMs());
+      }
+    };
+    this.source = src;
+  }
+};
+
+// Driver location (topic location:<order_id> on the shared event stream)
 function startLocationStream(){
   const orderId = parseInt(document.getElementById('trackOrderId').value||'0');
   const driverId = parseInt(document.getElementById('driverId').value||'1');
@@ -336,46 +425,25 @@ function startLocationStream(){
     return;
   }
   
-  // Use mock customer ID if user not logged in
-  const customerId = auth.user?.id || 1;
-  console.log('Using customer ID:', customerId);
-  
   stopLocationStream();
-  const url = API.sseLocation(orderId, customerId);
-  console.log('SSE URL:', url);
-  sse = new EventSource(url);
   const log = document.getElementById('locLog');
-  sse.onmessage = (e)=>{
-    console.log('SSE message received:', e.data);
-    try{ 
-      const d = JSON.parse(e.data); 
-      console.log('SSE parsed data:', d);
-      if (d.latitude && d.longitude) {
-        updateMarker(d.latitude, d.longitude); 
-        log.textContent = `[${new Date().toLocaleTimeString()}] Driver moved to: ${d.latitude.toFixed(6)}, ${d.longitude.toFixed(6)}\n`+log.textContent;
-      } else {
-        log.textContent = `[${new Date().toLocaleTimeString()}] ${e.data}\n`+log.textContent;
-      }
-    }catch(err){
-      console.error('Error parsing SSE data:', err, 'Raw data:', e.data);
-      log.textContent = `[${new Date().toLocaleTimeString()}] Error: ${e.data}\n`+log.textContent;
+  locationUnsubscribe = eventHub.subscribe(`location:${orderId}`, (d)=>{
+    console.log('Location event received:', d);
+    if (d.latitude && d.longitude) {
+      updateMarker(d.latitude, d.longitude); 
+      log.textContent = `[${new Date().toLocaleTimeString()}] Driver moved to: ${d.latitude.toFixed(6)}, ${d.longitude.toFixed(6)}\n`+log.textContent;
+    } else {
+      log.textContent = `[${new Date().toLocaleTimeString()}] ${JSON.stringify(d)}\n`+log.textContent;
     }
-  };
-  sse.onopen = ()=>{ 
-    console.log('SSE connected');
-    log.textContent = 'SSE connected\n'+log.textContent; 
-  };
-  sse.onerror = (e)=>{ 
-    console.error('SSE error:', e);
-    log.textContent = 'SSE error\n'+log.textContent; 
-  };
+  });
+  log.textContent = 'Location stream subscribed\n'+log.textContent; 
   startDriverSimulation(driverId, orderId);
 }
 
 function stopLocationStream(){ 
-  if(sse){ 
-    sse.close(); 
-    sse=null; 
+  if(locationUnsubscribe){ 
+    locationUnsubscribe(); 
+    locationUnsubscribe=null; 
   } 
   stopDriverSimulation(); 
 }
@@ -650,12 +718,12 @@ async function listOrders() {
                 ${o.status.toUpperCase()}
               </span>
               <div id="polling_status_${o.id}" style="margin-top: 0.25rem; color: #6b7280; font-size: 0.75rem;">
-                ${!isCompleted ? '🔄 Long polling active...' : '✅ Order completed'}
+                ${!isCompleted ? '🔄 Live updates active...' : '✅ Order completed'}
               </div>
             </div>
             <div style="display: flex; gap: 0.5rem; align-items: center;">
               ${!isCompleted ? `
-                <span style="color: #3b82f6; font-weight: 500; font-size: 0.875rem;">📡 Polling</span>
+                <span style="color: #3b82f6; font-weight: 500; font-size: 0.875rem;">📡 Live</span>
               ` : `
                 <span style="color: #059669; font-weight: 500; font-size: 0.875rem;">✅ ${o.status === 'delivered' ? 'Completed' : 'Cancelled'}</span>
               `}
@@ -674,48 +742,29 @@ async function listOrders() {
   }
 }
 
-async function trackStatus(orderId) {
-  let lastStatus = null;
-  let polling = true;
-  
+function trackStatus(orderId) {
   const updatePollingStatus = (message) => {
     const statusEl = document.getElementById(`polling_status_${orderId}`);
     if (statusEl) statusEl.textContent = message;
   };
   
-  while (polling) {
-    try {
-      const url = API.track(orderId, lastStatus);
-      const res = await fetch(url);
-      const data = await res.json();
-      
-      if (data.success && data.data) {
-        const order = data.data;
-        lastStatus = order.status;
-        
-        const statusEl = document.getElementById(`st_${orderId}`);
-        if (statusEl) {
-          statusEl.textContent = order.status.toUpperCase();
-          const isCompleted = order.status === 'delivered' || order.status === 'cancelled';
-          statusEl.style.background = isCompleted ? '#059669' : '#f59e0b';
-        }
-        
-        if (order.status === 'delivered' || order.status === 'cancelled') {
-          polling = false;
-          updatePollingStatus('✅ Order completed');
-          showToast(`Order #${orderId} is ${order.status}!`, 'success');
-        } else {
-          updatePollingStatus(`🔄 Status: ${order.status}`);
-        }
-      }
-    } catch (e) {
-      console.error(`Polling error for order ${orderId}:`, e);
-      updatePollingStatus('❌ Polling error');
-      break;
+  // Status changes arrive on the shared event stream (topic order:<id>)
+  const unsubscribe = eventHub.subscribe(`order:${orderId}`, (order)=>{
+    const statusEl = document.getElementById(`st_${orderId}`);
+    if (statusEl) {
+      statusEl.textContent = order.status.toUpperCase();
+      const isCompleted = order.status === 'delivered' || order.status === 'cancelled';
+      statusEl.style.background = isCompleted ? '#059669' : '#f59e0b';
     }
     
-    await new Promise(resolve => setTimeout(resolve, 2000));
-  }
+    if (order.status === 'delivered' || order.status === 'cancelled') {
+      unsubscribe();
+      updatePollingStatus('✅ Order completed');
+      showToast(`Order #${orderId} is ${order.status}!`, 'success');
+    } else {
+      updatePollingStatus(`🔄 Status: ${order.status}`);
+    }
+  });
 }
 
 // Employee functions
@@ -899,81 +948,118 @@ async function initEmployee(){
   console.log('initEmployee called');
   await loadExistingOrders();
   
-  console.log('Starting SSE connection to:', API.ordersSSE);
-  const sse = new EventSource(API.ordersSSE);
-  
-  sse.onopen = function(event) {
-    console.log('SSE connection opened successfully');
-  };
-  
-  sse.onmessage = (e)=>{ 
-    console.log('SSE message received:', e.data);
-    try{ 
-      const data=JSON.parse(e.data);
-      console.log('SSE parsed data:', data);
-      console.log('Data keys:', Object.keys(data));
+  function connectOrdersStream(){
+    console.log('Starting SSE connection to:', API.ordersSSE);
+    const sse = new EventSource(API.ordersSSE);
+  
+    sse.onopen = function(event) {
+      console.log('SSE connection opened successfully');
+    };
+  
+    sse.onmessage = (e)=>{ 
+      console.log('SSE message received:', e.data);
+      try{ 
+        // Batched stream: one event may carry an array of orders
+        const parsed=JSON.parse(e.data);
+        (Array.isArray(parsed) ? parsed : [parsed]).forEach(handleNewOrderEvent);
+      }catch(err){ 
+        console.error('Error processing new order SSE:', err);
+      } 
+    };
+  
+    function handleNewOrderEvent(data){
+      try{ 
+        console.log('SSE parsed data:', data);
+        console.log('Data keys:', Object.keys(data));
       
-      // CRITICAL: Normalize the data structure for consistency
-      // The backend sends 'order_id' but our frontend expects 'id'
-      let orderData = { ...data };
+        // CRITICAL: Normalize the data structure for consistency
+        // The backend sends 'order_id' but our frontend expects 'id'
+        let orderData = { ...data };
       
-      // Ensure we have an 'id' field for consistency with existing code
-      if (data.order_id && !data.id) {
-        orderData.id = data.order_id;
-        console.log('Converted order_id to id:', orderData.id);
-      }
+        // Ensure we have an 'id' field for consistency with existing code
+        if (data.order_id && !data.id) {
+          orderData.id = data.order_id;
+          console.log('Converted order_id to id:', orderData.id);
+        }
       
-      console.log('Normalized order data:', orderData);
-      console.log('Order ID field check:', {
-        'orderData.id': orderData.id,
-        'orderData.order_id': orderData.order_id
-      });
+        console.log('Normalized order data:', orderData);
+        console.log('Order ID field check:', {
+          'orderData.id': orderData.id,
+          'orderData.order_id': orderData.order_id
+        });
       
-      // Ensure we have a valid order ID
-      const orderNumber = orderData.id || orderData.order_id;
-      console.log('Final order number:', orderNumber);
+        // Ensure we have a valid order ID
+        const orderNumber = orderData.id || orderData.order_id;
+        console.log('Final order number:', orderNumber);
       
-      if (!orderNumber) {
-        console.error('No valid order ID found in SSE data:', data);
-        return;
-      }
+        if (!orderNumber) {
+          console.error('No valid order ID found in SSE data:', data);
+          return;
+        }
       
-      addOrderToEmployeeList(orderData);
+        addOrderToEmployeeList(orderData);
       
-      // Enhanced notification for employees
-      const restaurantName = orderData.restaurant_name || 'Restaurant';
-      const totalAmount = orderData.total_amount || '0';
+        // Enhanced notification for employees
+        const restaurantName = orderData.restaurant_name || 'Restaurant';
+        const totalAmount = orderData.total_amount || '0';
       
-      // Show regular toast
-      showToast(`🆕 New order #${orderNumber} received from ${restaurantName}`, 'info');
+        // Show regular toast
+        showToast(`🆕 New order #${orderNumber} received from ${restaurantName}`, 'info');
       
-      // Show prominent notification overlay
-      showNewOrderEmployeeNotification(orderNumber, restaurantName, totalAmount, orderData);
+        // Show prominent notification overlay
+        showNewOrderEmployeeNotification(orderNumber, restaurantName, totalAmount, orderData);
       
-    }catch(err){ 
-      console.error('Error processing new order SSE:', err);
-    } 
-  };
+      }catch(err){ 
+        console.error('Error processing new order SSE:', err);
+      } 
+    }
   
-  sse.onerror = function(event) {
-    console.error('SSE error:', event);
-    console.log('SSE readyState:', sse.readyState);
-  };
+    sse.onerror = function(event) {
+      console.error('SSE error:', event);
+      console.log('SSE readyState:', sse.readyState);
+      // Rejected while the server is at capacity (503): EventSource gives up, retry later
+      if (sse.readyState === EventSource.CLOSED) setTimeout(connectOrdersStream, streamRetryDelayMs());
+    };
+  }
+  connectOrdersStream();
 
   await ensureSocketIO();
   socket = io(getSocketIOUrl());
   socket.on('connect', ()=>{ socket.emit('agent_subscribe', {}); });
-  socket.on('chats_list', (p)=>{
+  // Keep this agent marked online (presence expires without a ping)
+  setInterval(()=>{ if(socket.connected) socket.emit('presence_ping'); }, 30000);
+  socket.on('agent_presence', (p)=>{ console.log('Agent presence:', p.agents); });
+  let agentChats = new Map();
+  const renderChatList = ()=>{
     const list = document.getElementById('chatList'); list.innerHTML='';
-    (p.chats||[]).forEach(c=>{
-      const d = document.createElement('div'); d.className='item'; d.textContent = `#${c.chat_id} - ${c.customer}`;
+    [...agentChats.values()].sort((a,b)=> (b.last_activity_ts||'').localeCompare(a.last_activity_ts||'')).forEach(c=>{
+      const d = document.createElement('div'); d.className='item'; d.textContent = `#${c.chat_id} - ${c.customer||'customer'}${c.unread ? ` (${c.unread} unread)` : ''}${c.last_text ? ` — ${c.last_text}` : ''}`;
       d.onclick = ()=>{ socket.emit('open_chat', {chat_id:c.chat_id}); };
       list.appendChild(d);
     });
+  };
+  socket.on('chats_list', (p)=>{
+    agentChats = new Map((p.chats||[]).map(c=>[c.chat_id, c]));
+    renderChatList();
+  });
+  // Incremental deltas instead of re-fetching the whole list
+  socket.on('chat_updated', (p)=>{
+    (p.chats||[]).forEach(delta=>{
+      const c = agentChats.get(delta.chat_id) || {chat_id: delta.chat_id, unread: 0};
+      const {unread_added, ...fields} = delta;
+      Object.assign(c, fields);
+      if(unread_added) c.unread = (c.unread||0) + unread_added;
+      agentChats.set(c.chat_id, c);
+    });
+    renderChatList();
   });
   socket.on('chat_opened', (p)=>{
     currentChatId = p.chat_id; const box = document.getElementById('agentMessages'); box.innerHTML='';
-    (p.history||[]).forEach(m=>appendAgent(box, m));
+    prependHistory(box, p, appendAgent);
+    box.scrollTop = box.scrollHeight;
+  });
+  socket.on('chat_history', (page)=>{
+    if(page.chat_id===currentChatId) prependHistory(document.getElementById('agentMessages'), page, appendAgent);
   });
   socket.on('message', (m)=>{ 
     if(m.chat_id===currentChatId){ 
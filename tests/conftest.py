@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time: point it at a throwaway database
+_tmp = tempfile.mkdtemp(prefix='foodplatform-tests-')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-with-enough-bytes-for-hs256')
+os.environ.setdefault('JWT_ACCESS_HOURS', '1')
+os.environ.setdefault('JWT_REFRESH_DAYS', '1')
+os.environ.setdefault('REDIS_HOST', '127.0.0.1')
+os.environ.setdefault('REDIS_PORT', '6399')
+os.environ.setdefault('REDIS_DB', '0')
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+os.environ.setdefault('IMAGE_WORKERS', '0')
+os.environ.setdefault('STREAM_MAX_PER_CLIENT', '1000')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ['IMAGE_LOCAL_ROOT'] = os.path.join(_tmp, 'images')
+os.environ['IMAGE_SPOOL_DIR'] = os.path.join(_tmp, 'spool')
+os.environ.pop('AZURE_STORAGE_CONNECTION_STRING', None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    flask_app.config['TESTING'] = True
+    return flask_app
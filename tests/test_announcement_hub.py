@@ -0,0 +1,43 @@
+import json
+import time
+
+from implementations.feature6_announcements.services.announcement_hub import AnnouncementHub, CLOSED
+
+
+class _Redis:
+    """Records publishes; the subscription never comes up, as while Redis reconnects."""
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+    def pubsub(self):
+        raise ConnectionError('unavailable')
+
+
+def test_publish_reaches_redis_before_the_subscription_is_up():
+    client = _Redis()
+    hub = AnnouncementHub(client, 'announcements-test')
+    try:
+        q = hub.register_client()
+        hub.publish({'id': 7, 'title': 'hello'})
+        deadline = time.time() + 3
+        while not client.published and time.time() < deadline:
+            time.sleep(0.05)
+        assert [e['announcement']['id'] for _, e in client.published] == [7]
+        assert q.get_nowait()[0] == 7  # delivered locally as well
+        hub._handle(client.published[0][1])  # the same event coming back through Redis
+        assert q.empty()
+    finally:
+        hub.stop()
+
+
+def test_full_client_queue_ends_the_stream():
+    hub = AnnouncementHub(None, 'announcements-test')
+    q = hub.register_client()
+    for i in range(1, q.maxsize + 2):
+        hub.publish({'id': i})
+    assert hub.client_count() == 0
+    items = [q.get_nowait() for _ in range(q.qsize())]
+    assert items[-1] == CLOSED
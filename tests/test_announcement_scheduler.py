@@ -0,0 +1,31 @@
+import time
+from datetime import datetime, timedelta
+
+from implementations.extensions import db
+from implementations.feature6_announcements.models.announcement import Announcement
+from implementations.feature6_announcements.services.announcement_scheduler import AnnouncementScheduler
+
+
+def test_rescan_releases_announcements_scheduled_by_another_process(app):
+    scheduler = AnnouncementScheduler(rescan=0.5)
+    scheduler.init_app(app)
+    try:
+        with app.app_context():
+            # Written straight to the table, as by a worker whose heap this process never sees
+            announcement = Announcement(title='Later', message='from elsewhere',
+                                        publish_at=datetime.utcnow() + timedelta(seconds=1))
+            db.session.add(announcement)
+            db.session.commit()
+            announcement_id = announcement.id
+            db.session.remove()
+
+        deadline = time.time() + 5
+        released = None
+        while released is None and time.time() < deadline:
+            time.sleep(0.2)
+            with app.app_context():
+                released = db.session.get(Announcement, announcement_id).released_at
+                db.session.remove()
+        assert released is not None
+    finally:
+        scheduler.stop()
@@ -0,0 +1,41 @@
+import time
+
+
+def _events(client, name, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        found = [e['args'][0] if isinstance(e['args'], list) else e['args']
+                 for e in client.get_received() if e['name'] == name]
+        if found:
+            return found
+        time.sleep(0.05)
+    return []
+
+
+def test_events_use_the_identity_bound_to_the_socket(app):
+    from app import socketio
+    client = socketio.test_client(app)
+    try:
+        client.emit('customer_handshake', {'user': 'alice-identity'})
+        chat_id = _events(client, 'customer_chat')[0]['chat_id']
+
+        # Claims to be someone else, with another role
+        client.emit('send_message', {'chat_id': chat_id, 'text': 'hi', 'user': 'mallory', 'role': 'agent'})
+        message = _events(client, 'message')[0]
+        assert message['sender'] == 'alice-identity'
+        assert message['role'] == 'customer'
+
+        client.emit('typing', {'chat_id': chat_id, 'is_typing': True, 'user': 'mallory'})
+        observer = socketio.test_client(app)
+        try:
+            observer.emit('agent_subscribe', {'user': 'agent-identity'})
+            observer.emit('open_chat', {'chat_id': chat_id})
+            client.get_received()
+            client.emit('typing', {'chat_id': chat_id, 'is_typing': False, 'user': 'mallory'})
+            client.emit('typing', {'chat_id': chat_id, 'is_typing': True, 'user': 'mallory'})
+            status = _events(observer, 'typing_status')[-1]
+            assert status['users'] == ['alice-identity']
+        finally:
+            observer.disconnect()
+    finally:
+        client.disconnect()
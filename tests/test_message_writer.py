@@ -0,0 +1,46 @@
+import threading
+import time
+from datetime import datetime
+
+from implementations.extensions import db
+from implementations.feature1_account_management.models.user import User
+from implementations.feature5_support_chat.models.chat import ChatSession
+from implementations.feature5_support_chat.services.message_writer import MessageWriteBehind
+
+
+def test_bad_row_does_not_fail_its_batch(app):
+    with app.app_context():
+        user = User(f'writer-{time.time()}@test.local', None, 'Chat', 'Test', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        chat = ChatSession(customer_user_id=user.id)
+        db.session.add(chat)
+        db.session.commit()
+        chat_id, user_id = chat.id, user.id
+        db.session.remove()
+
+    writer = MessageWriteBehind(batch_max=10, window=0.2, retries=1)
+    results, done = {}, threading.Event()
+
+    def row(text):
+        return {'chat_id': chat_id, 'sender_user_id': user_id, 'role': 'customer', 'text': text,
+                'created_at': datetime.utcnow()}
+
+    def track(name):
+        def on_durable(message_id):
+            results[name] = message_id
+            if len(results) == 3:
+                done.set()
+
+        def on_failed():
+            results[name] = None
+            if len(results) == 3:
+                done.set()
+        return on_durable, on_failed
+
+    writer.submit(app, row('first'), *track('first'))
+    writer.submit(app, {**row('bad'), 'text': None}, *track('bad'))  # violates NOT NULL
+    writer.submit(app, row('third'), *track('third'))
+    assert done.wait(10)
+    assert results['bad'] is None
+    assert results['first'] and results['third']
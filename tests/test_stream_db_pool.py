@@ -0,0 +1,91 @@
+import threading
+import time
+
+from implementations.extensions import db
+from implementations.feature1_account_management.models.user import User
+from implementations.feature2_order_tracking.services.order_service import order_service
+
+
+def _pool_capacity(app) -> int:
+    with app.app_context():
+        pool = db.engine.pool
+        return pool.size() + pool._max_overflow
+
+
+def _order(app) -> int:
+    with app.app_context():
+        user = User(f'stream-{time.time()}@test.local', None, 'Stream', 'Test', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return order_service.create_order(user.id, [], 'somewhere', 1.0, status='preparing').id
+
+
+def test_long_polls_do_not_hold_pool_connections(app):
+    """More waiting long polls than the pool has connections, and plain requests still get one."""
+    order_id = _order(app)
+    streams = _pool_capacity(app) + 3
+    results = []
+
+    def long_poll():
+        response = app.test_client().get(f'/api/v1/orders/{order_id}/track?last_status=preparing&timeout=12')
+        results.append(response.status_code)
+
+    threads = [threading.Thread(target=long_poll, daemon=True) for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    time.sleep(2)  # every long poll is now between polls
+
+    plain = {}
+    request = threading.Thread(target=lambda: plain.update(
+        response=app.test_client().get(f'/api/v1/orders/{order_id}')), daemon=True)
+    started = time.time()
+    request.start()
+    request.join(timeout=3)  # well before the long polls time out and free their connections
+    assert 'response' in plain, 'plain request starved of database connections'
+    assert plain['response'].status_code == 200
+    assert time.time() - started < 3
+
+    for thread in threads:
+        thread.join(timeout=20)
+    assert results == [200] * streams
+
+
+
+
+def test_event_streams_do_not_hold_pool_connections(app):
+    """More open /api/v1/events streams than the pool has connections, and REST requests still get one."""
+    order_id = _order(app)
+    streams = _pool_capacity(app) + 3
+    opened, done = [], threading.Event()
+
+    def stream():
+        response = app.test_client().get(f'/api/v1/events?topics=order:{order_id}', buffered=False)
+        try:
+            body = iter(response.response)
+            next(body)  # retry:
+            opened.append(b'event: order' in next(body))
+            while not done.is_set():
+                next(body)  # the stream keeps polling between writes
+        finally:
+            response.close()
+
+    threads = [threading.Thread(target=stream, daemon=True) for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    time.sleep(4)  # every stream is past its first write and polling in its loop
+    try:
+        assert opened == [True] * streams
+
+        plain = {}
+        request = threading.Thread(target=lambda: plain.update(
+            response=app.test_client().get(f'/api/v1/orders/{order_id}')), daemon=True)
+        request.start()
+        request.join(timeout=3)
+        assert 'response' in plain, 'plain request starved of database connections'
+        assert plain['response'].status_code == 200
+    finally:
+        done.set()
+        with app.app_context():
+            order_service.update_order_status(order_id, 'ready')  # one more write ends each reader
+        for thread in threads:
+            thread.join(timeout=10)